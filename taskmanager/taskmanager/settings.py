@@ -60,6 +60,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Static files are answered here, before sessions, locale, CSRF and
+    # authentication run.
+    'tasks.middleware.WhiteNoiseMiddleware',
+    'tasks.middleware.ServerTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -67,14 +71,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
 
 ROOT_URLCONF = 'taskmanager.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, timing renders for Server-Timing (tasks.timing).
+        'BACKEND': 'tasks.timing.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -155,16 +159,144 @@ LOCALE_PATHS = [
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# Collected static files get hashed names and gzip/Brotli versions, which
+# WhiteNoise serves with far-future, immutable caching (see tasks.storage).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'tasks.storage.StaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Tags left without tasks are deleted by a background job queued by the
+# transaction that detached them ('queued'), right after that transaction
+# commits ('immediate'), or only by the cleanup_tags management command
+# ('deferred').
+TASKS_TAG_CLEANUP = config('TASKS_TAG_CLEANUP', default='queued')
+
+# Number of tasks per page in the task list and the API.
+TASKS_PAGE_SIZE = config('TASKS_PAGE_SIZE', default=50, cast=int)
+
+# Full-text search backend: 'postgres', 'sqlite' or 'basic'. Empty picks
+# the backend matching the database.
+TASKS_SEARCH_BACKEND = config('TASKS_SEARCH_BACKEND', default='')
+
+# Seconds a user's tag autocomplete index stays in the cache, and seconds
+# browsers may reuse an autocomplete answer before revalidating it.
+TASKS_TAG_INDEX_TIMEOUT = config(
+    'TASKS_TAG_INDEX_TIMEOUT', default=60 * 60 * 24, cast=int
+)
+TASKS_TAG_AUTOCOMPLETE_MAX_AGE = config(
+    'TASKS_TAG_AUTOCOMPLETE_MAX_AGE', default=60, cast=int
+)
+
+# Seconds a rendered task list page or API list payload stays cached.
+# Entries are versioned per user, so changes never serve stale lists.
+TASKS_LIST_CACHE_TIMEOUT = config(
+    'TASKS_LIST_CACHE_TIMEOUT', default=60 * 60, cast=int
+)
+
+# Largest number of items accepted by the bulk API endpoints in one request.
+TASKS_BULK_MAX_BATCH_SIZE = config(
+    'TASKS_BULK_MAX_BATCH_SIZE', default=500, cast=int
+)
+
+# Seconds tombstones of deleted tasks and tags are kept for delta sync.
+# Sync tokens older than this get a full resync.
+TASKS_SYNC_TOMBSTONE_RETENTION = config(
+    'TASKS_SYNC_TOMBSTONE_RETENTION', default=60 * 60 * 24 * 30, cast=int
+)
+
+# Minimum seconds between two tombstone prunes triggered by sync requests;
+# 0 leaves pruning to the prune_tombstones command.
+TASKS_SYNC_PRUNE_INTERVAL = config(
+    'TASKS_SYNC_PRUNE_INTERVAL', default=60 * 60, cast=int
+)
+
+# Tasks read per query by the CSV/NDJSON export.
+TASKS_EXPORT_CHUNK_SIZE = config('TASKS_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Rows written per transaction by the CSV/NDJSON import, and how many
+# rejected rows the import endpoint lists in its response.
+TASKS_IMPORT_CHUNK_SIZE = config('TASKS_IMPORT_CHUNK_SIZE', default=2000, cast=int)
+TASKS_IMPORT_MAX_ERRORS = config('TASKS_IMPORT_MAX_ERRORS', default=100, cast=int)
+
+# Broker of the live task events: 'memory' for a single worker, or 'redis'
+# to reach the streams of every worker through TASKS_EVENTS_REDIS_URL (a
+# redis:// or unix:// URL).
+TASKS_EVENTS_BROKER = config('TASKS_EVENTS_BROKER', default='memory')
+TASKS_EVENTS_REDIS_URL = config(
+    'TASKS_EVENTS_REDIS_URL', default='redis://localhost:6379/0'
+)
+
+# Seconds between keep-alive comments on an idle event stream.
+TASKS_EVENTS_HEARTBEAT = config('TASKS_EVENTS_HEARTBEAT', default=15, cast=int)
+
+# Seconds the user of a JWT stays cached between API requests; 0 reads the
+# user on every request. Saving or deleting the user drops the entry from
+# the cache of the process making the change only, so set it with a cache
+# shared by every worker (CACHES), e.g. Redis or Memcached.
+TASKS_AUTH_USER_CACHE_TIMEOUT = config(
+    'TASKS_AUTH_USER_CACHE_TIMEOUT', default=0, cast=int
+)
+
+# Reminders of task deadlines sent by the run_reminders command: 'console'
+# writes them to standard output, 'email' mails them to the task owners.
+# Reminders are due TASKS_REMINDER_LEAD seconds before the deadline, which
+# is TASKS_REMINDER_ALL_DAY_TIME for tasks without a time, and are still
+# sent up to TASKS_REMINDER_GRACE seconds late.
+TASKS_REMINDER_BACKEND = config('TASKS_REMINDER_BACKEND', default='console')
+TASKS_REMINDER_LEAD = config('TASKS_REMINDER_LEAD', default=60 * 60, cast=int)
+TASKS_REMINDER_ALL_DAY_TIME = config(
+    'TASKS_REMINDER_ALL_DAY_TIME', default='09:00'
+)
+TASKS_REMINDER_GRACE = config('TASKS_REMINDER_GRACE', default=60 * 60, cast=int)
+
+# Background jobs run by the run_worker command: attempts before a job is
+# marked failed, seconds before the first retry (doubled on each retry), and
+# seconds a worker may hold a batch before other workers take it over.
+TASKS_JOB_MAX_ATTEMPTS = config('TASKS_JOB_MAX_ATTEMPTS', default=5, cast=int)
+TASKS_JOB_RETRY_DELAY = config('TASKS_JOB_RETRY_DELAY', default=30, cast=int)
+TASKS_JOB_LEASE = config('TASKS_JOB_LEASE', default=5 * 60, cast=int)
+
+# Server-Timing header with the time each request spent in SQL, templates
+# and signal handlers. It shows query counts and timings to every client,
+# so it is on only with DEBUG unless turned on explicitly. Requests slower
+# than TASKS_SLOW_REQUEST_MS (0: never) are logged as warnings with their
+# TASKS_SLOW_REQUEST_STATEMENTS most time-consuming SQL statements;
+# TASKS_TIMING_LOG_LEVEL=INFO logs every request.
+TASKS_SERVER_TIMING = config('TASKS_SERVER_TIMING', default=DEBUG, cast=bool)
+TASKS_SLOW_REQUEST_MS = config('TASKS_SLOW_REQUEST_MS', default=500, cast=int)
+TASKS_SLOW_REQUEST_STATEMENTS = config(
+    'TASKS_SLOW_REQUEST_STATEMENTS', default=10, cast=int
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'tasks.timing': {
+            'handlers': ['console'],
+            'level': config('TASKS_TIMING_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'tasks.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -0,0 +1,160 @@
+"""
+JWT authentication of API requests, with the token's user cached.
+
+``CachedJWTAuthentication`` is a drop-in replacement for simplejwt's
+``JWTAuthentication``. The token is verified as usual, but the user it
+names is checked against Django's cache, where an entry stays for
+``TASKS_AUTH_USER_CACHE_TIMEOUT`` seconds, instead of read from the
+database on every request. An entry holds what simplejwt checks: the
+user's id, whether they are active and the fingerprint of their password
+hash that tokens carry. The user is returned with its other fields
+deferred.
+
+Saving or deleting a user drops their entry once the transaction commits
+(see ``tasks.signals``), but only from the cache this process uses: with
+the default per-process ``LocMemCache``, other workers see a deactivation
+or a password change only once their entry expires. Changes made with
+``QuerySet.update()`` send no signal and always wait for the timeout. The
+timeout is therefore 0, which turns the cache off, unless it is set along
+with a cache shared by every worker in ``CACHES``.
+
+DRF views authenticate with ``DEFAULT_AUTHENTICATION_CLASSES``. The async
+read views of the API (see ``tasks.views``) take the JWT bearer token of
+the Django request themselves and hand any request without a valid one
+to the DRF views, which answer with the usual 401.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .transactions import OnCommitBatch
+
+CACHE_TIMEOUT = 0
+
+
+def user_cache_key(user_id):
+    """Return the cache key of the user with the given token user id."""
+    return f'tasks:auth-user:{user_id}'
+
+
+def user_cache_timeout():
+    """Return how many seconds an authenticated user stays cached."""
+    return getattr(settings, 'TASKS_AUTH_USER_CACHE_TIMEOUT', CACHE_TIMEOUT)
+
+
+def invalidate_cached_users(user_ids):
+    """Drop the cached users with the given token user ids."""
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+def user_state(user):
+    """Return what the cache keeps of a user to check their tokens."""
+    return {
+        'pk': user.pk,
+        'is_active': user.is_active,
+        'password': get_md5_hash_password(user.password),
+    }
+
+
+user_cache_invalidation = OnCommitBatch(invalidate_cached_users)
+
+
+def schedule_user_invalidation(user):
+    """Drop a user's cache entry once the current transaction commits."""
+    user_cache_invalidation.add({getattr(user, api_settings.USER_ID_FIELD)})
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` checking the token's user in Django's cache."""
+
+    def get_user(self, validated_token):
+        """Return the token's user, checked in the cache if it is there."""
+        key = self.cache_key(validated_token)
+        state = cache.get(key) if key else None
+        if state is not None:
+            return self.cached_user(state, validated_token)
+        user = super().get_user(validated_token)
+        if key:
+            cache.set(key, user_state(user), user_cache_timeout())
+        return user
+
+    async def aget_user(self, validated_token):
+        """Async version of ``get_user``."""
+        key = self.cache_key(validated_token)
+        state = await cache.aget(key) if key else None
+        if state is not None:
+            return self.cached_user(state, validated_token)
+        user = await sync_to_async(super().get_user)(validated_token)
+        if key:
+            await cache.aset(key, user_state(user), user_cache_timeout())
+        return user
+
+    def cache_key(self, validated_token):
+        """
+        Return the cache key of the token's user, or None if it has none
+        or the cache is turned off.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not user_cache_timeout():
+            return None
+        return user_cache_key(user_id)
+
+    def cached_user(self, state, validated_token):
+        """
+        Repeat the checks ``get_user`` makes on the cached state of a user.
+
+        Returns:
+            User: The user, with only its primary key and ``is_active``
+            loaded.
+
+        Raises:
+            AuthenticationFailed: If the user is inactive or changed their
+                password since the token was issued, when simplejwt checks
+                these.
+        """
+        if api_settings.CHECK_USER_IS_ACTIVE and not state['is_active']:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive',
+            )
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != state['password']:
+            raise AuthenticationFailed(
+                _("The user's password has been changed."),
+                code='password_changed',
+            )
+        model = self.user_model
+        return model.from_db(
+            model.objects.db,
+            [model._meta.pk.attname, 'is_active'],
+            [state['pk'], state['is_active']],
+        )
+
+
+async def aauthenticate(request):
+    """
+    Return the user of the JWT bearer token of a Django request.
+
+    Returns:
+        User: The authenticated user, or None if the request has no valid
+        token or the user is unknown or inactive.
+    """
+    authenticator = CachedJWTAuthentication()
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+    try:
+        validated_token = authenticator.get_validated_token(raw_token)
+        return await authenticator.aget_user(validated_token)
+    except (AuthenticationFailed, TokenError):
+        return None
@@ -0,0 +1,280 @@
+"""
+Per-user tag index answering the autocomplete of the tags input.
+
+The index is built lazily from one query and kept in Django's cache. It
+holds the user's tag names sorted by their lowercase form, so prefix
+matches are found with a binary search, plus how many tasks use each tag,
+which ranks the suggestions.
+
+Like the cached task lists (see ``tasks.caching``), indexes are stored
+under keys holding the value of the user's change counter, which every
+change to their tags and tasks bumps in its own transaction. The counter
+is read before the tags, so an index is never stored under a value older
+than the tags it was built from, and a change makes the old index
+unreachable in every process, without deleting it. Each process also
+keeps the indexes it has read, so a request reads the counter and, until
+it changes, nothing else.
+"""
+
+import hashlib
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.http import quote_etag
+
+from .models import ChangeCounter, Tag
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def cache_key(user_id, counter):
+    """
+    Return the cache key of a user's tag index.
+
+    Args:
+        user_id (int): Owner of the tags.
+        counter (tuple): ``value`` and ``changed_at`` of the user's change
+            counter, or None if they have none yet. The time tells apart
+            the changes of a value reused after a rollback.
+    """
+    value, changed_at = counter or (0, None)
+    changed = changed_at.timestamp() if changed_at else 0
+    return f'tasks:tag-index:{user_id}:{value}:{changed}'
+
+
+def counter_query(user_id):
+    """Return a query reading the state of a user's change counter."""
+    return ChangeCounter.objects.filter(user_id=user_id).values_list(
+        'value', 'changed_at',
+    )
+
+
+@dataclass
+class TagIndex:
+    """
+    Sorted tag names of one user with their usage counts.
+
+    Attributes:
+        keys (list): Lowercase tag names, sorted.
+        names (list): Tag names in the order of ``keys``.
+        usage (list): Number of tasks using each tag.
+        by_rank (list): Positions of the tags, most used first.
+        text (str): ``keys`` joined with newlines, searched for substrings.
+        offsets (list): Offset of each key in ``text``.
+        version (str): Digest of the content, used as the ETag base.
+    """
+
+    keys: list
+    names: list
+    usage: list
+    by_rank: list
+    text: str
+    offsets: list
+    version: str
+
+    @staticmethod
+    def usage_query(user_id):
+        """Return ``(name, usage)`` of each of a user's tags."""
+        return (
+            Tag.objects.filter(user_id=user_id)
+            .annotate(usage=Count('tasks'))
+            .values_list('name', 'usage')
+        )
+
+    @classmethod
+    def build(cls, user_id):
+        """Build the index of a user's tags with one query."""
+        return cls.from_usage(cls.usage_query(user_id))
+
+    @classmethod
+    async def abuild(cls, user_id):
+        """Async version of ``build``."""
+        return cls.from_usage(
+            [row async for row in cls.usage_query(user_id)]
+        )
+
+    @classmethod
+    def from_usage(cls, usage_rows):
+        """Build an index from ``(name, usage)`` pairs."""
+        rows = sorted((name.lower(), name, usage) for name, usage in usage_rows)
+        keys = [row[0] for row in rows]
+        usage = [row[2] for row in rows]
+        offsets = []
+        offset = 0
+        digest = hashlib.md5(usedforsecurity=False)
+        for key, name, count in rows:
+            offsets.append(offset)
+            offset += len(key) + 1
+            digest.update(f'{name}\0{count}\0'.encode())
+        return cls(
+            keys=keys,
+            names=[row[1] for row in rows],
+            usage=usage,
+            by_rank=sorted(range(len(rows)), key=lambda i: -usage[i]),
+            text='\n'.join(keys),
+            offsets=offsets,
+            version=digest.hexdigest(),
+        )
+
+    def rank(self, position):
+        """Return the sort key ranking a tag among the matches."""
+        return (-self.usage[position], self.keys[position])
+
+    def first_ranked(self, matches, count):
+        """
+        Return the first ``count`` matching positions, most used first.
+
+        Args:
+            matches (Callable[[int], bool]): Tells if a position matches.
+            count (int): Number of positions wanted.
+        """
+        best = []
+        for position in self.by_rank:
+            if matches(position):
+                best.append(position)
+                if len(best) == count:
+                    break
+        return best
+
+    def is_common(self, total, count):
+        """
+        Return True if ``total`` matches are so many that walking
+        ``by_rank`` finds ``count`` of them sooner than ranking them all.
+        """
+        return total * total > count * len(self.keys)
+
+    def prefix_positions(self, term):
+        """Return the positions of the keys starting with ``term``."""
+        start = bisect_left(self.keys, term)
+        end = bisect_left(self.keys, term + '\U0010ffff', start)
+        return range(start, end)
+
+    def substring_positions(self, term):
+        """Return the positions of keys containing ``term`` past their start."""
+        positions = []
+        if '\n' in term:
+            return positions
+        found = self.text.find(term, 1)
+        while found != -1:
+            position = bisect_right(self.offsets, found) - 1
+            if found > self.offsets[position]:
+                positions.append(position)
+            next_key = self.offsets[position] + len(self.keys[position]) + 1
+            found = self.text.find(term, next_key)
+        return positions
+
+    def search(self, term, limit=DEFAULT_LIMIT):
+        """
+        Return up to ``limit`` tag names matching ``term``.
+
+        Names starting with the term come first, then names containing it
+        elsewhere; each group is ranked by usage, then alphabetically.
+        Matching ignores case.
+        """
+        term = term.strip().lower()
+        if not term or limit < 1:
+            return []
+
+        prefix = self.prefix_positions(term)
+        if self.is_common(len(prefix), limit):
+            best = self.first_ranked(prefix.__contains__, limit)
+        else:
+            best = heapq.nsmallest(limit, prefix, key=self.rank)
+
+        wanted = limit - len(best)
+        if wanted and self.is_common(self.text.count(term), wanted):
+            best += self.first_ranked(
+                lambda position: (
+                    position not in prefix
+                    and self.keys[position].find(term, 1) > 0
+                ),
+                wanted,
+            )
+        elif wanted:
+            inner = [
+                position for position in self.substring_positions(term)
+                if position not in prefix
+            ]
+            best += heapq.nsmallest(wanted, inner, key=self.rank)
+        return [self.names[position] for position in best]
+
+    def etag(self, term, limit):
+        """Return the ETag of the answer to ``search(term, limit)``."""
+        digest = hashlib.md5(
+            f'{self.version}\0{limit}\0{term}'.encode(),
+            usedforsecurity=False,
+        )
+        return quote_etag(digest.hexdigest())
+
+
+# Indexes this process already read or built, by cache key, so a request
+# only reads the counter instead of unpickling the whole index.
+_loaded = OrderedDict()
+_loaded_lock = threading.Lock()
+LOADED_SIZE = 256
+
+
+def loaded_index(key):
+    """Return the index this process read under ``key``, if any."""
+    with _loaded_lock:
+        return _loaded.get(key)
+
+
+def remember_index(key, index):
+    """Keep an index read or built by this process."""
+    with _loaded_lock:
+        _loaded[key] = index
+        _loaded.move_to_end(key)
+        if len(_loaded) > LOADED_SIZE:
+            _loaded.popitem(last=False)
+    return index
+
+
+def index_timeout():
+    """Return how long tag indexes are cached."""
+    return getattr(settings, 'TASKS_TAG_INDEX_TIMEOUT', CACHE_TIMEOUT)
+
+
+def get_tag_index(user_id):
+    """Return the cached tag index of a user, building it if missing."""
+    key = cache_key(user_id, counter_query(user_id).first())
+    index = loaded_index(key)
+    if index is not None:
+        return index
+
+    index = cache.get(key)
+    if index is None:
+        index = TagIndex.build(user_id)
+        cache.set(key, index, index_timeout())
+    return remember_index(key, index)
+
+
+async def aget_tag_index(user_id):
+    """Async version of ``get_tag_index``."""
+    key = cache_key(user_id, await counter_query(user_id).afirst())
+    index = loaded_index(key)
+    if index is not None:
+        return index
+
+    index = await cache.aget(key)
+    if index is None:
+        index = await TagIndex.abuild(user_id)
+        await cache.aset(key, index, index_timeout())
+    return remember_index(key, index)
+
+
+def get_limit(requested=None):
+    """Return the number of suggestions to send, clamped to ``MAX_LIMIT``."""
+    try:
+        limit = int(requested) if requested else DEFAULT_LIMIT
+    except (TypeError, ValueError):
+        limit = DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
@@ -0,0 +1,14 @@
+"""
+Benchmarks for the tasks app.
+
+Every module in this package exposes ``run(**options)`` returning a
+JSON-serializable dict. Benchmarks seed their own data, either inside a
+transaction that is rolled back afterwards or, when they need commits or
+other connections, committed and deleted at the end, so they can be
+pointed at any database without leaving rows behind. Run them with::
+
+    python manage.py benchmark <name> [-o key=value ...] [--output FILE]
+
+``python manage.py seed_benchmark`` generates the same kind of data and
+keeps it, for browsing or for external load tools.
+"""
@@ -0,0 +1,259 @@
+"""
+Compare requests served by one worker under ASGI and under WSGI.
+
+Requests are sent in-process to Django's real ASGI and WSGI handlers, so
+the whole middleware stack runs but no server is needed:
+
+- WSGI: ``wsgi_threads`` threads, like a threaded worker of gunicorn;
+  requests beyond that wait for a free thread.
+- ASGI: one event loop, like a uvicorn worker.
+
+``concurrency`` clients each send their share of the requests one after
+the other, so latencies include any wait for the worker.
+
+Each query is delayed by ``query_delay_ms`` to stand for the round trip
+to a database server. The list cache is disabled so every list request
+reaches the database; tag autocomplete answers from its cached index.
+
+The seeded data is committed, since the handlers use their own database
+connections, and deleted at the end.
+"""
+
+import asyncio
+import io
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .utils import seed_dataset
+
+HOST = 'testserver'
+
+
+@contextmanager
+def query_delay(ms):
+    """Delay every query of connections opened in the block by ``ms``."""
+    def delay(execute, sql, params, many, context):
+        time.sleep(ms / 1000)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        # Connections are reopened on the same wrapper after each request.
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    if ms:
+        connection_created.connect(install)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+
+
+def wsgi_get(app, path, query, headers):
+    """Send a GET request to a WSGI application; return the status code."""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers.items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    status = []
+    body = app(environ, lambda line, headers, exc_info=None: status.append(line))
+    try:
+        for _ in body:
+            pass
+    finally:
+        body.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_get(app, path, query, headers):
+    """Send a GET request to an ASGI application; return the status code."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query.encode(),
+        'headers': [(b'host', HOST.encode())] + [
+            (name.lower().encode(), value.encode())
+            for name, value in headers.items()
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': (HOST, 80),
+    }
+    requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    disconnected = asyncio.get_running_loop().create_future()
+    status = []
+
+    async def receive():
+        # The handler keeps listening for a disconnect until it's done.
+        return requests.pop() if requests else await disconnected
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def summarize(latencies, elapsed):
+    """Return throughput and latency statistics of a run."""
+    latencies.sort()
+    return {
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            * 1000, 3,
+        ),
+    }
+
+
+def run_wsgi(app, request, count, concurrency, threads):
+    """
+    Send ``count`` requests from ``concurrency`` clients to a worker with
+    ``threads`` threads; latencies include the wait for a free thread.
+    """
+    worker = threading.BoundedSemaphore(threads)
+
+    def client(requests):
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            with worker:
+                status = wsgi_get(app, *request)
+            assert status == 200, status
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [
+            latency
+            for client_latencies in pool.map(
+                client, split(count, concurrency),
+            )
+            for latency in client_latencies
+        ]
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def run_asgi(app, request, count, concurrency):
+    """Send ``count`` requests from ``concurrency`` clients in one loop."""
+    async def client(requests):
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            status = await asgi_get(app, *request)
+            assert status == 200, status
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    async def main():
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(client(requests) for requests in split(count, concurrency))
+        )
+        latencies = [latency for result in results for latency in result]
+        return summarize(latencies, time.perf_counter() - start)
+
+    return asyncio.run(main())
+
+
+def split(count, parts):
+    """Split ``count`` requests between ``parts`` clients."""
+    return [count // parts + (i < count % parts) for i in range(parts)]
+
+
+def run(tasks=500, requests=200, concurrency='1,8,32', wsgi_threads=4,
+        query_delay_ms=2):
+    """
+    Seed one user and load the async endpoints under ASGI and WSGI.
+
+    Args:
+        concurrency (str): Comma-separated numbers of clients.
+        wsgi_threads (int): Threads of the WSGI worker.
+        query_delay_ms (float): Added latency of each query.
+
+    Returns:
+        dict: Throughput and latency per endpoint, concurrency and
+        interface.
+    """
+    levels = [int(level) for level in str(concurrency).split(',')]
+    results = {
+        'tasks': tasks,
+        'requests': requests,
+        'wsgi_threads': wsgi_threads,
+        'query_delay_ms': query_delay_ms,
+        'endpoints': {},
+    }
+    user = seed_dataset(users=1, tasks=tasks)[0]
+    try:
+        with override_settings(
+            ALLOWED_HOSTS=[HOST], TASKS_LIST_CACHE_TIMEOUT=0,
+        ):
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            cookie = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={session}'}
+            token = RefreshToken.for_user(user).access_token
+            endpoints = {
+                'task_list': ('/en/', '', cookie),
+                'tag_autocomplete': (
+                    '/en/tags/autocomplete/',
+                    urlencode({'term': 'tag-1'}),
+                    cookie,
+                ),
+                'api_list': (
+                    '/en/api/', '', {'Authorization': f'Bearer {token}'},
+                ),
+            }
+            wsgi_app = get_wsgi_application()
+            asgi_app = get_asgi_application()
+
+            with query_delay(query_delay_ms):
+                for name, request in endpoints.items():
+                    by_level = results['endpoints'][name] = {}
+                    for level in levels:
+                        by_level[level] = {
+                            'wsgi': run_wsgi(
+                                wsgi_app, request, requests, level,
+                                wsgi_threads,
+                            ),
+                            'asgi': run_asgi(asgi_app, request, requests, level),
+                        }
+    finally:
+        user.delete()
+
+    return results
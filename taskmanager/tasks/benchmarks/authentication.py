@@ -0,0 +1,65 @@
+"""
+Compare JWT authentication reading the user from the database with the
+cached user of ``CachedJWTAuthentication``.
+
+Each authenticator checks the same bearer token of a DRF request. The
+cache, off by default, is turned on for ``cache_timeout`` seconds and
+warmed by a first call, as every request after a user's first one would
+be. Each query is delayed by ``query_delay_ms`` to stand for the round
+trip to a database server.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tasks.authentication import CachedJWTAuthentication, user_cache_key
+
+from .utils import rollback_after, seed_dataset, timed
+
+
+def run(repeat=500, query_delay_ms=1, cache_timeout=300):
+    """
+    Authenticate one token ``repeat`` times with each authenticator.
+
+    Returns:
+        dict: Queries and latency per authentication, per authenticator.
+    """
+    results = {'query_delay_ms': query_delay_ms}
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(query_delay_ms / 1000)
+        return execute(sql, params, many, context)
+
+    with rollback_after(), override_settings(
+        TASKS_AUTH_USER_CACHE_TIMEOUT=cache_timeout,
+    ):
+        user = seed_dataset(users=1, tasks=0)[0]
+        token = RefreshToken.for_user(user).access_token
+        request = Request(RequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {token}',
+        ))
+        cache.delete(user_cache_key(user.pk))
+
+        for name, authenticator in [
+            ('database', JWTAuthentication()),
+            ('cached', CachedJWTAuthentication()),
+        ]:
+            authenticator.authenticate(request)
+            with CaptureQueriesContext(connection) as queries:
+                authenticated, _ = authenticator.authenticate(request)
+            assert authenticated.pk == user.pk
+            with connection.execute_wrapper(delay):
+                latency = timed(
+                    lambda: authenticator.authenticate(request), repeat,
+                )
+            results[name] = {'queries': len(queries), 'ms': latency}
+        cache.delete(user_cache_key(user.pk))
+
+    return results
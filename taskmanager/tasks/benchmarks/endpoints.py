@@ -0,0 +1,140 @@
+"""
+Latency, queries and peak memory of the main endpoints on realistic data.
+
+Requests go through Django's test client, so the whole middleware stack,
+authentication and template rendering run, in-process and without a
+server. The data comes from ``generate_dataset``: ``users`` users with
+``tasks`` tasks and ``tags`` tags each, generated from ``seed``, and the
+first user sends the requests. The same options always measure the same
+data, so runs can be compared with ``--output`` files.
+
+The data is committed, so tag cleanup and the other work done once a
+transaction commits is measured too, and deleted at the end. Set
+``list_cache`` to 1 to serve repeated list requests from the list cache;
+by default every request renders its list from the database.
+
+Measured endpoints:
+
+- ``task_list``, ``task_list_filtered`` and ``task_list_searched``: the
+  first page of the HTML list, plain, of pending tasks, and searched.
+- ``api_list``, ``api_create`` and ``api_update``: the JWT API.
+- ``task_stats``: the counts of the header widget.
+- ``tag_autocomplete``: suggestions for a two-letter term.
+- ``task_delete``: the HTML delete of a task whose tag becomes unused and
+  is cleaned up.
+"""
+
+from itertools import count
+
+from django.conf import settings
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tasks.models import Tag, Task
+
+from .utils import WORDS, generate_dataset, profiled
+
+HOST = 'testserver'
+
+# Numbers the tags of deletable tasks, unique across calls.
+_deletable = count()
+
+
+def check(response, expected=200):
+    """Fail the benchmark on an unexpected status code."""
+    assert response.status_code == expected, response.status_code
+    return response
+
+
+def deletable_tasks(user, number):
+    """Create tasks that each have a tag of their own."""
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'delete-me-{next(_deletable)}', user=user)
+        for _ in range(number)
+    )
+    tasks = []
+    for tag in tags:
+        task = Task.objects.create(title='Delete me', user=user)
+        task.tags.add(tag)
+        tasks.append(task.pk)
+    return iter(tasks)
+
+
+def endpoints(user, repeat):
+    """Return a call sending one request to each measured endpoint."""
+    client = Client()
+    client.force_login(user)
+    token = RefreshToken.for_user(user).access_token
+    api = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+    task = Task.objects.filter(user=user).first()
+    titles = count()
+    to_delete = deletable_tasks(user, repeat + 1)
+    term = WORDS[0][:2]
+
+    return {
+        'task_list': lambda: check(client.get(reverse('task_list'))),
+        'task_list_filtered': lambda: check(
+            client.get(reverse('task_list'), {'status': 'pending'})
+        ),
+        'task_list_searched': lambda: check(
+            client.get(reverse('task_list'), {'q': WORDS[0]})
+        ),
+        'api_list': lambda: check(api.get('/en/api/')),
+        'api_create': lambda: check(api.post(
+            '/en/api/',
+            {
+                'title': f'Benchmark task {next(titles)}',
+                'tags': [],
+                'tags_names': [WORDS[1], WORDS[2]],
+            },
+            content_type='application/json',
+        ), 201),
+        'api_update': lambda: check(api.patch(
+            f'/en/api/{task.pk}/',
+            {'title': f'Updated task {next(titles)}'},
+            content_type='application/json',
+        )),
+        'tag_autocomplete': lambda: check(
+            client.get(reverse('tag_autocomplete'), {'term': term})
+        ),
+        'task_stats': lambda: check(client.get(reverse('task_stats'))),
+        'task_delete': lambda: check(
+            client.post(reverse('task_delete', args=[next(to_delete)])), 302,
+        ),
+    }
+
+
+def run(users=5, tasks=2000, tags=50, seed=0, repeat=50, list_cache=0):
+    """
+    Generate the dataset and measure each endpoint ``repeat`` times.
+
+    Returns:
+        dict: Per endpoint, latency statistics in milliseconds, queries
+        per request and peak Python memory per request in KiB.
+    """
+    results = {
+        'users': users,
+        'tasks': tasks,
+        'tags': tags,
+        'seed': seed,
+        'repeat': repeat,
+        'list_cache': bool(list_cache),
+        'database': settings.DATABASES['default']['ENGINE'],
+        'endpoints': {},
+    }
+    created = generate_dataset(
+        users=users, tasks=tasks, tags=tags, seed=seed, prefix='endpoints',
+    )
+    try:
+        overrides = {'ALLOWED_HOSTS': [HOST]}
+        if not list_cache:
+            overrides['TASKS_LIST_CACHE_TIMEOUT'] = 0
+        with override_settings(**overrides):
+            for name, call in endpoints(created[0], repeat).items():
+                results['endpoints'][name] = profiled(call, repeat)
+    finally:
+        for user in created:
+            user.delete()
+    return results
@@ -0,0 +1,154 @@
+"""
+Measure what idle live event streams cost under ASGI.
+
+Opens ``streams`` event streams of one user on Django's real ASGI handler
+in one event loop, like a uvicorn worker, and reports the memory and
+threads they hold (resident memory also keeps what the requests used
+while connecting), then how long one published event takes to reach them
+all. The clients then disconnect.
+
+The seeded user is committed, since the handler uses its own database
+connections, and deleted at the end.
+"""
+
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from ..events import get_broker
+from .utils import seed_dataset
+
+HOST = 'testserver'
+
+
+def rss_kib():
+    """Return the resident memory of the process in KiB."""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+class StreamClient:
+    """One client of the event stream, counting the events it receives."""
+
+    def __init__(self, app, path, cookie):
+        self.app = app
+        self.scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'root_path': '',
+            'query_string': b'',
+            'headers': [(b'host', HOST.encode()), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': (HOST, 80),
+        }
+        self.requests = [{'type': 'http.request', 'body': b''}]
+        self.disconnected = asyncio.get_running_loop().create_future()
+        self.connected = asyncio.Event()
+        self.received = asyncio.Event()
+        self.status = None
+
+    async def receive(self):
+        if self.requests:
+            return self.requests.pop()
+        await self.disconnected
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message['type'] == 'http.response.body':
+            if b'event: ' in message.get('body', b''):
+                self.received.set()
+            self.connected.set()
+
+    async def run(self):
+        await self.app(self.scope, self.receive, self.send)
+
+    def disconnect(self):
+        self.disconnected.set_result(None)
+
+
+def run(streams=1000):
+    """
+    Open ``streams`` idle event streams and publish one event to them.
+
+    Returns:
+        dict: Memory and threads per stream, and the fan-out time.
+    """
+    user = seed_dataset(users=1, tasks=0)[0]
+    try:
+        with override_settings(ALLOWED_HOSTS=[HOST]):
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            cookie = f'{settings.SESSION_COOKIE_NAME}={session}'
+            return asyncio.run(
+                measure(get_asgi_application(), reverse('task_events'),
+                        cookie, user.pk, streams)
+            )
+    finally:
+        connections.close_all()
+        user.delete()
+
+
+async def measure(app, path, cookie, user_id, streams):
+    """Open the streams, publish an event, then disconnect everyone."""
+    broker = get_broker()
+    # Warm up the handler so the baseline includes its one-off costs.
+    warmup = StreamClient(app, path, cookie)
+    task = asyncio.create_task(warmup.run())
+    await warmup.connected.wait()
+    warmup.disconnect()
+    await task
+
+    rss_before = rss_kib()
+    threads_before = threading.active_count()
+    tracemalloc.start()
+    start = time.perf_counter()
+    clients = [StreamClient(app, path, cookie) for _ in range(streams)]
+    tasks = [asyncio.create_task(client.run()) for client in clients]
+    await asyncio.gather(*(client.connected.wait() for client in clients))
+    connect_s = time.perf_counter() - start
+    assert all(client.status == 200 for client in clients)
+    assert len(broker.subscribers.get(user_id, ())) == streams
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_kib()
+    threads_after = threading.active_count()
+
+    start = time.perf_counter()
+    broker.publish(user_id, [{'type': 'deleted', 'id': 0}])
+    await asyncio.gather(*(client.received.wait() for client in clients))
+    fan_out_s = time.perf_counter() - start
+
+    for client in clients:
+        client.disconnect()
+    await asyncio.gather(*tasks)
+
+    return {
+        'streams': streams,
+        'connect_s': round(connect_s, 3),
+        'rss_per_stream_kib': round((rss_after - rss_before) / streams, 1),
+        'python_heap_per_stream_kib': round(heap / 1024 / streams, 1),
+        'threads_per_stream': round(
+            (threads_after - threads_before) / streams, 2,
+        ),
+        'fan_out_ms': round(fan_out_s * 1000, 3),
+        'open_after_disconnect': len(broker.subscribers.get(user_id, ())),
+    }
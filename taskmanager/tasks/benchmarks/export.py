@@ -0,0 +1,70 @@
+"""
+Compare the peak memory of the streaming export with the serialized API
+list.
+
+The streaming export (see ``tasks.export``) is consumed block by block for
+a tenth of the tasks and for all of them; its peak should stay flat.
+Serializing the whole list, as API clients scraping it cause, grows with
+the number of tasks.
+"""
+
+import tracemalloc
+
+from tasks.export import FORMAT_CSV, FORMAT_NDJSON, export_tasks
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+
+from .utils import rollback_after, seed_dataset, timed
+
+
+def peak_kib(consume):
+    """Run ``consume`` and return the peak of Python allocations in KiB."""
+    tracemalloc.start()
+    try:
+        consume()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def drain(blocks):
+    """Consume an export, returning its size in bytes."""
+    return sum(len(block.encode()) for block in blocks)
+
+
+def run(tasks=20000, chunk_size=2000):
+    """
+    Seed one user and export their tasks.
+
+    Returns:
+        dict: Peak memory and time per approach and number of tasks.
+    """
+    results = {'tasks': tasks, 'chunk_size': chunk_size}
+    with rollback_after():
+        user = seed_dataset(users=1, tasks=tasks)[0]
+        queryset = Task.objects.for_listing(user)
+        pks = list(queryset.values_list('pk', flat=True))
+
+        for size in sorted({max(1, tasks // 10), tasks}):
+            subset = queryset.filter(pk__in=pks[:size]) if size < tasks else queryset
+            by_size = results[size] = {}
+            for export_format in (FORMAT_CSV, FORMAT_NDJSON):
+                by_size[export_format] = {
+                    'peak_kib': peak_kib(lambda: drain(
+                        export_tasks(subset, export_format, chunk_size)
+                    )),
+                    'ms': timed(lambda: drain(
+                        export_tasks(subset, export_format, chunk_size)
+                    ), repeat=3),
+                }
+            by_size['api_serializer'] = {
+                'peak_kib': peak_kib(
+                    lambda: TaskSerializer(subset.all(), many=True).data
+                ),
+                'ms': timed(
+                    lambda: TaskSerializer(subset.all(), many=True).data,
+                    repeat=3,
+                ),
+            }
+    return results
@@ -0,0 +1,98 @@
+"""
+Time the chunked import against creating tasks one serializer call at a
+time.
+
+The import (see ``tasks.imports``) reads generated NDJSON or CSV lines
+with two tags per task out of a pool of ``tags`` names. The baseline
+saves ``baseline`` tasks with ``TaskSerializer`` in a transaction each,
+as clients replaying the API do, and is extrapolated to ``tasks``.
+
+Both commit, so the work done after each commit (search index, stamps,
+live events) is measured too; the seeded user is deleted at the end.
+"""
+
+import json
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from tasks.export import csv_lines
+from tasks.imports import FORMAT_NDJSON, import_tasks
+from tasks.serializers import TaskSerializer
+
+User = get_user_model()
+
+
+def rows(count, tags):
+    """Yield ``count`` task records with two tags each."""
+    for i in range(count):
+        yield {
+            'title': f'Imported task {i}',
+            'description': f'Description of task {i}',
+            'status': 'pending',
+            'due_date': f'2030-01-{i % 28 + 1:02d}',
+            'tags': [f'tag-{i % tags}', f'tag-{(i * 7 + 1) % tags}'],
+        }
+
+
+def lines(count, tags, import_format):
+    """Yield the generated records as lines of CSV or NDJSON."""
+    if import_format == FORMAT_NDJSON:
+        for row in rows(count, tags):
+            yield json.dumps(row) + '\n'
+        return
+    records = (
+        dict.fromkeys(('id', 'due_time', 'created_at', 'updated_at'))
+        | row for row in rows(count, tags)
+    )
+    yield from csv_lines(records)
+
+
+def run(tasks=100000, tags=50, chunk_size=2000, format=FORMAT_NDJSON,
+        baseline=500):
+    """
+    Import ``tasks`` generated tasks for a new user.
+
+    Returns:
+        dict: Import and baseline durations and throughput.
+    """
+    results = {'tasks': tasks, 'tags': tags, 'chunk_size': chunk_size,
+               'format': format}
+    user = User.objects.create_user(username='benchmark-import')
+    try:
+        chunks = []
+        start = time.perf_counter()
+        result = import_tasks(
+            user, lines(tasks, tags, format), format, chunk_size=chunk_size,
+            progress=lambda _: chunks.append(time.perf_counter()),
+        )
+        elapsed = time.perf_counter() - start
+        assert result.imported == tasks, result
+        results['import'] = {
+            'seconds': round(elapsed, 3),
+            'tasks_per_s': round(tasks / elapsed),
+            'slowest_chunk_ms': round(max(
+                (end - begin) * 1000
+                for begin, end in zip([start] + chunks, chunks)
+            ), 3),
+        }
+
+        context = {'request': SimpleNamespace(user=user)}
+        start = time.perf_counter()
+        for row in rows(baseline, tags):
+            row['tags_names'] = row.pop('tags')
+            row['tags'] = []
+            serializer = TaskSerializer(data=row, context=context)
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic():
+                serializer.save(user=user)
+        per_task = (time.perf_counter() - start) / baseline
+        results['serializer_per_task'] = {
+            'ms': round(per_task * 1000, 3),
+            'extrapolated_seconds': round(per_task * tasks, 1),
+        }
+    finally:
+        user.delete()
+    return results
@@ -0,0 +1,54 @@
+"""
+Compare keyset pagination with OFFSET pagination at increasing depths.
+
+Keyset pages should take the same time whatever their depth, while OFFSET
+pages get slower the further the client scrolls.
+"""
+
+from tasks.models import Task
+from tasks.pagination import encode_cursor, paginate_tasks
+
+from .utils import rollback_after, seed_dataset, timed
+
+
+def cursors_by_page(queryset, page_size, pages):
+    """Return the cursor leading to each of the requested page numbers."""
+    cursors = {1: None}
+    ordered = list(queryset.order_by(*Task.LISTING_ORDER))
+    for page in pages:
+        if page > 1:
+            cursors[page] = encode_cursor(ordered[(page - 1) * page_size - 1])
+    return cursors
+
+
+def run(tasks=100000, page_size=50, repeat=20):
+    """
+    Seed one user with ``tasks`` tasks and time pages at several depths.
+
+    Returns:
+        dict: Latency per page number for keyset and OFFSET pagination.
+    """
+    last_page = tasks // page_size
+    pages = sorted({1, 10, last_page // 4, last_page // 2, last_page})
+    results = {'tasks': tasks, 'page_size': page_size, 'pages': {}}
+
+    with rollback_after():
+        user = seed_dataset(users=1, tasks=tasks)[0]
+        # Without the tag prefetch, which costs the same for every page.
+        queryset = Task.objects.for_user(user)
+        cursors = cursors_by_page(queryset, page_size, pages)
+
+        for page in pages:
+            offset = (page - 1) * page_size
+            results['pages'][page] = {
+                'keyset_ms': timed(
+                    lambda: paginate_tasks(queryset, cursors[page], page_size),
+                    repeat,
+                ),
+                'offset_ms': timed(
+                    lambda: list(queryset[offset:offset + page_size]),
+                    repeat,
+                ),
+            }
+
+    return results
@@ -0,0 +1,92 @@
+"""
+Compare query plans and latency of the hot task and tag lookups with and
+without the indexes added in migration 0016.
+
+The "before" numbers are taken by dropping the indexes inside the
+benchmark transaction, which is rolled back at the end.
+"""
+
+from django.db import connection
+
+from tasks.models import Task, Tag
+
+from .utils import analyze_tables, rollback_after, seed_dataset, timed
+
+
+def hot_queries(user):
+    """Return the queries served on every page load, keyed by name."""
+    return {
+        'task_list': Task.objects.for_listing(user),
+        'task_list_status': Task.objects.for_listing(user, status='pending'),
+        'tag_lookup': Tag.objects.filter(user=user, name='tag-7'),
+        'tag_autocomplete': (
+            Tag.objects.filter(user=user, name__icontains='tag-1')
+            .values_list('name', flat=True)
+            .distinct()
+        ),
+    }
+
+
+def drop_indexes():
+    """
+    Drop the Task indexes and the Tag unique constraint.
+
+    SQLite stores unique constraints inline in the table definition, so
+    there the constraint can't be dropped and is kept.
+
+    Returns:
+        list: Names of the indexes and constraints that were kept.
+    """
+    statements = [
+        f'DROP INDEX {index.name}' for index in Task._meta.indexes
+    ]
+    kept = []
+    for constraint in Tag._meta.constraints:
+        if connection.vendor == 'postgresql':
+            statements.append(
+                f'ALTER TABLE {Tag._meta.db_table} '
+                f'DROP CONSTRAINT {constraint.name}'
+            )
+        else:
+            kept.append(constraint.name)
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    analyze_tables()
+    return kept
+
+
+def measure(user, repeat):
+    """Return the plan and latency of every hot query."""
+    results = {}
+    for name, queryset in hot_queries(user).items():
+        results[name] = {
+            'plan': queryset.explain(),
+            'latency_ms': timed(lambda qs=queryset: list(qs.all()), repeat),
+        }
+    return results
+
+
+def run(users=20, tasks=500, tags=30, repeat=20):
+    """
+    Seed ``users`` x ``tasks`` tasks and report plans before and after.
+
+    Returns:
+        dict: Per-query ``before`` and ``after`` plans and latencies, and
+        the indexes that could not be dropped for the ``before`` run.
+    """
+    with rollback_after():
+        user = seed_dataset(users=users, tasks=tasks, tags=tags)[0]
+        after = measure(user, repeat)
+        kept = drop_indexes()
+        before = measure(user, repeat)
+
+    return {
+        'vendor': connection.vendor,
+        'kept_in_before': kept,
+        'queries': {
+            name: {'before': before[name], 'after': after[name]}
+            for name in after
+        },
+    }
@@ -0,0 +1,89 @@
+"""
+Measure the overhead of the Server-Timing instrumentation.
+
+Runs requests of the ``endpoints`` benchmark with ``TASKS_SERVER_TIMING``
+on and off, in rounds alternating which goes first, so drift in the
+machine's speed affects both alike. The execute wrapper stays installed
+when the middleware is off, as it is in every process, and only costs a
+context variable lookup then.
+
+Request latencies vary by more than the instrumentation costs, so the
+cost of recording one query, ``SELECT 1`` inside and outside a measured
+request, is reported too.
+"""
+
+import statistics
+import time
+
+from django.db import connection
+from django.test.utils import override_settings
+
+from tasks.timing import measure_request
+
+from .endpoints import HOST, endpoints
+from .utils import generate_dataset, timed
+
+MEASURED = ('task_list', 'api_list', 'api_create', 'task_delete')
+
+
+def query_cost_us(queries):
+    """Return the microseconds per ``SELECT 1`` outside and inside a request."""
+    def select():
+        with connection.cursor() as cursor:
+            for _ in range(queries):
+                cursor.execute('SELECT 1')
+
+    outside = timed(select, 20)['p50']
+    with measure_request():
+        inside = timed(select, 20)['p50']
+    return {
+        'outside_us': round(outside * 1000 / queries, 2),
+        'inside_us': round(inside * 1000 / queries, 2),
+        'overhead_us': round((inside - outside) * 1000 / queries, 2),
+    }
+
+
+def run(tasks=2000, tags=50, repeat=200, rounds=5):
+    """
+    Time each measured endpoint with the instrumentation on and off.
+
+    Returns:
+        dict: Median latency in milliseconds per endpoint and setting, and
+        the overhead of the instrumentation.
+    """
+    results = {'tasks': tasks, 'repeat': repeat, 'rounds': rounds,
+               'endpoints': {}}
+    user = generate_dataset(
+        users=1, tasks=tasks, tags=tags, prefix='server-timing',
+    )[0]
+    samples = {name: {True: [], False: []} for name in MEASURED}
+    try:
+        for round_number in range(rounds):
+            for enabled in (True, False)[::1 if round_number % 2 else -1]:
+                with override_settings(
+                    ALLOWED_HOSTS=[HOST], TASKS_LIST_CACHE_TIMEOUT=0,
+                    TASKS_SERVER_TIMING=enabled,
+                ):
+                    calls = endpoints(user, repeat)
+                    for name in MEASURED:
+                        for _ in range(repeat):
+                            start = time.perf_counter()
+                            response = calls[name]()
+                            samples[name][enabled].append(
+                                (time.perf_counter() - start) * 1000
+                            )
+                        assert response.has_header('Server-Timing') == enabled
+    finally:
+        user.delete()
+
+    results['select_1'] = query_cost_us(1000)
+    for name, by_setting in samples.items():
+        on = statistics.median(by_setting[True])
+        off = statistics.median(by_setting[False])
+        results['endpoints'][name] = {
+            'on_ms': round(on, 3),
+            'off_ms': round(off, 3),
+            'overhead_ms': round(on - off, 3),
+            'overhead_pct': round((on - off) / off * 100, 1),
+        }
+    return results
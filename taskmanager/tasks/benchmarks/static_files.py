@@ -0,0 +1,85 @@
+"""
+Compare static file requests before and after the static pipeline change.
+
+- ``before``: WhiteNoise last in ``MIDDLEWARE``, behind sessions, locale,
+  CSRF, authentication and messages, serving plain collected files.
+- ``after``: the project's settings: WhiteNoise right after the security
+  middleware, serving hashed, precompressed files (see ``tasks.storage``).
+
+Static files are collected into temporary directories for both setups.
+Each request comes from a logged-in browser accepting gzip and Brotli, as
+the pages' own asset requests do.
+"""
+
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .utils import rollback_after, seed_dataset, timed
+
+ASSET = 'tasks/css/style.css'
+PLAIN_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+WHITENOISE = 'tasks.middleware.WhiteNoiseMiddleware'
+
+
+def setups():
+    """Return the settings of each compared setup."""
+    middleware = [name for name in settings.MIDDLEWARE if name != WHITENOISE]
+    return {
+        'before': {
+            'MIDDLEWARE': middleware + [WHITENOISE],
+            'STORAGES': {
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': PLAIN_STORAGE},
+            },
+        },
+        'after': {
+            'MIDDLEWARE': settings.MIDDLEWARE,
+            'STORAGES': settings.STORAGES,
+        },
+    }
+
+
+def measure(user, repeat):
+    """Request the asset ``repeat`` times through the full handler."""
+    call_command('collectstatic', interactive=False, verbosity=0)
+    url = staticfiles_storage.url(ASSET)
+    client = Client(HTTP_ACCEPT_ENCODING='br, gzip')
+    client.force_login(user)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200, response.status_code
+    latency = timed(lambda: client.get(url), repeat)
+    return {
+        'url': url,
+        'queries': len(queries),
+        'bytes': len(b''.join(response.streaming_content)),
+        'content_encoding': response.get('Content-Encoding'),
+        'cache_control': response.get('Cache-Control'),
+        'requests_per_s': round(1000 / latency['p50'], 1),
+        'ms': latency,
+    }
+
+
+def run(repeat=2000):
+    """
+    Serve one stylesheet ``repeat`` times in each setup.
+
+    Returns:
+        dict: Throughput, latency, size and caching headers per setup.
+    """
+    results = {'asset': ASSET, 'repeat': repeat}
+    with rollback_after():
+        user = seed_dataset(users=1, tasks=0)[0]
+        for name, overrides in setups().items():
+            with tempfile.TemporaryDirectory() as root, override_settings(
+                STATIC_ROOT=root, DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                **overrides,
+            ):
+                results[name] = measure(user, repeat)
+    return results
@@ -0,0 +1,50 @@
+"""
+Compare tag autocomplete answered from the cached tag index with the
+``name__icontains`` query it replaced, for one user with many tags.
+
+``cached_ms`` includes reading the user's change counter, which keys the
+cached index, and is what a request pays once the index is built;
+``build_ms`` is the cost of the first request after the user's tags
+change.
+"""
+
+from tasks.autocomplete import TagIndex, get_tag_index
+from tasks.models import Tag
+
+from .utils import rollback_after, seed_dataset, timed
+
+TERMS = ['t', 'tag-1', 'tag-42', '99', 'missing']
+
+
+def run(tags=10000, tasks=2000, limit=10, repeat=100):
+    """
+    Seed one user with ``tags`` tags and time autocomplete lookups.
+
+    Returns:
+        dict: Latency of building the index, and per term of the cached
+        index and of the database query.
+    """
+    results = {'tags': tags, 'limit': limit, 'terms': {}}
+
+    with rollback_after():
+        user = seed_dataset(users=1, tasks=tasks, tags=tags, tags_per_task=3)[0]
+        results['build_ms'] = timed(lambda: TagIndex.build(user.pk), repeat // 10)
+
+        get_tag_index(user.pk)
+        for term in TERMS:
+            results['terms'][term] = {
+                'cached_ms': timed(
+                    lambda: get_tag_index(user.pk).search(term, limit),
+                    repeat,
+                ),
+                'database_ms': timed(
+                    lambda: list(
+                        Tag.objects.filter(name__icontains=term, user=user)
+                        .values_list('name', flat=True)
+                        .distinct()
+                    ),
+                    repeat,
+                ),
+            }
+
+    return results
@@ -0,0 +1,104 @@
+"""
+Compare task lists reading tag names through the tag links with lists
+reading them from ``Task.tag_list``.
+
+``join`` loads the card columns, then the tag names of the loaded tasks
+with a query joining the links to the tags, as the list did before.
+``column`` is what ``tasks.listing`` does now: one query, tag names
+included. Both are timed for one page of the HTML list and for the whole
+list, and the API list is timed with tags prefetched against read from
+the column (the prefetch orders tags by id, the column by name).
+"""
+
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.utils import timezone
+
+from tasks.listing import TaskRow
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
+
+from .utils import profiled, rollback_after, seed_dataset
+
+ROW_FIELDS = tuple(field for field in Task.ROW_FIELDS if field != 'tag_list')
+
+
+def joined_rows(queryset, today):
+    """Load task rows and attach their tag names from the tag links."""
+    rows = []
+    by_id = {}
+    for values in queryset.rows(today).values_list(*ROW_FIELDS):
+        row = TaskRow.from_values((*values, []))
+        rows.append(row)
+        by_id[row.id] = row
+    for task_id, tag_id, name in (
+        Task.tags.through.objects.filter(task_id__in=list(by_id))
+        .order_by('tag__name')
+        .values_list('task_id', 'tag_id', 'tag__name')
+    ):
+        by_id[task_id].tag_list.append([tag_id, name])
+    return rows
+
+
+def column_rows(queryset, today):
+    """Load task rows with their tag names, as the task list does."""
+    return [TaskRow.from_values(values) for values in queryset.rows(today)]
+
+
+def prefetched_api(queryset, context):
+    """Serialize tasks with their tags prefetched, as the API did."""
+    tasks = list(queryset.with_tags())
+    for task in tasks:
+        task.tag_list = [[tag.pk, tag.name] for tag in task.tags.all()]
+    return TaskSerializer(tasks, many=True, context=context).data
+
+
+def column_api(queryset, context):
+    """Serialize tasks from their tag lists, as the API does."""
+    return TaskSerializer(queryset.all(), many=True, context=context).data
+
+
+def run(tasks=10000, tags=50, tags_per_task=3, page_size=None, repeat=20):
+    """
+    Seed one user and time the task list with and without the join.
+
+    Args:
+        page_size (int, optional): Tasks per page; defaults to
+            ``TASKS_PAGE_SIZE``.
+
+    Returns:
+        dict: Latency, queries and memory of each way, per list size.
+    """
+    page_size = page_size or getattr(settings, 'TASKS_PAGE_SIZE', 50)
+    today = timezone.localdate()
+    results = {
+        'tasks': tasks, 'tags_per_task': tags_per_task, 'page_size': page_size,
+    }
+
+    with rollback_after():
+        user = seed_dataset(
+            users=1, tasks=tasks, tags=tags, tags_per_task=tags_per_task,
+        )[0]
+        queryset = Task.objects.for_listing(user)
+        page = queryset[:page_size]
+        context = {
+            'request': SimpleNamespace(user=user, GET={}),
+            'embed_tags': True,
+        }
+        assert (
+            [row.tag_list for row in joined_rows(queryset, today)]
+            == [row.tag_list for row in column_rows(queryset, today)]
+        )
+        checks = {
+            'page': (page, joined_rows, column_rows, today),
+            'list': (queryset, joined_rows, column_rows, today),
+            'api_page': (page, prefetched_api, column_api, context),
+        }
+        for name, (tasks_queryset, join, column, arg) in checks.items():
+            results[name] = {
+                'join': profiled(lambda: join(tasks_queryset, arg), repeat),
+                'column': profiled(lambda: column(tasks_queryset, arg), repeat),
+            }
+
+    return results
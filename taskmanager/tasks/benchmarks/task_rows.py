@@ -0,0 +1,86 @@
+"""
+Compare the task list loaded as model instances, highlighted in Python,
+with the slotted rows of ``tasks.listing``, per 10k tasks.
+
+``instances`` is what the list view did before: full tasks with their
+prefetched tags, descriptions included, and a loop setting the due-date
+highlights. ``rows`` loads the card columns with the urgency computed by
+the database. Memory is the peak traced by ``tracemalloc`` while loading.
+"""
+
+import tracemalloc
+
+from django.utils import timezone
+
+from tasks.listing import TaskRow
+from tasks.models import Task
+
+from .utils import rollback_after, seed_dataset, timed
+
+
+def highlight(tasks, today):
+    """Set the highlights of model instances, as the list view used to."""
+    for task in tasks:
+        if task.status == Task.STATUS_COMPLETED:
+            task.card_highlight = 'list-group-item-success'
+            task.due_highlight = 'text-muted'
+        elif task.due_date and task.due_date < today:
+            task.card_highlight = ''
+            task.due_highlight = 'text-danger'
+        elif task.due_date == today:
+            task.card_highlight = ''
+            task.due_highlight = 'text-warning'
+        else:
+            task.card_highlight = ''
+            task.due_highlight = 'text-muted'
+    return tasks
+
+
+def peak_kib(func):
+    """Return the peak memory allocated while calling ``func``, in KiB."""
+    tracemalloc.start()
+    try:
+        func()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def run(tasks=10000, description_size=2000, repeat=10):
+    """
+    Seed one user with ``tasks`` tasks and time loading the whole list.
+
+    Args:
+        description_size (int): Length of each task's description.
+
+    Returns:
+        dict: Time and peak memory per 10k rows for both ways.
+    """
+    today = timezone.localdate()
+    scale = 10000 / tasks
+    results = {'tasks': tasks, 'description_size': description_size}
+
+    with rollback_after():
+        user = seed_dataset(users=1, tasks=tasks)[0]
+        Task.objects.filter(user=user).update(description='x' * description_size)
+        queryset = Task.objects.for_listing(user)
+
+        loaders = {
+            'instances': lambda: highlight(
+                list(queryset.with_tags()), today,
+            ),
+            'rows': lambda: [
+                TaskRow.from_values(values) for values in queryset.rows(today)
+            ],
+        }
+        for name, load in loaders.items():
+            latency = timed(load, repeat)
+            results[name] = {
+                'ms_per_10k': {
+                    stat: round(value * scale, 3)
+                    for stat, value in latency.items()
+                },
+                'peak_kib_per_10k': round(peak_kib(load) * scale, 1),
+            }
+
+    return results
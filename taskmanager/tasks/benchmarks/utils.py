@@ -0,0 +1,257 @@
+"""Helpers shared by the benchmark modules."""
+
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import time as clock_time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tasks.models import Task, Tag
+from tasks.search import index_tasks
+from tasks.signals import bulk_changes
+from tasks.tags import refresh_tag_lists
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    """Raised to roll back the data seeded by a benchmark."""
+
+
+@contextmanager
+def rollback_after():
+    """
+    Run the block inside a transaction that is always rolled back.
+
+    Example:
+        with rollback_after():
+            seed_dataset(...)
+            measure(...)
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def seed_dataset(users=1, tasks=1000, tags=20, tags_per_task=2, seed=0):
+    """
+    Create users with tasks and tags using bulk inserts.
+
+    Args:
+        users (int): Number of users to create.
+        tasks (int): Tasks per user.
+        tags (int): Distinct tags per user.
+        tags_per_task (int): Tags attached to each task.
+        seed (int): Seed for the random generator.
+
+    Returns:
+        list: The created users.
+    """
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    statuses = [choice for choice, _ in Task.STATUS_CHOICES]
+    Through = Tag.tasks.through
+    created_users = []
+
+    for index in range(users):
+        user = User.objects.create(username=f'bench-{seed}-{index}')
+        created_users.append(user)
+        user_tags = Tag.objects.bulk_create(
+            Tag(name=f'tag-{number}', user=user) for number in range(tags)
+        )
+        user_tasks = Task.objects.bulk_create(
+            Task(
+                title=f'Task {number}',
+                description='Benchmark task',
+                status=rng.choice(statuses),
+                due_date=(
+                    today + timedelta(days=rng.randint(-30, 60))
+                    if rng.random() < 0.7 else None
+                ),
+                user=user,
+            )
+            for number in range(tasks)
+        )
+        Through.objects.bulk_create(
+            Through(task_id=task.id, tag_id=tag.id)
+            for task in user_tasks
+            for tag in rng.sample(user_tags, min(tags_per_task, len(user_tags)))
+        )
+        refresh_tag_lists(task.id for task in user_tasks)
+
+    analyze_tables()
+    return created_users
+
+
+# Words of generated titles, descriptions and tag names.
+WORDS = (
+    'report budget review meeting client invoice design release deploy '
+    'backup server database migration test bug fix refactor document plan '
+    'call email order payment contract draft proposal research survey '
+    'schedule travel ticket booking dentist doctor groceries gym rent '
+    'insurance tax audit slides demo training hiring interview onboarding '
+    'feedback roadmap sprint backlog metrics dashboard alert incident '
+    'security update upgrade license renewal garden car repair birthday'
+).split()
+
+# Share of tasks in each status, and of tasks with 0 to 4 tags.
+STATUS_WEIGHTS = {
+    Task.STATUS_PENDING: 45,
+    Task.STATUS_IN_PROGRESS: 20,
+    Task.STATUS_COMPLETED: 35,
+}
+TAG_COUNT_WEIGHTS = [15, 35, 30, 15, 5]
+
+
+def generate_dataset(users=10, tasks=1000, tags=50, seed=0, prefix='bench',
+                     password=None):
+    """
+    Create users with realistically distributed tasks and tags.
+
+    Unlike ``seed_dataset``, which spreads tags and statuses evenly, the
+    data looks like real lists: most tasks are pending or done, 35% have
+    no due date and the others cluster around the next weeks with some
+    overdue, tags are reused following a Zipf distribution, and titles and
+    descriptions are drawn from a word list so searches match a realistic
+    share of tasks. The same ``seed`` always generates the same data.
+
+    Search entries are written too; change counters and stamps keep their
+    initial values.
+
+    Args:
+        users (int): Number of users to create.
+        tasks (int): Tasks per user.
+        tags (int): Distinct tags per user.
+        seed (int): Seed for the random generator.
+        prefix (str): Start of the generated usernames.
+        password (str, optional): Password of every user; without one they
+            can't log in.
+
+    Returns:
+        list: The created users.
+    """
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    statuses = list(STATUS_WEIGHTS)
+    status_weights = list(STATUS_WEIGHTS.values())
+    tag_weights = [1 / rank ** 1.1 for rank in range(1, tags + 1)]
+    Through = Tag.tasks.through
+    # Hashed once: hashing is meant to be slow.
+    password_hash = make_password(password)
+    created_users = []
+
+    def words(low, high):
+        return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+    def due_date():
+        if rng.random() < 0.35:
+            return None
+        days = round(rng.gauss(10, 20))
+        return today + timedelta(days=max(-60, min(120, days)))
+
+    for index in range(users):
+        user = User.objects.create(
+            username=f'{prefix}-{seed}-{index}',
+            password=password_hash,
+        )
+        created_users.append(user)
+        names = rng.sample(WORDS, min(tags, len(WORDS)))
+        names += [
+            f'{rng.choice(WORDS)}-{number}'
+            for number in range(len(names), tags)
+        ]
+        with bulk_changes():
+            user_tags = Tag.objects.bulk_create(
+                Tag(name=name, user=user) for name in names
+            )
+            user_tasks = Task.objects.bulk_create(
+                Task(
+                    title=words(2, 6).capitalize(),
+                    description=words(5, 30) if rng.random() < 0.6 else '',
+                    status=rng.choices(statuses, status_weights)[0],
+                    due_date=(date := due_date()),
+                    due_time=(
+                        clock_time(rng.randint(8, 19), rng.choice([0, 30]))
+                        if date and rng.random() < 0.3 else None
+                    ),
+                    user=user,
+                )
+                for _ in range(tasks)
+            )
+            links = set()
+            for task in user_tasks:
+                count = rng.choices(range(5), TAG_COUNT_WEIGHTS)[0]
+                for tag in rng.choices(user_tags, tag_weights, k=count):
+                    links.add((task.id, tag.id))
+            Through.objects.bulk_create(
+                Through(task_id=task_id, tag_id=tag_id)
+                for task_id, tag_id in sorted(links)
+            )
+            refresh_tag_lists(task.id for task in user_tasks)
+        index_tasks(task.id for task in user_tasks)
+
+    analyze_tables()
+    return created_users
+
+
+def analyze_tables():
+    """Refresh planner statistics so query plans reflect the seeded data."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def timed(func, repeat=20):
+    """
+    Call ``func`` repeatedly and return latency statistics in milliseconds.
+
+    Returns:
+        dict: ``p50``, ``p99``, ``min`` and ``max`` latencies.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50': round(statistics.median(samples), 3),
+        'p99': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+        'min': round(samples[0], 3),
+        'max': round(samples[-1], 3),
+    }
+
+
+def profiled(func, repeat=20):
+    """
+    Measure a call like ``timed`` and add its queries and peak memory.
+
+    The queries and memory are those of one more call, made after the
+    timed ones so caches are as warm as in the timed calls.
+
+    Returns:
+        dict: ``ms`` latency statistics, the ``queries`` of a call and its
+        ``peak_kib`` of Python memory allocations.
+    """
+    latency = timed(func, repeat)
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        'ms': latency,
+        'queries': len(queries),
+        'peak_kib': round(peak / 1024, 1),
+    }
@@ -0,0 +1,450 @@
+"""
+Bulk create, update, status change and delete of a user's tasks.
+
+Each batch is validated item by item, then every valid item is written in
+one transaction with a fixed number of queries: ``bulk_create`` and
+``bulk_update`` for the tasks, one insert and one delete for the tag
+links, and ``resolve_tags`` once for all tag names of the batch. Items
+that fail validation are reported back with their index and skipped.
+
+The per-task signal receivers stand aside during a batch and
+``tasks_bulk_changed`` is sent once for it instead.
+"""
+
+from bisect import insort
+from dataclasses import dataclass, field
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Tag, Task
+from .serializers import (
+    BulkIdsSerializer,
+    BulkStatusSerializer,
+    BulkTaskSerializer,
+)
+from .signals import bulk_changes, tasks_bulk_changed
+from .tags import make_tag_list, normalize_tag_names, resolve_tags
+
+DEFAULT_MAX_BATCH_SIZE = 500
+
+TASK_FIELDS = ['title', 'description', 'status', 'due_date', 'recurrence']
+
+TaskTag = Task.tags.through
+
+
+def get_max_batch_size():
+    """Return the largest number of items accepted in one batch."""
+    return getattr(
+        settings, 'TASKS_BULK_MAX_BATCH_SIZE', DEFAULT_MAX_BATCH_SIZE
+    )
+
+
+def does_not_exist(pk):
+    """Return the error reported for an unknown task or tag id."""
+    return serializers.PrimaryKeyRelatedField.default_error_messages[
+        'does_not_exist'
+    ].format(pk_value=pk)
+
+
+def invalid_id():
+    """Return the error reported for an id that isn't an integer."""
+    return serializers.IntegerField.default_error_messages['invalid']
+
+
+def is_task_id(value):
+    """Return True if ``value`` can be a task id; booleans can't."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+@dataclass
+class BulkResult:
+    """
+    Outcome of a bulk operation.
+
+    Attributes:
+        tasks (list): Tasks written, in the order of the request.
+        task_ids (list): Ids of the tasks written, in the same order.
+        errors (list): ``{'index': ..., 'errors': ...}`` for every item
+            that was rejected, ``index`` being its position in the request.
+    """
+
+    tasks: list = field(default_factory=list)
+    task_ids: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+    def reject(self, index, errors):
+        """Record the validation errors of an item."""
+        insort(
+            self.errors,
+            {'index': index, 'errors': errors},
+            key=itemgetter('index'),
+        )
+
+
+def check_batch(items):
+    """
+    Check that the request body is a list of acceptable length.
+
+    Raises:
+        ValidationError: If it isn't.
+    """
+    batch = serializers.ListField(
+        allow_empty=False,
+        max_length=get_max_batch_size(),
+    )
+    return batch.run_validation(items)
+
+
+def validate_items(user, entries, result, context):
+    """
+    Validate batch items with ``BulkTaskSerializer``.
+
+    Tag ids are checked against the user's tags with one query for the
+    whole batch, which also reads their names.
+
+    Args:
+        user: Owner of the tasks.
+        entries (list): ``(index, item, instance)`` for each item, with
+            ``instance`` None when the item creates a task.
+        result (BulkResult): Collects the errors of rejected items.
+        context (dict): Serializer context.
+
+    Returns:
+        tuple: ``(index, instance, validated_data)`` of the valid items,
+        and the names of the tags they give by id, by tag id.
+    """
+    valid = []
+    for index, item, instance in entries:
+        serializer = BulkTaskSerializer(
+            instance,
+            data=item,
+            partial=instance is not None,
+            context=context,
+        )
+        if serializer.is_valid():
+            valid.append((index, instance, serializer.validated_data))
+        else:
+            result.reject(index, serializer.errors)
+
+    requested = {
+        tag_id for _, _, data in valid for tag_id in data.get('tags', [])
+    }
+    known = dict(
+        Tag.objects.filter(user=user, pk__in=requested)
+        .values_list('pk', 'name')
+    ) if requested else {}
+
+    checked = []
+    for index, instance, data in valid:
+        unknown = [pk for pk in data.get('tags', []) if pk not in known]
+        if unknown:
+            result.reject(index, {'tags': [does_not_exist(pk) for pk in unknown]})
+        else:
+            checked.append((index, instance, data))
+    return checked, known
+
+
+def tags_by_name(user, valid):
+    """Resolve the tag names of every valid item with one call."""
+    names = [
+        name for _, _, data in valid for name in data.get('tags_names', [])
+    ]
+    return {tag.name: tag for tag in resolve_tags(user, names)}
+
+
+def link_tags(links):
+    """Insert ``(task_id, tag_id)`` links that don't exist yet."""
+    TaskTag.objects.bulk_create(
+        [TaskTag(task_id=task_id, tag_id=tag_id) for task_id, tag_id in links],
+        ignore_conflicts=True,
+    )
+
+
+def fetch_results(result):
+    """Load the written tasks with their tags, in request order."""
+    tasks = Task.objects.filter(pk__in=result.task_ids).in_bulk()
+    result.tasks = [tasks[pk] for pk in result.task_ids if pk in tasks]
+    return result
+
+
+def bulk_create_tasks(user, items, context):
+    """
+    Create tasks from a list of serialized items.
+
+    Tags given by id and by name are both attached, as in
+    ``TaskSerializer.create``.
+
+    Returns:
+        BulkResult: The created tasks and rejected items.
+    """
+    result = BulkResult()
+    entries = [
+        (index, item, None) for index, item in enumerate(check_batch(items))
+    ]
+    valid, tag_names = validate_items(user, entries, result, context)
+    if not valid:
+        return result
+
+    with transaction.atomic(), bulk_changes():
+        named_tags = tags_by_name(user, valid)
+        tag_names.update((tag.pk, tag.name) for tag in named_tags.values())
+        tasks = []
+        task_tag_ids = []
+        now = timezone.now()
+        for _, _, data in valid:
+            tag_ids = list(data.get('tags', []))
+            tag_ids += [
+                named_tags[name].pk
+                for name in normalize_tag_names(data.get('tags_names', []))
+            ]
+            tag_ids = list(dict.fromkeys(tag_ids))
+            task = Task(
+                user=user,
+                tag_list=make_tag_list(
+                    (tag_id, tag_names[tag_id]) for tag_id in tag_ids
+                ),
+                **{
+                    name: value for name, value in data.items()
+                    if name in TASK_FIELDS
+                },
+            )
+            task.set_completed_at(now)
+            task.set_recurrence_start()
+            tasks.append(task)
+            task_tag_ids.append(tag_ids)
+        tasks = Task.objects.bulk_create(tasks)
+        link_tags(
+            (task.pk, tag_id)
+            for task, tag_ids in zip(tasks, task_tag_ids)
+            for tag_id in tag_ids
+        )
+
+        result.task_ids = [task.pk for task in tasks]
+        tasks_bulk_changed.send(
+            sender=Task, user_id=user.pk, task_ids=result.task_ids,
+            created=True,
+        )
+    return fetch_results(result)
+
+
+def bulk_update_tasks(user, items, context):
+    """
+    Partially update tasks from a list of items carrying their ``id``.
+
+    As in ``TaskSerializer.update``, non-empty ``tags_names`` replace the
+    task's tags, otherwise ``tags`` does when given.
+
+    Returns:
+        BulkResult: The updated tasks and rejected items.
+    """
+    result = BulkResult()
+    items = check_batch(items)
+
+    ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+    tasks = Task.objects.filter(
+        user=user,
+        pk__in=[pk for pk in ids if is_task_id(pk)],
+    ).in_bulk()
+
+    entries = []
+    seen = set()
+    for index, (item, pk) in enumerate(zip(items, ids)):
+        if not is_task_id(pk):
+            result.reject(index, {'id': [invalid_id()]})
+        elif pk not in tasks or pk in seen:
+            result.reject(index, {'id': [does_not_exist(pk)]})
+        else:
+            seen.add(pk)
+            entries.append((index, item, tasks[pk]))
+    valid, tag_names = validate_items(user, entries, result, context)
+    if not valid:
+        return result
+
+    with transaction.atomic(), bulk_changes():
+        named_tags = tags_by_name(user, valid)
+        tag_names.update((tag.pk, tag.name) for tag in named_tags.values())
+        changed_fields = set()
+        new_tags = {}
+        for _, task, data in valid:
+            anchor = (task.recurrence, task.due_date)
+            for name, value in data.items():
+                if name in TASK_FIELDS:
+                    setattr(task, name, value)
+                    changed_fields.add(name)
+            # As in TaskSerializer.update, a new rule or due date anchors
+            # the series again.
+            task.set_recurrence_start(
+                restart=(task.recurrence, task.due_date) != anchor,
+            )
+            names = normalize_tag_names(data.get('tags_names', []))
+            if names:
+                new_tags[task.pk] = {named_tags[name].pk for name in names}
+            elif 'tags' in data:
+                new_tags[task.pk] = set(data['tags'])
+            if task.pk in new_tags:
+                task.tag_list = make_tag_list(
+                    (tag_id, tag_names[tag_id]) for tag_id in new_tags[task.pk]
+                )
+                changed_fields.add('tag_list')
+
+        updated = [task for _, task, _ in valid]
+        if 'status' in changed_fields:
+            changed_fields.add('completed_at')
+        if changed_fields & {'recurrence', 'due_date'}:
+            changed_fields.add('recurrence_start')
+        if changed_fields or new_tags:
+            now = timezone.now()
+            for task in updated:
+                task.updated_at = now
+                task.set_completed_at(now)
+            Task.objects.bulk_update(
+                updated, sorted(changed_fields | {'updated_at'}),
+            )
+
+        detached = set()
+        if new_tags:
+            current = TaskTag.objects.filter(task_id__in=new_tags)
+            stale = []
+            existing = set()
+            for link_id, task_id, tag_id in current.values_list(
+                'pk', 'task_id', 'tag_id',
+            ):
+                if tag_id in new_tags[task_id]:
+                    existing.add((task_id, tag_id))
+                else:
+                    stale.append(link_id)
+                    detached.add(tag_id)
+            if stale:
+                TaskTag.objects.filter(pk__in=stale).delete()
+            link_tags(
+                (task_id, tag_id)
+                for task_id, tag_ids in new_tags.items()
+                for tag_id in tag_ids
+                if (task_id, tag_id) not in existing
+            )
+
+        result.task_ids = [task.pk for task in updated]
+        tasks_bulk_changed.send(
+            sender=Task,
+            user_id=user.pk,
+            task_ids=result.task_ids,
+            detached_tag_ids=detached,
+        )
+    return fetch_results(result)
+
+
+def find_tasks(user, data, result):
+    """
+    Return the ids of ``data['ids']`` that belong to the user's tasks.
+
+    Unknown and repeated ids are rejected in ``result``.
+    """
+    existing = set(
+        Task.objects.filter(user=user, pk__in=data['ids'])
+        .values_list('pk', flat=True)
+    )
+    found = []
+    for index, pk in enumerate(data['ids']):
+        if pk in existing:
+            existing.discard(pk)
+            found.append(pk)
+        else:
+            result.reject(index, {'id': [does_not_exist(pk)]})
+    return found
+
+
+def bulk_set_status(user, data, context):
+    """
+    Set the status of several tasks with one UPDATE.
+
+    Args:
+        data (dict): ``{'ids': [...], 'status': ...}``.
+
+    Returns:
+        BulkResult: The updated tasks and rejected ids.
+
+    Raises:
+        ValidationError: If the request itself is malformed.
+    """
+    serializer = BulkStatusSerializer(data=data, context=context)
+    serializer.is_valid(raise_exception=True)
+    result = BulkResult()
+    task_ids = find_tasks(user, serializer.validated_data, result)
+    if not task_ids:
+        return result
+
+    new_status = serializer.validated_data['status']
+    now = timezone.now()
+    if new_status == Task.STATUS_COMPLETED:
+        # Tasks completed already keep their completion time.
+        completed_at = Case(
+            When(status=Task.STATUS_COMPLETED, then=F('completed_at')),
+            default=Value(now),
+        )
+    else:
+        completed_at = None
+    with transaction.atomic(), bulk_changes():
+        Task.objects.filter(pk__in=task_ids).update(
+            status=new_status,
+            completed_at=completed_at,
+            updated_at=now,
+        )
+        result.task_ids = task_ids
+        tasks_bulk_changed.send(
+            sender=Task,
+            user_id=user.pk,
+            task_ids=task_ids,
+            status=new_status,
+        )
+    return fetch_results(result)
+
+
+def bulk_delete_tasks(user, data, context):
+    """
+    Delete several tasks, reading their tag links with one query.
+
+    The stored occurrences of deleted recurring tasks are deleted with
+    them, by cascade, and reported along with them to the receivers of
+    ``tasks_bulk_changed``.
+
+    Args:
+        data (dict): ``{'ids': [...]}``.
+
+    Returns:
+        BulkResult: The deleted ids and rejected ids.
+
+    Raises:
+        ValidationError: If the request itself is malformed.
+    """
+    serializer = BulkIdsSerializer(data=data, context=context)
+    serializer.is_valid(raise_exception=True)
+    result = BulkResult()
+    task_ids = find_tasks(user, serializer.validated_data, result)
+    if not task_ids:
+        return result
+
+    with transaction.atomic(), bulk_changes():
+        deleted_ids = task_ids + list(
+            Task.objects.filter(recurrence_of__in=task_ids)
+            .exclude(pk__in=task_ids)
+            .values_list('pk', flat=True)
+        )
+        detached = set(
+            TaskTag.objects.filter(task_id__in=deleted_ids)
+            .values_list('tag_id', flat=True)
+        )
+        Task.objects.filter(pk__in=task_ids).delete()
+        result.task_ids = task_ids
+        tasks_bulk_changed.send(
+            sender=Task,
+            user_id=user.pk,
+            task_ids=deleted_ids,
+            detached_tag_ids=detached,
+            deleted=True,
+        )
+    return result
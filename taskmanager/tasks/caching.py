@@ -0,0 +1,176 @@
+"""
+Versioned caching and conditional GET for a user's task lists.
+
+Every user has a ``ChangeCounter`` bumped in the same transaction as any
+change to their tasks or tags (see ``tasks.signals``). Cached list
+responses are stored under keys holding the counter, so a change makes
+the old entries unreachable instead of having to find and delete them.
+The counter also gives lists an ETag and a Last-Modified date, letting
+clients revalidate an unchanged list with a 304 that reads nothing but
+the counter row.
+
+Keys and ETags also hold the language, today's date (due-date highlights
+depend on it) and the full URL, i.e. the filter, search, cursor and page
+size.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+from .models import ChangeCounter
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def bump_change_counters(user_ids):
+    """
+    Record a change to the tasks of the given users.
+
+    Args:
+        user_ids (Iterable[int]): Users whose lists changed.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    counters = ChangeCounter.objects.filter(user_id__in=user_ids)
+    changes = {'value': F('value') + 1, 'changed_at': timezone.now()}
+    if counters.update(**changes) < len(user_ids):
+        # First change of some users: create their counters, then count
+        # the change for them too.
+        existing = set(counters.values_list('user_id', flat=True))
+        ChangeCounter.objects.bulk_create(
+            [
+                ChangeCounter(user_id=user_id)
+                for user_id in user_ids - existing
+            ],
+            ignore_conflicts=True,
+        )
+        ChangeCounter.objects.filter(
+            user_id__in=user_ids - existing,
+        ).update(**changes)
+
+
+def get_change_counter(user):
+    """Return the user's change counter, creating it if missing."""
+    return ChangeCounter.objects.get_or_create(user=user)[0]
+
+
+async def aget_change_counter(user):
+    """Async version of ``get_change_counter``."""
+    return (await ChangeCounter.objects.aget_or_create(user=user))[0]
+
+
+def digest(*parts):
+    """Return a short hash of the given values."""
+    raw = '\0'.join(str(part) for part in parts).encode()
+    return hashlib.md5(raw, usedforsecurity=False).hexdigest()
+
+
+class ListCache:
+    """
+    Cache entry and validators of one task list response.
+
+    Example:
+        list_cache = ListCache(request, 'api')
+        response = list_cache.not_modified()
+        if response is None:
+            data = list_cache.get()
+            ...
+        return list_cache.patch(response)
+
+    Async views build it with ``await ListCache.acreate(...)`` and use
+    ``aget()`` and ``aset()``.
+    """
+
+    def __init__(self, request, kind, csrf=False, counter=None):
+        """
+        Args:
+            request: The list request.
+            kind (str): Name of the response format, e.g. ``'html'``.
+            csrf (bool): Whether the response embeds a CSRF token.
+            counter (ChangeCounter, optional): Change counter of the
+                user, read from the database when not given.
+        """
+        self.request = request
+        self.counter = counter or get_change_counter(request.user)
+        version = digest(
+            kind,
+            self.counter.user_id,
+            self.counter.value,
+            self.counter.changed_at.isoformat(),
+            get_language(),
+            timezone.localdate().isoformat(),
+            request.build_absolute_uri(),
+        )
+        self.key = f'tasks:list:{version}'
+        self.last_modified = int(self.counter.changed_at.timestamp())
+        csrf_secret = ''
+        if csrf:
+            # The page's CSRF token depends on the secret, which changes
+            # when the user logs in again. get_token() picks the secret the
+            # response will use, even when the request has no cookie yet.
+            get_token(request)
+            csrf_secret = request.META.get('CSRF_COOKIE', '')
+        # AJAX requests get a fragment instead of the page.
+        self.etag = quote_etag(digest(
+            version,
+            csrf_secret,
+            request.headers.get('X-Requested-With', ''),
+        ))
+
+    @classmethod
+    async def acreate(cls, request, user, kind, csrf=False):
+        """Build the list cache of ``user`` with the async ORM."""
+        counter = await aget_change_counter(user)
+        return cls(request, kind, csrf=csrf, counter=counter)
+
+    def not_modified(self):
+        """Return a 304 response if the client's copy is current."""
+        return get_conditional_response(
+            self.request,
+            etag=self.etag,
+            last_modified=self.last_modified,
+        )
+
+    def get(self):
+        """Return the cached data, or None."""
+        return cache.get(self.key)
+
+    async def aget(self):
+        """Async version of ``get``."""
+        return await cache.aget(self.key)
+
+    def set(self, data):
+        """Cache the data of this list."""
+        cache.set(self.key, data, self.timeout())
+
+    async def aset(self, data):
+        """Async version of ``set``."""
+        await cache.aset(self.key, data, self.timeout())
+
+    @staticmethod
+    def timeout():
+        """Return how long list entries are cached."""
+        return getattr(settings, 'TASKS_LIST_CACHE_TIMEOUT', CACHE_TIMEOUT)
+
+    def patch(self, response):
+        """Add the validators and caching headers to a response."""
+        if response.status_code in (200, 304):
+            response['ETag'] = self.etag
+            response['Last-Modified'] = http_date(self.last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Cookie', 'X-Requested-With'])
+        return response
+
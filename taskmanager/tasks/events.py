@@ -0,0 +1,287 @@
+"""
+Live events of task changes, streamed to the task list with Server-Sent
+Events.
+
+Signals collect the tasks a transaction creates, updates or deletes, and
+publish one event per task to the owner's channel once it commits (see
+``tasks.signals``). The ``task_events`` view subscribes to the channel of
+the requesting user and streams its events, which the task list applies
+in place instead of being reloaded.
+
+Events go through the broker chosen by ``TASKS_EVENTS_BROKER``:
+
+- ``'memory'``: subscribers of the current process only, enough for a
+  single ASGI worker.
+- ``'redis'``: Redis pub/sub at ``TASKS_EVENTS_REDIS_URL``, a ``redis://``
+  or ``unix://`` socket URL, reaching the subscribers of every worker.
+  Each process reads all channels on one connection and hands events to
+  its own subscribers. Needs the ``redis`` package.
+
+A subscriber is an ``asyncio.Queue`` in the event loop serving its stream,
+so an idle stream costs a few objects and no database connection. A
+subscriber too slow to keep up gets a ``resync`` event instead of the
+events it missed.
+"""
+
+import asyncio
+import json
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .transactions import OnCommitBatch
+
+CREATED = 'created'
+UPDATED = 'updated'
+STATUS = 'status'
+DELETED = 'deleted'
+RESYNC = 'resync'
+
+# When a transaction changes a task several times, its strongest event wins.
+STRENGTH = {STATUS: 0, UPDATED: 1, CREATED: 2, DELETED: 3}
+
+# Fields saved by a status change; such saves send a STATUS event.
+STATUS_FIELDS = frozenset(
+    {'status', 'completed_at', 'updated_at', 'change_seq'}
+)
+
+DEFAULT_QUEUE_SIZE = 100
+CHANNEL_PREFIX = 'tasks:events:'
+
+
+def channel_name(user_id):
+    """Return the broker channel of a user's events."""
+    return f'{CHANNEL_PREFIX}{user_id}'
+
+
+class Subscription:
+    """
+    Events of one user read by one stream, queued in its event loop.
+
+    Used as an async context manager, which registers it with the broker
+    on entry and removes it on exit.
+    """
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = None
+        self.queue = asyncio.Queue(
+            getattr(settings, 'TASKS_EVENTS_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        )
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        await self.broker.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.broker.remove(self)
+
+    def deliver(self, events):
+        """Queue events; must run in the subscription's event loop."""
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The client reloads its list rather than missing events.
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait({'type': RESYNC})
+                return
+
+    async def get(self):
+        """Wait for the next event."""
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """Pass events to the subscribers of the current process."""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Return a subscription to a user's events."""
+        return Subscription(self, user_id)
+
+    async def add(self, subscription):
+        """Register a subscription entering its ``async with`` block."""
+        with self.lock:
+            self.subscribers.setdefault(subscription.user_id, set()).add(
+                subscription
+            )
+
+    async def remove(self, subscription):
+        """Unregister a subscription leaving its ``async with`` block."""
+        with self.lock:
+            subscriptions = self.subscribers.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscribers.pop(subscription.user_id, None)
+
+    def publish(self, user_id, events):
+        """
+        Send a user's events to their subscribers.
+
+        Safe to call from any thread, e.g. from a sync view's on-commit
+        callback; each subscriber gets the events in its own event loop.
+
+        Args:
+            user_id (int): Owner of the changed tasks.
+            events (list): Events as JSON-serializable dicts.
+        """
+        self.fan_out(user_id, events)
+
+    def fan_out(self, user_id, events):
+        """Hand events to the subscribers of this process."""
+        with self.lock:
+            subscriptions = list(self.subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            if subscription.loop.is_closed():
+                continue
+            subscription.loop.call_soon_threadsafe(
+                subscription.deliver, events,
+            )
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Pass events through Redis pub/sub to the subscribers of every process.
+
+    Events are published to the user's channel. Each event loop with
+    subscribers reads every channel on one pattern subscription, started
+    with its first subscriber, and fans the events out locally.
+    """
+
+    def __init__(self, url=None):
+        super().__init__()
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as exc:
+            raise ImproperlyConfigured(
+                "The 'redis' events broker requires the redis package."
+            ) from exc
+        self.url = url or getattr(
+            settings, 'TASKS_EVENTS_REDIS_URL', 'redis://localhost:6379/0'
+        )
+        self.client = redis.Redis.from_url(self.url)
+        self.async_redis = redis.asyncio
+        self.readers = {}
+
+    def publish(self, user_id, events):
+        """Publish a user's events to their Redis channel."""
+        self.client.publish(channel_name(user_id), json.dumps(events))
+
+    async def add(self, subscription):
+        """Register a subscription, starting this loop's reader if needed."""
+        await super().add(subscription)
+        loop = subscription.loop
+        reader = self.readers.get(loop)
+        if reader is None or reader.done():
+            ready = loop.create_future()
+            self.readers[loop] = loop.create_task(self.read(ready))
+            try:
+                await ready
+            except Exception:
+                await self.remove(subscription)
+                raise
+
+    async def read(self, ready):
+        """Fan out the events of every channel until cancelled."""
+        client = self.async_redis.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+            ready.set_result(None)
+            async for message in pubsub.listen():
+                if message['type'] != 'pmessage':
+                    continue
+                channel = message['channel'].decode()
+                user_id = int(channel[len(CHANNEL_PREFIX):])
+                self.fan_out(user_id, json.loads(message['data']))
+        except Exception as exc:
+            if not ready.done():
+                ready.set_exception(exc)
+            raise
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+BROKERS = {
+    'memory': InProcessBroker,
+    'redis': RedisBroker,
+}
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Return the process's broker selected by ``TASKS_EVENTS_BROKER``."""
+    name = getattr(settings, 'TASKS_EVENTS_BROKER', None) or 'memory'
+    try:
+        return BROKERS[name]()
+    except KeyError:
+        raise ImproperlyConfigured(f'Unknown events broker {name!r}.')
+
+
+def merge_events(changes):
+    """
+    Turn the changes of a transaction into one event per task.
+
+    Args:
+        changes (Iterable[tuple]): ``(type, task_id, status)`` triples;
+            ``status`` is only set for ``STATUS`` changes.
+
+    Returns:
+        list: Events ordered by task id.
+    """
+    merged = {}
+    for kind, task_id, status in changes:
+        event = {'type': kind, 'id': task_id}
+        if kind == STATUS:
+            event['status'] = status
+        current = merged.get(task_id)
+        if current is None or STRENGTH[kind] > STRENGTH[current['type']]:
+            merged[task_id] = event
+        elif kind == STATUS == current['type'] and status != current['status']:
+            # Changed twice: the order of the changes isn't known.
+            merged[task_id] = {'type': UPDATED, 'id': task_id}
+    return [merged[task_id] for task_id in sorted(merged)]
+
+
+def publish_changes(changes):
+    """Publish the changes of a committed transaction, per owner."""
+    by_user = {}
+    for user_id, kind, task_id, status in changes:
+        by_user.setdefault(user_id, []).append((kind, task_id, status))
+    broker = get_broker()
+    for user_id, user_changes in by_user.items():
+        broker.publish(user_id, merge_events(user_changes))
+
+
+change_events = OnCommitBatch(publish_changes)
+
+
+def schedule_events(user_id, kind, task_ids, status=None):
+    """
+    Publish events for the given tasks once the transaction commits.
+
+    Args:
+        user_id (int): Owner of the tasks.
+        kind (str): ``CREATED``, ``UPDATED``, ``STATUS`` or ``DELETED``.
+        task_ids (Iterable[int]): Changed tasks.
+        status (str, optional): New status, for ``STATUS`` events.
+    """
+    change_events.add({
+        (user_id, kind, task_id, status) for task_id in task_ids
+    })
+
+
+def format_event(event):
+    """Encode an event as a Server-Sent Events message."""
+    return f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'
@@ -8,7 +8,9 @@ with support for a custom tags input field.
 from django import forms
 from django.utils.translation import gettext_lazy as _
 
-from .models import Task
+from .models import Task, Tag
+from .recurrence import normalize_rule
+from .tags import parse_tag_names
 
 
 class TaskForm(forms.ModelForm):
@@ -39,13 +41,23 @@ class TaskForm(forms.ModelForm):
             widgets: Custom widgets for rendering the form fields.
         """
         model = Task
-        fields = ['title', 'description', 'status', 'due_date', 'due_time']
+        fields = [
+            'title', 'description', 'status', 'due_date', 'due_time',
+            'recurrence',
+        ]
         labels = {
             'title': _('Task Title'),
             'description': _('Description'),
             'status': _('Status'),
             'due_date': _('Due Date'),
             'due_time': _('Due Time'),
+            'recurrence': _('Repeat'),
+        }
+        help_texts = {
+            'recurrence': _(
+                'daily, weekly, monthly or a rule such as '
+                'FREQ=WEEKLY;BYDAY=MO,TH'
+            ),
         }
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
@@ -58,6 +70,10 @@ class TaskForm(forms.ModelForm):
             'due_time': forms.TimeInput(
                 attrs={'class': 'form-control', 'type': 'time'}
             ),
+            'recurrence': forms.TextInput(attrs={
+                'class': 'form-control',
+                'placeholder': _('Does not repeat'),
+            }),
         }
 
     def __init__(self, *args, **kwargs):
@@ -74,5 +90,44 @@ class TaskForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         if self.instance.pk:
             self.fields['tags_input'].initial = ', '.join(
-                tag.name for tag in self.instance.tags.all()
+                self.instance.tag_names
+            )
+
+    def clean_tags_input(self):
+        """
+        Split the comma-separated tags input into a list of tag names.
+
+        Returns:
+            list: Unique tag names in the order they were entered.
+
+        Raises:
+            forms.ValidationError: If a tag name is too long.
+        """
+        names = parse_tag_names(self.cleaned_data.get('tags_input', ''))
+        max_length = Tag._meta.get_field('name').max_length
+        too_long = [name for name in names if len(name) > max_length]
+        if too_long:
+            raise forms.ValidationError(
+                _('Tag names can be at most %(max)d characters long.'),
+                params={'max': max_length},
+            )
+        return names
+
+    def clean_recurrence(self):
+        """Return the recurrence rule in canonical form."""
+        return normalize_rule(self.cleaned_data.get('recurrence', ''))
+
+    def clean(self):
+        """Require a due date on a recurring task, its first occurrence."""
+        cleaned_data = super().clean()
+        if cleaned_data.get('recurrence') and not cleaned_data.get('due_date'):
+            self.add_error(
+                'due_date', _('A recurring task needs a due date.'),
             )
+        return cleaned_data
+
+    def save(self, commit=True):
+        """Anchor the series again when its rule or due date changed."""
+        if {'recurrence', 'due_date'} & set(self.changed_data):
+            self.instance.set_recurrence_start(restart=True)
+        return super().save(commit)
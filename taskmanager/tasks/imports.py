@@ -0,0 +1,271 @@
+"""
+Chunked import of tasks and tags from CSV or NDJSON.
+
+Input is parsed line by line and written in chunks of
+``TASKS_IMPORT_CHUNK_SIZE`` rows, so memory stays flat for any size. Rows
+are validated with the model fields' own validation, then each chunk is
+written in one transaction with a fixed number of queries: ``resolve_tags``
+once for all tag names of the chunk, ``bulk_create`` for the tasks and one
+insert of the tag links. The per-task signal receivers stand aside and
+``tasks_bulk_changed`` is sent once per chunk (see ``tasks.bulk``).
+
+Every chunk commits on its own, so an interrupted import keeps the chunks
+before it. Invalid rows are skipped and reported with their line number.
+
+The columns are those of the export (see ``tasks.export``): a CSV header
+row names them and NDJSON has one object per line. ``id``, ``created_at``
+and ``updated_at`` are ignored; ``tags`` is a comma-separated string or,
+in NDJSON, a list of names.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from rest_framework import serializers
+
+from .bulk import link_tags
+from .models import Tag, Task
+from .signals import bulk_changes, tasks_bulk_changed
+from .tags import (
+    make_tag_list,
+    normalize_tag_names,
+    parse_tag_names,
+    resolve_tags,
+)
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+
+CONTENT_TYPES = {
+    'text/csv': FORMAT_CSV,
+    'application/x-ndjson': FORMAT_NDJSON,
+}
+
+IMPORT_FIELDS = ('title', 'description', 'status', 'due_date', 'due_time')
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_MAX_ERRORS = 100
+
+
+def get_chunk_size():
+    """Return how many rows are written per transaction."""
+    return getattr(settings, 'TASKS_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+@dataclass
+class ImportResult:
+    """
+    Progress and outcome of an import.
+
+    Attributes:
+        imported (int): Tasks created so far.
+        failed (int): Rows rejected so far.
+        errors (list): ``{'line': ..., 'errors': ...}`` of the first
+            ``max_errors`` rejected rows.
+        max_errors (int): How many errors are kept in ``errors``.
+    """
+
+    imported: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    max_errors: int = DEFAULT_MAX_ERRORS
+
+    def reject(self, line, errors):
+        """Count a rejected row and keep its errors if there is room."""
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+
+def read_csv(lines):
+    """
+    Yield ``(line, row, errors)`` for the rows of a CSV with a header.
+
+    Raises:
+        ValidationError: If the header has no ``title`` column.
+    """
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is not None and 'title' not in reader.fieldnames:
+        raise serializers.ValidationError(
+            _('The CSV header must have a "title" column.')
+        )
+    for row in reader:
+        yield reader.line_num, row, None
+
+
+def read_ndjson(lines):
+    """Yield ``(line, row, errors)`` for each non-blank NDJSON line."""
+    for number, text in enumerate(lines, 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as exc:
+            yield number, None, {'line': [str(exc)]}
+            continue
+        if isinstance(row, dict):
+            yield number, row, None
+        else:
+            yield number, None, {'line': [_('Expected a JSON object.')]}
+
+
+READERS = {
+    FORMAT_CSV: read_csv,
+    FORMAT_NDJSON: read_ndjson,
+}
+
+MODEL_FIELDS = {name: Task._meta.get_field(name) for name in IMPORT_FIELDS}
+TAG_NAME_FIELD = Tag._meta.get_field('name')
+
+
+def clean_tag_names(raw):
+    """Return the tag names of a row's ``tags`` value."""
+    if raw is None or raw == '':
+        return []
+    if isinstance(raw, str):
+        names = parse_tag_names(raw)
+    elif isinstance(raw, list) and all(isinstance(name, str) for name in raw):
+        names = normalize_tag_names(raw)
+    else:
+        raise DjangoValidationError(
+            _('Expected a comma-separated string or a list of names.')
+        )
+    return [TAG_NAME_FIELD.clean(name, None) for name in names]
+
+
+def clean_row(row):
+    """
+    Validate a row with the validation of the model fields.
+
+    Missing and empty values take the field's default, or are left blank.
+
+    Returns:
+        tuple: Field values of the task and its tag names.
+
+    Raises:
+        DjangoValidationError: With the errors of each invalid column.
+    """
+    values = {}
+    errors = {}
+    for name, model_field in MODEL_FIELDS.items():
+        raw = row.get(name)
+        if raw is None or raw == '':
+            if model_field.has_default():
+                values[name] = model_field.get_default()
+                continue
+            raw = None if model_field.null else ''
+        try:
+            values[name] = model_field.clean(raw, None)
+        except DjangoValidationError as exc:
+            errors[name] = exc.messages
+    try:
+        tag_names = clean_tag_names(row.get('tags'))
+    except DjangoValidationError as exc:
+        errors['tags'] = exc.messages
+    if errors:
+        raise DjangoValidationError(errors)
+    return values, tag_names
+
+
+def write_chunk(user, rows):
+    """
+    Create the tasks of valid rows and link their tags, in one transaction.
+
+    Args:
+        user: Owner of the tasks.
+        rows (list): ``(values, tag_names)`` of each task.
+
+    Returns:
+        int: Number of created tasks.
+    """
+    with transaction.atomic(), bulk_changes():
+        tags = {
+            tag.name: tag.pk
+            for tag in resolve_tags(
+                user, [name for _, names in rows for name in names],
+            )
+        }
+        tasks = [
+            Task(
+                user=user,
+                tag_list=make_tag_list((tags[name], name) for name in names),
+                **values,
+            )
+            for values, names in rows
+        ]
+        now = timezone.now()
+        for task in tasks:
+            task.set_completed_at(now)
+        tasks = Task.objects.bulk_create(tasks)
+        link_tags(
+            (task.pk, tags[name])
+            for task, (_, names) in zip(tasks, rows)
+            for name in names
+        )
+        tasks_bulk_changed.send(
+            sender=Task,
+            user_id=user.pk,
+            task_ids=[task.pk for task in tasks],
+            created=True,
+        )
+    return len(tasks)
+
+
+def import_tasks(user, lines, import_format, chunk_size=None, progress=None,
+                 on_error=None, max_errors=DEFAULT_MAX_ERRORS):
+    """
+    Import tasks from lines of CSV or NDJSON text.
+
+    Args:
+        user: Owner of the imported tasks.
+        lines (Iterable[str]): Lines of the input.
+        import_format (str): ``FORMAT_CSV`` or ``FORMAT_NDJSON``.
+        chunk_size (int, optional): Rows per transaction; defaults to
+            ``TASKS_IMPORT_CHUNK_SIZE``.
+        progress (Callable[[ImportResult], None], optional): Called after
+            each chunk.
+        on_error (Callable[[int, dict], None], optional): Called with the
+            line and errors of each rejected row.
+        max_errors (int): How many errors the result keeps.
+
+    Returns:
+        ImportResult: Counts and the first errors.
+
+    Raises:
+        ValidationError: If the input itself is malformed, e.g. a CSV
+            header without a ``title`` column.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    result = ImportResult(max_errors=max_errors)
+
+    def reject(line, errors):
+        result.reject(line, errors)
+        if on_error is not None:
+            on_error(line, errors)
+
+    def flush(chunk):
+        result.imported += write_chunk(user, chunk)
+        if progress is not None:
+            progress(result)
+
+    chunk = []
+    for line, row, errors in READERS[import_format](lines):
+        if errors is None:
+            try:
+                chunk.append(clean_row(row))
+            except DjangoValidationError as exc:
+                errors = exc.message_dict
+        if errors is not None:
+            reject(line, errors)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return result
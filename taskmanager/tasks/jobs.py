@@ -0,0 +1,284 @@
+"""
+Database-backed queue of background jobs.
+
+Work a request doesn't need done before it responds, like deleting the
+tags it left unused, is queued with ``enqueue()`` in the request's own
+transaction, so it is queued if and only if the change commits, and done
+by ``manage.py run_worker`` afterwards. A job names a handler and the id
+of an object:
+
+- identical jobs are deduplicated: queueing a job that is already queued
+  does nothing, thanks to a unique constraint on queued jobs;
+- jobs of the same handler are batched: a worker thread claims up to
+  ``batch_size`` of them and calls the handler once with all their ids,
+  in one transaction;
+- a failed batch is queued again after ``TASKS_JOB_RETRY_DELAY`` seconds,
+  doubled on every attempt, and its jobs are marked failed after
+  ``TASKS_JOB_MAX_ATTEMPTS`` attempts.
+
+Jobs are claimed with a conditional UPDATE stamped with a batch id, then
+read back by that id, so two workers never run the same job, with or
+without row locks. A claim expires after ``TASKS_JOB_LEASE`` seconds, and
+the jobs of a worker that died are then queued again; handlers must be
+idempotent, which checking the ids for work still to do makes them.
+
+Handlers are registered with ``register()`` by the modules defining them
+(see ``tasks.signals`` and ``tasks.stats``).
+"""
+
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DatabaseError,
+    close_old_connections,
+    connection,
+    transaction,
+)
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 30
+DEFAULT_LEASE = 5 * 60
+# Longest wait after database errors, in seconds.
+MAX_BACKOFF = 60
+
+_handlers = {}
+
+
+def register(name, handler):
+    """
+    Register the handler of the jobs named ``name``.
+
+    Args:
+        name (str): Name the jobs are queued with.
+        handler (Callable[[set], Any]): Called with the object ids of a
+            batch of jobs.
+    """
+    _handlers[name] = handler
+
+
+def get_max_attempts():
+    """Return how many times a job runs before it is marked failed."""
+    return getattr(settings, 'TASKS_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+
+def get_lease():
+    """Return how long a worker may run a batch before others reclaim it."""
+    return timedelta(seconds=getattr(settings, 'TASKS_JOB_LEASE', DEFAULT_LEASE))
+
+
+def retry_delay(attempts):
+    """Return how long a job waits after its ``attempts``-th failed run."""
+    delay = getattr(settings, 'TASKS_JOB_RETRY_DELAY', DEFAULT_RETRY_DELAY)
+    return timedelta(seconds=delay * 2 ** max(attempts - 1, 0))
+
+
+def enqueue(name, ids, delay=0):
+    """
+    Queue a job per id in the current transaction, skipping queued ones.
+
+    Args:
+        name (str): Handler of the jobs.
+        ids (Iterable[int]): Objects to process.
+        delay (int): Seconds before the jobs may run.
+    """
+    ids = set(ids)
+    if not ids:
+        return
+    run_after = timezone.now() + timedelta(seconds=delay)
+    Job.objects.bulk_create(
+        [Job(name=name, object_id=pk, run_after=run_after) for pk in ids],
+        ignore_conflicts=True,
+    )
+
+
+def claim_jobs(batch_size, now=None):
+    """
+    Claim due jobs of the handler whose oldest job is due first.
+
+    Returns:
+        list: The claimed ``Job`` objects, empty if another worker claimed
+        them first, or None if no job is due.
+    """
+    now = now or timezone.now()
+    due = Job.objects.filter(state=Job.STATE_QUEUED, run_after__lte=now)
+    name = due.order_by('run_after', 'pk').values_list('name', flat=True).first()
+    if name is None:
+        return None
+    pks = list(
+        due.filter(name=name)
+        .order_by('run_after', 'pk')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    batch = uuid.uuid4()
+    Job.objects.filter(pk__in=pks, state=Job.STATE_QUEUED).update(
+        state=Job.STATE_RUNNING,
+        batch=batch,
+        locked_until=now + get_lease(),
+        attempts=F('attempts') + 1,
+    )
+    return list(Job.objects.filter(batch=batch))
+
+
+def retry_jobs(jobs, error):
+    """
+    Queue failed jobs again, or mark them failed once out of attempts.
+
+    A retried job that was queued again meanwhile is merged into that one.
+    """
+    now = timezone.now()
+    max_attempts = get_max_attempts()
+    failed = [job.pk for job in jobs if job.attempts >= max_attempts]
+    retried = [job for job in jobs if job.attempts < max_attempts]
+    with transaction.atomic():
+        Job.objects.filter(pk__in=failed).update(
+            state=Job.STATE_FAILED, batch=None, locked_until=None,
+            last_error=error,
+        )
+        Job.objects.filter(pk__in=[job.pk for job in retried]).delete()
+        Job.objects.bulk_create(
+            [
+                Job(
+                    name=job.name,
+                    object_id=job.object_id,
+                    attempts=job.attempts,
+                    run_after=now + retry_delay(job.attempts),
+                    last_error=error,
+                )
+                for job in retried
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def release_expired_jobs(now=None):
+    """Queue again the running jobs whose claim expired."""
+    expired = list(Job.objects.filter(
+        state=Job.STATE_RUNNING, locked_until__lt=now or timezone.now(),
+    ))
+    if expired:
+        retry_jobs(expired, 'The claim of the worker expired.')
+    return len(expired)
+
+
+def run_jobs(jobs):
+    """
+    Run a batch of claimed jobs with their handler, in one transaction.
+
+    Done jobs are deleted, failed ones retried.
+
+    Returns:
+        bool: Whether the handler succeeded.
+    """
+    name = jobs[0].name
+    try:
+        handler = _handlers[name]
+        with transaction.atomic():
+            handler({job.object_id for job in jobs})
+    except Exception as exc:
+        logger.exception('%d %s jobs failed.', len(jobs), name)
+        retry_jobs(jobs, repr(exc))
+        return False
+    Job.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+    return True
+
+
+class Worker:
+    """
+    Threads claiming and running batches of due jobs.
+
+    Attributes:
+        threads (int): Threads running batches.
+        batch_size (int): Jobs claimed per batch.
+        poll (float): Seconds an idle thread waits before polling again.
+        stopping (Event): Set to stop the threads after their batch.
+    """
+
+    def __init__(self, threads=4, batch_size=DEFAULT_BATCH_SIZE, poll=1.0):
+        self.threads = threads
+        self.batch_size = batch_size
+        self.poll = poll
+        self.stopping = threading.Event()
+
+    def run_once(self):
+        """
+        Claim and run one batch.
+
+        Returns:
+            int: Jobs done, or None if no job was due.
+        """
+        release_expired_jobs()
+        jobs = claim_jobs(self.batch_size)
+        if jobs is None:
+            return None
+        return len(jobs) if jobs and run_jobs(jobs) else 0
+
+    def drain(self):
+        """Run batches in the current thread until no job is due."""
+        done = 0
+        while (count := self.run_once()) is not None:
+            done += count
+        return done
+
+    def loop(self, burst):
+        """
+        Run batches until stopped, or until no job is due in burst mode.
+
+        A database error, e.g. a locked database or a lost connection, is
+        logged and the thread waits before trying again, twice as long
+        after every error in a row, up to ``MAX_BACKOFF`` seconds. Jobs it
+        left claimed are queued again once their claim expires.
+        """
+        done = 0
+        errors = 0
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    count = self.run_once()
+                except DatabaseError:
+                    logger.exception('The job queue could not be read.')
+                    self.stopping.wait(
+                        min(self.poll * 2 ** errors, MAX_BACKOFF)
+                    )
+                    errors += 1
+                    continue
+                errors = 0
+                if count is not None:
+                    done += count
+                elif burst:
+                    break
+                else:
+                    self.stopping.wait(self.poll)
+        finally:
+            connection.close()
+        return done
+
+    def run(self, burst=False):
+        """
+        Run the threads until stopped, or in burst mode until no job is
+        due.
+
+        Returns:
+            int: Jobs done.
+        """
+        with ThreadPoolExecutor(self.threads) as pool:
+            futures = [
+                pool.submit(self.loop, burst) for _ in range(self.threads)
+            ]
+            try:
+                return sum(future.result() for future in futures)
+            except BaseException:
+                self.stopping.set()
+                raise
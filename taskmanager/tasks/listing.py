@@ -0,0 +1,204 @@
+"""
+Lightweight rows for rendering task cards.
+
+The task list doesn't need model instances: it loads the columns of
+``Task.ROW_FIELDS`` as tuples, with the urgency bucket computed by the
+database, tag names from ``Task.tag_list`` and descriptions left out (the
+script fetches a description when its card is expanded), and wraps them
+in ``TaskRow`` objects. A page is one query.
+
+A date window (see ``tasks.recurrence``) isn't paginated: its rows are
+the tasks due in it, with a row per occurrence of the series listed in
+it, built from the row of the series.
+"""
+
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Task
+from .pagination import apaginate_tasks, paginate_tasks
+from .recurrence import in_window, window_occurrences
+
+# Card and due-date CSS classes of each urgency bucket.
+HIGHLIGHTS = {
+    Task.URGENCY_DONE: ('list-group-item-success', 'text-muted'),
+    Task.URGENCY_OVERDUE: ('', 'text-danger'),
+    Task.URGENCY_TODAY: ('', 'text-warning'),
+    Task.URGENCY_UPCOMING: ('', 'text-muted'),
+}
+
+STATUS_LABELS = dict(Task.STATUS_CHOICES)
+
+
+class TaskRow:
+    """A task as shown on a card of the task list."""
+
+    __slots__ = Task.ROW_FIELDS + (
+        'search_rank', 'series_id', 'occurrence_date',
+    )
+
+    def __init__(self, id, title, status, due_date, sort_group, created_at,
+                 urgency, has_description, recurrence, tag_list,
+                 search_rank=None, series_id=None, occurrence_date=None):
+        self.id = id
+        self.title = title
+        self.status = status
+        self.due_date = due_date
+        self.sort_group = sort_group
+        self.created_at = created_at
+        self.urgency = urgency
+        self.has_description = has_description
+        self.recurrence = recurrence
+        self.tag_list = tag_list
+        self.search_rank = search_rank
+        self.series_id = series_id
+        self.occurrence_date = occurrence_date
+
+    @classmethod
+    def from_values(cls, values):
+        """Build a row from a tuple of ``TaskQuerySet.rows()``."""
+        return cls(*values)
+
+    def occurrence(self, day, today):
+        """
+        Return the row of the occurrence on ``day`` of this series, which
+        has no row of its own: it has no id and shows the series.
+        """
+        if day < today:
+            urgency = Task.URGENCY_OVERDUE
+        elif day == today:
+            urgency = Task.URGENCY_TODAY
+        else:
+            urgency = Task.URGENCY_UPCOMING
+        return TaskRow(
+            None, self.title, self.status, day, self.sort_group,
+            self.created_at, urgency, self.has_description, '',
+            self.tag_list, series_id=self.id, occurrence_date=day,
+        )
+
+    @property
+    def task_id(self):
+        """Task the card edits: the series of an occurrence without a row."""
+        return self.id or self.series_id
+
+    @property
+    def status_url(self):
+        """
+        URL setting the status of the occurrence a card shows, or None for
+        a task without recurrence. The card of a series shows its next
+        open occurrence.
+        """
+        if self.series_id is not None:
+            day = self.occurrence_date
+        elif self.recurrence:
+            day = self.due_date
+        else:
+            return None
+        return reverse(
+            'task_occurrence_status', args=[self.task_id, day.isoformat()],
+        )
+
+    @property
+    def tag_names(self):
+        """Names of the task's tags."""
+        return [name for _, name in self.tag_list]
+
+    @property
+    def card_highlight(self):
+        """CSS class of the card."""
+        return HIGHLIGHTS[self.urgency][0]
+
+    @property
+    def due_highlight(self):
+        """CSS class of the due date."""
+        return HIGHLIGHTS[self.urgency][1]
+
+    def get_status_display(self):
+        """Return the translated status label, like the model method."""
+        return STATUS_LABELS.get(self.status, self.status)
+
+
+def task_rows_page(queryset, cursor=None, page_size=None, today=None):
+    """
+    Return one page of task rows.
+
+    Args:
+        queryset (QuerySet): Tasks to list, e.g. from ``for_listing``.
+        cursor (str, optional): Cursor of the previous page.
+        page_size (int, optional): Number of tasks per page.
+        today (date, optional): Date urgency is relative to; defaults to
+            the current local date.
+
+    Returns:
+        KeysetPage: Rows of the page and the next cursor.
+
+    Raises:
+        InvalidCursor: If ``cursor`` is malformed.
+    """
+    today = today or timezone.localdate()
+    page = paginate_tasks(
+        queryset.rows(today),
+        cursor=cursor,
+        page_size=page_size,
+        row=TaskRow.from_values,
+    )
+    return page
+
+
+async def atask_rows_page(queryset, cursor=None, page_size=None, today=None):
+    """Async version of ``task_rows_page``."""
+    today = today or timezone.localdate()
+    page = await apaginate_tasks(
+        queryset.rows(today),
+        cursor=cursor,
+        page_size=page_size,
+        row=TaskRow.from_values,
+    )
+    return page
+
+
+async def atask_row(queryset, task_id, today=None):
+    """
+    Return the row of one task of ``queryset``.
+
+    Returns:
+        TaskRow: The row, or None if the task isn't in ``queryset``.
+    """
+    today = today or timezone.localdate()
+    values = await queryset.rows(today).filter(pk=task_id).afirst()
+    if values is None:
+        return None
+    return TaskRow.from_values(values)
+
+
+def window_rows(queryset, first, last, today=None):
+    """
+    Return the rows of the tasks of ``queryset`` listed in a date window,
+    ordered by due date.
+
+    Costs three queries: the rows, the anchors of the series and the
+    occurrences with a row; the last two only if a series is listed.
+    """
+    today = today or timezone.localdate()
+    rows = []
+    series = {}
+    for values in queryset.filter(in_window(first, last)).order_by().rows(today):
+        row = TaskRow.from_values(values)
+        if row.recurrence:
+            series[row.id] = row
+        else:
+            rows.append(row)
+    if series:
+        anchors = Task.objects.filter(pk__in=series).values_list(
+            'pk', 'recurrence', 'recurrence_start', 'due_date',
+        )
+        rows += [
+            series[pk].occurrence(day, today)
+            for pk, day in window_occurrences(list(anchors), first, last)
+        ]
+    rows.sort(key=lambda row: (
+        row.due_date,
+        row.status == Task.STATUS_COMPLETED,
+        row.task_id,
+    ))
+    return rows
@@ -0,0 +1,67 @@
+"""Management command that runs a benchmark from tasks.benchmarks."""
+
+import importlib
+import json
+import pkgutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import benchmarks
+
+
+def available_benchmarks():
+    """Return the names of the benchmark modules."""
+    return sorted(
+        module.name
+        for module in pkgutil.iter_modules(benchmarks.__path__)
+        if module.name != 'utils'
+    )
+
+
+def parse_option(value):
+    """Turn ``'tasks=100'`` into ``('tasks', 100)``."""
+    key, sep, raw = value.partition('=')
+    if not sep or not key:
+        raise CommandError(f'Options must look like key=value, got "{value}".')
+    try:
+        return key.replace('-', '_'), int(raw)
+    except ValueError:
+        return key.replace('-', '_'), raw
+
+
+class Command(BaseCommand):
+    """
+    Run a benchmark and print its results as JSON.
+
+    Options are passed to the benchmark's ``run()`` function, e.g.::
+
+        python manage.py benchmark query_plans -o users=50 -o tasks=1000
+    """
+
+    help = 'Run a benchmark from tasks.benchmarks and print JSON results.'
+
+    def add_arguments(self, parser):
+        """Add the benchmark name, its options and the output file."""
+        parser.add_argument('name', choices=available_benchmarks())
+        parser.add_argument(
+            '-o', '--option',
+            action='append',
+            default=[],
+            dest='options',
+            help='Benchmark option as key=value. Can be repeated.',
+        )
+        parser.add_argument('--output', help='Write results to this file.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark and print or save its results."""
+        module = importlib.import_module(f'tasks.benchmarks.{options["name"]}')
+        kwargs = dict(parse_option(value) for value in options['options'])
+        results = module.run(**kwargs)
+        payload = json.dumps(results, indent=2, default=str)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(payload)
+            self.stdout.write(f'Results written to {options["output"]}')
+        else:
+            self.stdout.write(payload)
@@ -0,0 +1,73 @@
+"""Management command that checks the tag lists of tasks against their tags."""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tasks.models import Task
+from tasks.tags import stale_tag_lists
+
+
+class Command(BaseCommand):
+    """
+    Compare the ``tag_list`` of every task with the tags linked to it.
+
+    Tasks are checked in batches walked in primary key order. Lists that
+    drifted, e.g. after links were written with ``bulk_create()``, which
+    sends no signals, are reported, and rewritten with ``--fix``. Without
+    it the command fails if any list drifted.
+    """
+
+    help = 'Check that the tag lists of tasks match their tags.'
+
+    def add_arguments(self, parser):
+        """Add the batch size and fix options."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of tasks checked per batch.',
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rewrite the tag lists that drifted.',
+        )
+
+    def handle(self, *args, **options):
+        """Check the tasks batch by batch."""
+        batch_size = options['batch_size']
+        last_id = 0
+        total = 0
+        stale = 0
+
+        while True:
+            task_ids = list(
+                Task.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not task_ids:
+                break
+            last_id = task_ids[-1]
+            total += len(task_ids)
+            with transaction.atomic():
+                lists = stale_tag_lists(task_ids)
+                if options['fix'] and lists:
+                    Task.objects.bulk_update(
+                        [
+                            Task(pk=task_id, tag_list=tag_list)
+                            for task_id, tag_list in lists.items()
+                        ],
+                        ['tag_list'],
+                    )
+            stale += len(lists)
+            for task_id, tag_list in lists.items():
+                names = ', '.join(name for _, name in tag_list)
+                self.stdout.write(f'Task {task_id}: [{names}]')
+
+        verb = 'Fixed' if options['fix'] else 'Found'
+        self.stdout.write(
+            f'Checked {total} tasks. {verb} {stale} stale tag lists.'
+        )
+        if stale and not options['fix']:
+            raise CommandError(f'{stale} tasks have stale tag lists.')
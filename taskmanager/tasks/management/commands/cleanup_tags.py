@@ -0,0 +1,46 @@
+"""Management command that deletes tags not attached to any task."""
+
+from django.core.management.base import BaseCommand
+
+from tasks.models import Tag
+from tasks.signals import delete_unused_tags
+
+
+class Command(BaseCommand):
+    """
+    Garbage-collect orphaned tags in batches.
+
+    Used with ``TASKS_TAG_CLEANUP = 'deferred'``, typically from cron.
+    Tags are walked in primary key order, so each batch only reads the
+    rows after the previous one.
+    """
+
+    help = 'Delete tags that are not attached to any task.'
+
+    def add_arguments(self, parser):
+        """Add the batch size option."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of orphaned tags deleted per query.',
+        )
+
+    def handle(self, *args, **options):
+        """Delete orphaned tags batch by batch."""
+        batch_size = options['batch_size']
+        last_id = 0
+        total = 0
+
+        while True:
+            tag_ids = list(
+                Tag.objects.filter(pk__gt=last_id, tasks__isnull=True)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not tag_ids:
+                break
+            last_id = tag_ids[-1]
+            total += delete_unused_tags(tag_ids)
+
+        self.stdout.write(f'Deleted {total} unused tags.')
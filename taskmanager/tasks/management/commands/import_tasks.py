@@ -0,0 +1,94 @@
+"""Management command that imports tasks from CSV or NDJSON."""
+
+import json
+import os
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from tasks.imports import FORMAT_CSV, READERS, import_tasks
+
+
+class Command(BaseCommand):
+    """
+    Import tasks with their tags for a user, chunk by chunk.
+
+    The format is taken from the file extension unless ``--format`` is
+    given; ``-`` reads stdin. Progress is printed after every chunk and
+    each rejected row is written to stderr, or to ``--errors`` as NDJSON.
+    """
+
+    help = 'Import tasks with their tags from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        """Add the user, input, format and error options."""
+        parser.add_argument('username')
+        parser.add_argument('path', help='File to import, or - for stdin.')
+        parser.add_argument(
+            '--format', choices=sorted(READERS), dest='import_format',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Rows per transaction; defaults to TASKS_IMPORT_CHUNK_SIZE.',
+        )
+        parser.add_argument(
+            '--errors', help='Write rejected rows to this file as NDJSON.',
+        )
+
+    def handle(self, *args, **options):
+        """Run the import."""
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Unknown user "{options["username"]}".')
+
+        path = options['path']
+        import_format = options['import_format']
+        if import_format is None:
+            import_format = os.path.splitext(path)[1].lstrip('.').lower()
+            if import_format not in READERS:
+                import_format = FORMAT_CSV
+
+        errors_file = None
+        if options['errors']:
+            errors_file = open(options['errors'], 'w', encoding='utf-8')
+
+        def on_error(line, errors):
+            if errors_file is not None:
+                errors_file.write(json.dumps({'line': line, 'errors': errors}) + '\n')
+            else:
+                self.stderr.write(f'Line {line}: {json.dumps(errors)}')
+
+        def progress(result):
+            self.stdout.write(
+                f'Imported {result.imported} tasks, rejected {result.failed} rows.'
+            )
+
+        if path == '-':
+            source = sys.stdin
+        else:
+            source = open(path, encoding='utf-8-sig', newline='')
+        try:
+            result = import_tasks(
+                user, source, import_format,
+                chunk_size=options['chunk_size'],
+                progress=progress,
+                on_error=on_error,
+                max_errors=0,
+            )
+        except ValidationError as exc:
+            raise CommandError(' '.join(map(str, exc.detail)))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if errors_file is not None:
+                errors_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {result.imported} tasks imported, {result.failed} rows rejected.'
+        ))
@@ -0,0 +1,38 @@
+"""Management command that deletes old tombstones of deleted tasks and tags."""
+
+from django.core.management.base import BaseCommand
+
+from tasks.sync import get_retention, prune_tombstones
+
+
+class Command(BaseCommand):
+    """
+    Delete tombstones older than the delta sync retention.
+
+    Typically run from cron, with ``TASKS_SYNC_PRUNE_INTERVAL = 0`` so
+    sync requests leave pruning to it. Clients whose token is older than
+    the retention get a full resync, so they never miss a pruned deletion.
+    """
+
+    help = 'Delete tombstones older than the delta sync retention.'
+
+    def add_arguments(self, parser):
+        """Add the retention option."""
+        parser.add_argument(
+            '--retention',
+            type=int,
+            default=None,
+            help=(
+                'Age in seconds of the tombstones to delete; defaults to '
+                'TASKS_SYNC_TOMBSTONE_RETENTION. Shorter than the setting, '
+                'clients with a valid token can miss deletions.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        """Delete the old tombstones."""
+        retention = options['retention']
+        if retention is None:
+            retention = get_retention()
+        deleted = prune_tombstones(retention)
+        self.stdout.write(f'Deleted {deleted} tombstones.')
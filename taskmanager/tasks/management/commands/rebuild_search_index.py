@@ -0,0 +1,62 @@
+"""Management command that rebuilds the task search index."""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tasks.models import Task, User
+from tasks.search import get_search_backend, index_tasks
+
+
+class Command(BaseCommand):
+    """
+    Rewrite the search entries of every task, or of one user's tasks.
+
+    Fixes entries that drifted from their tasks, e.g. after tags were
+    deleted or rows were changed with ``QuerySet.update()``, which sends no
+    signals. Tasks are indexed in batches walked in primary key order, then
+    the backend's own index structures are rebuilt.
+    """
+
+    help = 'Rebuild the full-text search index of tasks.'
+
+    def add_arguments(self, parser):
+        """Add the batch size and user options."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of tasks indexed per batch.',
+        )
+        parser.add_argument(
+            '--user',
+            help='Only rebuild the entries of the user with this username.',
+        )
+
+    def handle(self, *args, **options):
+        """Rebuild search entries batch by batch."""
+        batch_size = options['batch_size']
+        tasks = Task.objects.all()
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" does not exist.')
+            tasks = tasks.filter(user=user)
+
+        last_id = 0
+        total = 0
+
+        while True:
+            task_ids = list(
+                tasks.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not task_ids:
+                break
+            last_id = task_ids[-1]
+            with transaction.atomic():
+                total += index_tasks(task_ids)
+
+        get_search_backend().rebuild()
+        self.stdout.write(f'Indexed {total} tasks.')
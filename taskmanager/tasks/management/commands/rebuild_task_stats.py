@@ -0,0 +1,80 @@
+"""Management command that recounts the task statistics of users."""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tasks.models import User
+from tasks.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Recount the task statistics of every user, or of one user.
+
+    Users are recounted in batches walked in primary key order, each with
+    one aggregate query. Counters that drifted from the tasks, e.g. after
+    rows were changed with ``QuerySet.update()``, which sends no signals,
+    are reported. With ``--check`` nothing is saved and the command fails
+    if any counter drifted.
+    """
+
+    help = 'Rebuild the task statistics of users and report drift.'
+
+    def add_arguments(self, parser):
+        """Add the batch size, user and check options."""
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users recounted per batch.',
+        )
+        parser.add_argument(
+            '--user',
+            help='Only rebuild the statistics of the user with this username.',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drift, without saving the recounted statistics.',
+        )
+
+    def handle(self, *args, **options):
+        """Recount the statistics batch by batch."""
+        batch_size = options['batch_size']
+        save = not options['check']
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f'User "{options["user"]}" does not exist.')
+
+        last_id = 0
+        total = 0
+        drifted = 0
+
+        while True:
+            user_ids = list(
+                users.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            with transaction.atomic():
+                rebuilt = rebuild_stats(user_ids, save=save)
+            total += len(rebuilt)
+            for stats in rebuilt:
+                if stats.drift:
+                    drifted += 1
+                    self.stdout.write(f'User {stats.user_id}: ' + ', '.join(
+                        f'{name} {saved} -> {actual}'
+                        for name, (saved, actual) in stats.drift.items()
+                    ))
+
+        verb = 'Checked' if options['check'] else 'Rebuilt'
+        self.stdout.write(
+            f'{verb} the statistics of {total} users, {drifted} drifted.'
+        )
+        if options['check'] and drifted:
+            raise CommandError(f'The statistics of {drifted} users drifted.')
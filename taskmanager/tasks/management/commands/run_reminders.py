@@ -0,0 +1,75 @@
+"""Management command that sends reminders of task deadlines."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.reminders import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WINDOW,
+    ReminderScheduler,
+)
+
+
+class Command(BaseCommand):
+    """
+    Send reminders of task deadlines through ``TASKS_REMINDER_BACKEND``.
+
+    Runs until interrupted, scanning the tasks due in the next window
+    every ``--interval`` seconds and sending each reminder when it is due.
+    With ``--once`` it sends the reminders due now and exits, e.g. from
+    cron. Several workers may run: each reminder is claimed by one of
+    them (see ``tasks.reminders``).
+    """
+
+    help = 'Send reminders of task deadlines.'
+
+    def add_arguments(self, parser):
+        """Add the window, interval, batch size and once options."""
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=DEFAULT_WINDOW,
+            help='Seconds ahead each scan reads the reminders of.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between scans; at most the window.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Number of reminders sent per batch.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send the reminders due now and exit.',
+        )
+
+    def handle(self, *args, **options):
+        """Run the scheduler."""
+        if not 0 < options['interval'] <= options['window']:
+            raise CommandError(
+                'The interval must be positive and at most the window.'
+            )
+        scheduler = ReminderScheduler(
+            window=options['window'], batch_size=options['batch_size'],
+        )
+        if options['once']:
+            scheduler.scan()
+            sent = scheduler.run_pending()
+            self.stdout.write(f'Sent {sent} reminders.')
+            return
+
+        def report(scanned, sent):
+            self.stdout.write(
+                f'Sent {sent} reminders, {scanned} due in the next '
+                f'{options["window"]} seconds.'
+            )
+
+        try:
+            scheduler.run(options['interval'], report=report)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped.')
@@ -0,0 +1,61 @@
+"""Management command that runs the background jobs of the queue."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.jobs import DEFAULT_BATCH_SIZE, Worker
+
+
+class Command(BaseCommand):
+    """
+    Run queued background jobs, such as the orphaned tag cleanup, with a
+    pool of threads.
+
+    Each thread claims a batch of due jobs of one handler, runs it and
+    polls again, until interrupted. With ``--burst`` the threads stop once
+    no job is due, e.g. for cron. Several workers may run at once (see
+    ``tasks.jobs``).
+    """
+
+    help = 'Run queued background jobs.'
+
+    def add_arguments(self, parser):
+        """Add the threads, batch size, poll and burst options."""
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='Number of threads running jobs.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Number of jobs of the same handler run together.',
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=1.0,
+            help='Seconds an idle thread waits before looking for jobs again.',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no job is due.',
+        )
+
+    def handle(self, *args, **options):
+        """Run the worker."""
+        if options['threads'] < 1:
+            raise CommandError('At least one thread is needed.')
+        worker = Worker(
+            threads=options['threads'],
+            batch_size=options['batch_size'],
+            poll=options['poll'],
+        )
+        try:
+            done = worker.run(burst=options['burst'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped.')
+            return
+        self.stdout.write(f'Ran {done} jobs.')
@@ -0,0 +1,68 @@
+"""Management command that fills the database with generated benchmark data."""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tasks.benchmarks.utils import generate_dataset
+
+
+class Command(BaseCommand):
+    """
+    Create users with realistic tasks and tags to measure the app against.
+
+    The data is committed, unlike the data benchmarks seed for themselves,
+    so it can be browsed with ``runserver`` or loaded by external tools.
+    The same seed always generates the same data; ``--clear`` first deletes
+    the users of an earlier run with the same prefix and seed::
+
+        python manage.py seed_benchmark --users 100 --tasks 1000 --tags 50
+    """
+
+    help = 'Create users with generated tasks and tags for benchmarks.'
+
+    def add_arguments(self, parser):
+        """Add the dataset size and generator options."""
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument(
+            '--tasks', type=int, default=1000, help='Tasks per user.',
+        )
+        parser.add_argument(
+            '--tags', type=int, default=50, help='Tags per user.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='bench', help='Start of the usernames.',
+        )
+        parser.add_argument(
+            '--password',
+            help='Password of the users; without one they cannot log in.',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete the users of an earlier run with the same seed.',
+        )
+
+    def handle(self, *args, **options):
+        """Generate the dataset."""
+        prefix = f'{options["prefix"]}-{options["seed"]}-'
+        if options['clear']:
+            deleted, _ = (
+                get_user_model().objects
+                .filter(username__startswith=prefix).delete()
+            )
+            self.stdout.write(f'Deleted {deleted} rows of an earlier run.')
+        with transaction.atomic():
+            users = generate_dataset(
+                users=options['users'],
+                tasks=options['tasks'],
+                tags=options['tags'],
+                seed=options['seed'],
+                prefix=options['prefix'],
+                password=options['password'],
+            )
+        self.stdout.write(
+            f'Created {len(users)} users with {options["tasks"]} tasks and '
+            f'{options["tags"]} tags each, named {prefix}<number>.'
+        )
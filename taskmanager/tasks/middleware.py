@@ -0,0 +1,83 @@
+"""Middleware of the tasks project."""
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+from .timing import measure_request, report
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise middleware that also runs in async mode.
+
+    WhiteNoise only provides a synchronous middleware, which makes Django
+    run the whole request in a thread under ASGI, async views included.
+    Static files are looked up in the table WhiteNoise builds at startup,
+    so the async path only leaves the event loop when ``autorefresh``
+    (i.e. ``DEBUG``) makes it search the disk.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Serve a static file, or pass the request on."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        """Async version of ``__call__``."""
+        if self.autorefresh:
+            response = await sync_to_async(self.process_request)(request)
+        else:
+            response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Report where each request spent its time (see ``tasks.timing``).
+
+    Adds a ``Server-Timing`` header with the time spent in SQL, templates
+    and signal handlers, which browsers show with the request, and logs
+    the same figures. Enabled by ``TASKS_SERVER_TIMING``, which defaults
+    to ``DEBUG``: the header shows every client how the request ran.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TASKS_SERVER_TIMING', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Time the request and report its timings."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with measure_request() as timings:
+            response = self.get_response(request)
+            return report(request, response, timings)
+
+    async def __acall__(self, request):
+        """Async version of ``__call__``."""
+        with measure_request() as timings:
+            response = await self.get_response(request)
+            return report(request, response, timings)
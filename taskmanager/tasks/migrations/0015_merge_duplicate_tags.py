@@ -0,0 +1,49 @@
+"""Merge tags sharing the same (user, name) before the unique constraint."""
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """
+    Keep the oldest tag of every (user, name) group, move the task links
+    of the other tags onto it and delete the duplicates.
+    """
+    Tag = apps.get_model('tasks', 'Tag')
+    Through = Tag.tasks.through
+
+    duplicates = (
+        Tag.objects.values('user_id', 'name')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates.iterator():
+        keep_id = group['keep_id']
+        extra_ids = list(
+            Tag.objects.filter(user_id=group['user_id'], name=group['name'])
+            .exclude(id=keep_id)
+            .values_list('id', flat=True)
+        )
+        task_ids = set(
+            Through.objects.filter(tag_id__in=extra_ids)
+            .values_list('task_id', flat=True)
+        )
+        task_ids -= set(
+            Through.objects.filter(tag_id=keep_id, task_id__in=task_ids)
+            .values_list('task_id', flat=True)
+        )
+        Through.objects.bulk_create(
+            Through(tag_id=keep_id, task_id=task_id) for task_id in task_ids
+        )
+        Tag.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_squashed_0014_delete_telegramprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.2 on 2026-10-18 20:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0015_merge_duplicate_tags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='completed_order',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(status='completed', then=models.Value(1)), default=models.Value(0)), output_field=models.IntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'status', 'completed_order', 'due_date', '-created_at'], name='task_user_status_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'completed_order', 'due_date', '-created_at'], name='task_user_listing_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_name_per_user'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.2 on 2026-10-18 20:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0016_task_indexes_tag_unique_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_user_status_listing_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_user_listing_idx',
+        ),
+        migrations.RemoveField(
+            model_name='task',
+            name='completed_order',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='sort_group',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(due_date__isnull=False, status='completed', then=models.Value(2)), models.When(status='completed', then=models.Value(3)), models.When(due_date__isnull=False, then=models.Value(0)), default=models.Value(1)), output_field=models.IntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'status', 'sort_group', 'due_date', '-created_at', '-id'], name='task_user_status_sort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'sort_group', 'due_date', '-created_at', '-id'], name='task_user_sort_idx'),
+        ),
+    ]
@@ -0,0 +1,134 @@
+"""
+Create the database-specific full-text index over task search entries
+and fill the entries for existing tasks.
+"""
+
+from django.db import migrations
+
+ENTRY_TABLE = 'tasks_tasksearchentry'
+FTS_TABLE = f'{ENTRY_TABLE}_fts'
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, tag_names, description,
+        content='{ENTRY_TABLE}', content_rowid='task_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {ENTRY_TABLE}_ai AFTER INSERT ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, tag_names, description)
+        VALUES (new.task_id, new.title, new.tag_names, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {ENTRY_TABLE}_ad AFTER DELETE ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, tag_names, description)
+        VALUES ('delete', old.task_id, old.title, old.tag_names, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {ENTRY_TABLE}_au AFTER UPDATE ON {ENTRY_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, tag_names, description)
+        VALUES ('delete', old.task_id, old.title, old.tag_names, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, tag_names, description)
+        VALUES (new.task_id, new.title, new.tag_names, new.description);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    f'DROP TRIGGER IF EXISTS {ENTRY_TABLE}_au',
+    f'DROP TRIGGER IF EXISTS {ENTRY_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {ENTRY_TABLE}_ai',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f"""
+    ALTER TABLE {ENTRY_TABLE} ADD COLUMN document tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(tag_names, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    f'CREATE INDEX {ENTRY_TABLE}_document_idx '
+    f'ON {ENTRY_TABLE} USING GIN (document)',
+    f"CREATE INDEX {ENTRY_TABLE}_trgm_idx ON {ENTRY_TABLE} "
+    f"USING GIN ((title || ' ' || tag_names) gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    f'DROP INDEX IF EXISTS {ENTRY_TABLE}_trgm_idx',
+    f'DROP INDEX IF EXISTS {ENTRY_TABLE}_document_idx',
+    f'ALTER TABLE {ENTRY_TABLE} DROP COLUMN IF EXISTS document',
+]
+
+
+def run_for_vendor(sqlite, postgres):
+    """Return a RunPython function executing the vendor's statements."""
+    def run(apps, schema_editor):
+        statements = {
+            'sqlite': sqlite,
+            'postgresql': postgres,
+        }.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+def fill_search_entries(apps, schema_editor):
+    """Create a search entry for every existing task, in batches."""
+    Task = apps.get_model('tasks', 'Task')
+    TaskSearchEntry = apps.get_model('tasks', 'TaskSearchEntry')
+    Through = Task.tags.through
+    batch_size = 1000
+    last_id = 0
+
+    while True:
+        tasks = list(
+            Task.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('id', 'user_id', 'title', 'description')[:batch_size]
+        )
+        if not tasks:
+            break
+        last_id = tasks[-1][0]
+
+        tag_names = {}
+        links = (
+            Through.objects.filter(task_id__in=[task[0] for task in tasks])
+            .order_by('tag__name')
+            .values_list('task_id', 'tag__name')
+        )
+        for task_id, name in links:
+            tag_names.setdefault(task_id, []).append(name)
+
+        TaskSearchEntry.objects.bulk_create(
+            TaskSearchEntry(
+                task_id=task_id,
+                user_id=user_id,
+                title=title,
+                description=description,
+                tag_names=' '.join(tag_names.get(task_id, [])),
+            )
+            for task_id, user_id, title, description in tasks
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0018_task_search_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(SQLITE_FORWARD, POSTGRES_FORWARD),
+            run_for_vendor(SQLITE_REVERSE, POSTGRES_REVERSE),
+        ),
+        migrations.RunPython(fill_search_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.2 on 2026-10-18 20:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_at(apps, schema_editor):
+    """Start existing tasks with updated_at equal to created_at."""
+    Task = apps.get_model('tasks', 'Task')
+    Task.objects.update(updated_at=F('created_at'))
+
+
+def create_change_counters(apps, schema_editor):
+    """Give every existing user a change counter."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    ChangeCounter = apps.get_model('tasks', 'ChangeCounter')
+    ChangeCounter.objects.bulk_create(
+        (ChangeCounter(user_id=pk) for pk in User.objects.values_list('pk', flat=True)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0019_task_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='change_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('value', models.BigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.RunPython(create_change_counters, migrations.RunPython.noop),
+    ]
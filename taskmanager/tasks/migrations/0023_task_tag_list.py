@@ -0,0 +1,51 @@
+# Generated by Django 5.2.2 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def fill_tag_lists(apps, schema_editor):
+    """Copy the tags of every task to its tag list, batch by batch."""
+    Task = apps.get_model('tasks', 'Task')
+    Through = apps.get_model('tasks', 'Tag').tasks.through
+    last_id = 0
+    while True:
+        task_ids = list(
+            Task.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not task_ids:
+            break
+        last_id = task_ids[-1]
+        tags = {}
+        for task_id, tag_id, name in Through.objects.filter(
+            task_id__in=task_ids,
+        ).values_list('task_id', 'tag_id', 'tag__name'):
+            tags.setdefault(task_id, []).append([tag_id, name])
+        Task.objects.bulk_update(
+            [
+                Task(pk=task_id, tag_list=sorted(
+                    pairs, key=lambda tag: (tag[1], tag[0]),
+                ))
+                for task_id, pairs in tags.items()
+            ],
+            ['tag_list'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0022_task_completed_at_task_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='tag_list',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(fill_tag_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-18 23:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0024_task_due_idx_taskreminder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('state', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('batch', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'run_after'], name='job_state_run_after_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('state', 'queued')), fields=('name', 'object_id'), name='job_queued_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.2 on 2026-10-18 23:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0025_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='occurrence_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurrence',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurrence_of',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='tasks.task'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurrence_start',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('recurrence_of', 'occurrence_date'), name='task_occurrence_unique'),
+        ),
+    ]
@@ -2,11 +2,161 @@
 
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import (
+    Case,
+    ExpressionWrapper,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 User = get_user_model()
 
 
+def current_change_seq(user_id):
+    """Return an expression reading the value of a user's change counter."""
+    return Coalesce(
+        Subquery(
+            ChangeCounter.objects.filter(user_id=user_id).values('value')[:1]
+        ),
+        Value(0),
+        output_field=models.BigIntegerField(),
+    )
+
+
+class ChangeSeqField(models.BigIntegerField):
+    """
+    Value of the owner's change counter when a row was last written.
+
+    Like ``auto_now``, the field is set on every save, but by the database:
+    the statement writing the row reads the counter with a subquery, and
+    the value isn't copied back to the instance. ``tasks.signals`` bumps
+    the counter before the save, in the same transaction, so the row gets
+    the value of its own change (see ``tasks.sync``). Saves with
+    ``update_fields`` must list the field to stamp the row.
+
+    Rows written inside ``bulk_changes()`` keep their value: the receiver
+    of ``tasks_bulk_changed`` stamps the whole batch with one update,
+    instead of one subquery compiled per row.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', 0)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        """Return the expression reading the owner's counter."""
+        from .signals import in_bulk_changes
+
+        if in_bulk_changes():
+            return getattr(model_instance, self.attname)
+        return current_change_seq(model_instance.user_id)
+
+
+class TaskQuerySet(models.QuerySet):
+    """
+    QuerySet with the building blocks shared by the HTML views and the API.
+
+    Every list of tasks shown to a user should be built through
+    ``for_listing`` so the filters and ordering stay in one place. Lists
+    read tag names from ``Task.tag_list``, without joining the tags.
+    """
+
+    def for_user(self, user):
+        """Return tasks owned by the given user."""
+        return self.filter(user=user)
+
+    def with_tags(self):
+        """
+        Prefetch tags as model instances, for code needing more than
+        their ids and names.
+        """
+        return self.prefetch_related('tags')
+
+    def search(self, query, user=None):
+        """
+        Filter tasks whose title, description or tag names match the query.
+
+        Matching tasks are annotated with ``search_rank``, higher meaning
+        more relevant; see ``tasks.search`` for the database backends.
+        Given ``user``, the index is only searched among their entries.
+        """
+        from .search import get_search_backend
+
+        return get_search_backend().search(self, query, user)
+
+    def ranked(self):
+        """Order search results by relevance, newest first on ties."""
+        return self.order_by(*self.model.SEARCH_ORDER)
+
+    def with_urgency(self, today):
+        """
+        Annotate ``urgency``, the due-date bucket a task is shown in.
+
+        Args:
+            today (date): Date the buckets are relative to.
+        """
+        Task = self.model
+        return self.annotate(
+            urgency=Case(
+                When(status=Task.STATUS_COMPLETED, then=Value(Task.URGENCY_DONE)),
+                When(due_date__lt=today, then=Value(Task.URGENCY_OVERDUE)),
+                When(due_date=today, then=Value(Task.URGENCY_TODAY)),
+                default=Value(Task.URGENCY_UPCOMING),
+                output_field=models.CharField(),
+            ),
+        )
+
+    def rows(self, today):
+        """
+        Return the columns task cards show, as tuples, without descriptions.
+
+        The fields are ``Task.ROW_FIELDS``, followed by ``search_rank`` for
+        search results. Descriptions are replaced by ``has_description``.
+        """
+        fields = list(self.model.ROW_FIELDS)
+        if 'search_rank' in self.query.annotations:
+            fields.append('search_rank')
+        return self.prefetch_related(None).with_urgency(today).annotate(
+            has_description=ExpressionWrapper(
+                ~Q(description=''),
+                output_field=models.BooleanField(),
+            ),
+        ).values_list(*fields)
+
+    def ordered(self):
+        """
+        Order tasks for display: open tasks first, then by due date with
+        undated tasks last, newest first within the same due date.
+        """
+        return self.order_by(*self.model.LISTING_ORDER)
+
+    def for_listing(self, user, status=None, query=None):
+        """
+        Build the queryset used to list a user's tasks.
+
+        Args:
+            user: Owner of the tasks.
+            status (str, optional): Only include tasks with this status.
+            query (str, optional): Search query for title, description and
+                tag names; results are then ordered by relevance.
+
+        Returns:
+            TaskQuerySet: Ordered tasks.
+        """
+        queryset = self.for_user(user)
+        if status:
+            queryset = queryset.filter(status=status)
+        if query:
+            return queryset.search(query, user).ranked()
+        return queryset.ordered()
+
+
 class Task(models.Model):
     """
     Model representing a Task.
@@ -27,6 +177,21 @@ class Task(models.Model):
         (STATUS_COMPLETED, _('Completed')),
     ]
 
+    URGENCY_OVERDUE = 'overdue'
+    URGENCY_TODAY = 'today'
+    URGENCY_UPCOMING = 'upcoming'
+    URGENCY_DONE = 'done'
+
+    LISTING_ORDER = ('sort_group', 'due_date', '-created_at', '-id')
+    SEARCH_ORDER = ('-search_rank', '-id')
+    # Columns loaded for task cards, see TaskQuerySet.rows().
+    ROW_FIELDS = (
+        'id', 'title', 'status', 'due_date', 'sort_group', 'created_at',
+        'urgency', 'has_description', 'recurrence', 'tag_list',
+    )
+    # Fields the statistics of tasks.stats depend on.
+    STATS_FIELDS = ('status', 'due_date', 'completed_at')
+
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     status = models.CharField(
@@ -38,11 +203,141 @@ class Task(models.Model):
     due_time = models.TimeField(null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # When the task was last marked completed, None while it is open.
+    completed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # [id, name] of the task's tags ordered by name, copied from Tag.tasks
+    # by tasks.signals so reads don't join the tags (see tasks.tags).
+    tag_list = models.JSONField(default=list, blank=True, editable=False)
+    change_seq = ChangeSeqField()
+    # Recurrence rule of a series, e.g. 'FREQ=WEEKLY;BYDAY=MO,TH' (see
+    # tasks.recurrence). A series is listed once, at its next open
+    # occurrence, which is its due_date; the occurrences of a date window
+    # are expanded when it is viewed, and only those completed or edited
+    # get a row of their own.
+    recurrence = models.CharField(max_length=200, blank=True)
+    # Date the rule counts from, the due date the series was created with.
+    recurrence_start = models.DateField(null=True, blank=True, editable=False)
+    # Series and date of an occurrence that has a row.
+    recurrence_of = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='occurrences',
+    )
+    occurrence_date = models.DateField(null=True, blank=True, editable=False)
+    # Leading sort key of task listings: open tasks with a due date, open
+    # tasks without one, then the same two groups for completed tasks.
+    # Within a group due_date is either always set or always NULL, which
+    # keeps the listing order total for keyset pagination and lets the
+    # listing indexes cover the whole ORDER BY on every database.
+    sort_group = models.GeneratedField(
+        expression=Case(
+            When(status=STATUS_COMPLETED, due_date__isnull=False, then=Value(2)),
+            When(status=STATUS_COMPLETED, then=Value(3)),
+            When(due_date__isnull=False, then=Value(0)),
+            default=Value(1),
+        ),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        """
+        Indexes matching the filters and ordering of task listings. An
+        occurrence of a series has at most one row.
+        """
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recurrence_of', 'occurrence_date'],
+                name='task_occurrence_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=[
+                    'user', 'status', 'sort_group', 'due_date',
+                    '-created_at', '-id',
+                ],
+                name='task_user_status_sort_idx',
+            ),
+            models.Index(
+                fields=['user', 'sort_group', 'due_date', '-created_at', '-id'],
+                name='task_user_sort_idx',
+            ),
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='task_user_change_seq_idx',
+            ),
+            # Range scan of the deadlines due soon, see tasks.reminders.
+            models.Index(
+                fields=['due_date', 'due_time'],
+                name='task_due_idx',
+            ),
+        ]
 
     def __str__(self):
         """Return the string representation of the task."""
         return self.title
 
+    @property
+    def tag_names(self):
+        """Names of the task's tags, from ``tag_list``."""
+        return [name for _, name in self.tag_list]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded values the statistics depend on."""
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_stats_state = instance.stats_state()
+        return instance
+
+    def stats_state(self):
+        """
+        Return the values counted by ``tasks.stats``, or None if some of
+        them weren't loaded.
+        """
+        deferred = self.get_deferred_fields()
+        if any(name in deferred for name in self.STATS_FIELDS):
+            return None
+        return {name: getattr(self, name) for name in self.STATS_FIELDS}
+
+    def set_completed_at(self, now=None):
+        """Set ``completed_at`` if the task was just completed, or clear it."""
+        if self.status != self.STATUS_COMPLETED:
+            self.completed_at = None
+        elif self.completed_at is None:
+            self.completed_at = now or timezone.now()
+
+    def set_recurrence_start(self, restart=False):
+        """
+        Anchor a series at its due date, or clear the anchor of a task
+        without a rule.
+
+        Args:
+            restart (bool): Anchor the series again, after its rule or due
+                date changed.
+        """
+        if not self.recurrence:
+            self.recurrence_start = None
+        elif restart or self.recurrence_start is None:
+            self.recurrence_start = self.due_date
+
+    def save(self, *args, update_fields=None, **kwargs):
+        """
+        Save the task, keeping ``completed_at`` in step with the status and
+        anchoring new series.
+        """
+        self.set_completed_at()
+        self.set_recurrence_start()
+        if update_fields is not None and 'status' in update_fields:
+            update_fields = {*update_fields, 'completed_at'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
 
 class Tag(models.Model):
     """
@@ -57,7 +352,265 @@ class Tag(models.Model):
     name = models.CharField(max_length=50)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     tasks = models.ManyToManyField('Task', related_name='tags')
+    change_seq = ChangeSeqField()
+
+    class Meta:
+        """
+        A user can't have two tags with the same name. The constraint's
+        index also serves the (user, name) lookups and autocomplete scans.
+        """
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='tag_user_change_seq_idx',
+            ),
+        ]
 
     def __str__(self):
         """Return the string representation of the tag."""
         return self.name
+
+
+class TaskSearchEntry(models.Model):
+    """
+    Text of a task indexed for full-text search.
+
+    Kept in sync with the task and its tags by ``tasks.search``. The
+    database-specific index structures (FTS5 table on SQLite, tsvector
+    and trigram indexes on PostgreSQL) are created by migration 0019.
+
+    Attributes:
+        task: The indexed task.
+        user: Owner of the task, copied to scope searches.
+        title: Title of the task.
+        description: Description of the task.
+        tag_names: Space-separated names of the task's tags.
+    """
+
+    task = models.OneToOneField(
+        Task,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_entry',
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    tag_names = models.TextField(blank=True)
+
+    def __str__(self):
+        """Return the string representation of the search entry."""
+        return self.title
+
+
+class ChangeCounter(models.Model):
+    """
+    Number of changes made to a user's tasks and tags.
+
+    Bumped by ``tasks.caching`` whenever something shown in the user's
+    task lists changes, so the value versions cached list responses.
+
+    Attributes:
+        user: Owner of the tasks.
+        value: Number of changes so far.
+        changed_at: Time of the last change.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='change_counter',
+    )
+    value = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        """Return the string representation of the counter."""
+        return f'{self.user_id}: {self.value}'
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted task or tag, read by delta sync.
+
+    Written in the transaction deleting the object, with the owner's
+    change counter after the deletion (see ``tasks.sync``), and pruned
+    once older than ``TASKS_SYNC_TOMBSTONE_RETENTION``.
+
+    Attributes:
+        user: Owner of the deleted object.
+        kind: ``'task'`` or ``'tag'``.
+        object_id: Primary key the object had.
+        change_seq: Value of the owner's change counter at deletion.
+        deleted_at: Time of the deletion.
+    """
+
+    KIND_TASK = 'task'
+    KIND_TAG = 'tag'
+
+    KIND_CHOICES = [
+        (KIND_TASK, _('Task')),
+        (KIND_TAG, _('Tag')),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        """Index matching the delta sync lookup."""
+        indexes = [
+            models.Index(
+                fields=['user', 'change_seq'],
+                name='tombstone_user_change_seq_idx',
+            ),
+        ]
+
+    def __str__(self):
+        """Return the string representation of the tombstone."""
+        return f'{self.kind} {self.object_id}'
+
+
+class TaskStats(models.Model):
+    """
+    Counts of a user's tasks, kept up to date by ``tasks.signals``.
+
+    Counts by due date and completion date are relative to ``as_of``; a
+    row from an earlier day is rebuilt when it is read (see
+    ``tasks.stats``).
+
+    Attributes:
+        user: Owner of the tasks.
+        as_of: Day the counts are relative to.
+        pending: Pending tasks.
+        in_progress: Tasks in progress.
+        completed: Completed tasks.
+        overdue: Open tasks due before ``as_of``.
+        due_today: Open tasks due on ``as_of``.
+        completed_this_week: Tasks completed since the Monday of ``as_of``.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='task_stats',
+    )
+    as_of = models.DateField()
+    pending = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    overdue = models.IntegerField(default=0)
+    due_today = models.IntegerField(default=0)
+    completed_this_week = models.IntegerField(default=0)
+
+    def __str__(self):
+        """Return the string representation of the statistics."""
+        return f'{self.user_id} as of {self.as_of}'
+
+
+class TaskReminder(models.Model):
+    """
+    Reminder of a task's deadline, claimed before it is sent.
+
+    The unique task and deadline pair makes sure a reminder is sent once
+    per deadline, by whichever worker claims it first (see
+    ``tasks.reminders``). A task moved to a new deadline gets a new one.
+
+    Attributes:
+        task: Task to remind of.
+        due_at: Deadline of the task the reminder is for.
+        batch: Dispatch batch that claimed the reminder.
+        sent_at: When the backend sent it, None while it is being sent.
+    """
+
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name='reminders',
+    )
+    due_at = models.DateTimeField(db_index=True)
+    batch = models.UUIDField(db_index=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """One reminder per task and deadline."""
+        constraints = [
+            models.UniqueConstraint(
+                fields=['task', 'due_at'], name='task_reminder_unique',
+            ),
+        ]
+
+    def __str__(self):
+        """Return the string representation of the reminder."""
+        return f'{self.task_id} due {self.due_at}'
+
+
+class Job(models.Model):
+    """
+    Background job, run by ``manage.py run_worker`` (see ``tasks.jobs``).
+
+    A job asks the handler registered under ``name`` to process one
+    object. Queued jobs are unique per handler and object, and done jobs
+    are deleted; failed ones stay for inspection.
+
+    Attributes:
+        name: Handler of the job.
+        object_id: Primary key passed to the handler.
+        state: ``'queued'``, ``'running'`` or ``'failed'``.
+        attempts: Runs started so far.
+        run_after: When the job may run, later for retries.
+        batch: Worker batch running the job.
+        locked_until: When the claim of a running job expires.
+        last_error: Error of the last failed run.
+        created_at: When the job was queued.
+    """
+
+    STATE_QUEUED = 'queued'
+    STATE_RUNNING = 'running'
+    STATE_FAILED = 'failed'
+
+    STATE_CHOICES = [
+        (STATE_QUEUED, _('Queued')),
+        (STATE_RUNNING, _('Running')),
+        (STATE_FAILED, _('Failed')),
+    ]
+
+    name = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    state = models.CharField(
+        max_length=10, choices=STATE_CHOICES, default=STATE_QUEUED,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    batch = models.UUIDField(null=True, blank=True, db_index=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Deduplication of queued jobs and the index of the worker's poll."""
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'object_id'],
+                condition=models.Q(state='queued'),
+                name='job_queued_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['state', 'run_after'],
+                name='job_state_run_after_idx',
+            ),
+        ]
+
+    def __str__(self):
+        """Return the string representation of the job."""
+        return f'{self.name} {self.object_id} ({self.state})'
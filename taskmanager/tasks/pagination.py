@@ -0,0 +1,373 @@
+"""
+Keyset (cursor) pagination for task listings.
+
+Pages are selected with a WHERE clause on the position of the last task of
+the previous page instead of an OFFSET, so every page costs the same no
+matter how deep it is, and tasks created while a client is paging don't
+shift the following pages. The listing order is ``Task.LISTING_ORDER``:
+``(sort_group, due_date, -created_at, -id)``. ``sort_group`` already tells
+apart tasks with and without a due date, so ``due_date`` never has to be
+compared with NULL.
+
+Search results are ordered by ``Task.SEARCH_ORDER`` instead,
+``(-search_rank, -id)``, and use a cursor holding those two values. Ranks
+aren't fixed: SQLite's bm25 depends on statistics of every user's
+entries. The next page therefore starts from the current rank of the
+cursor's result, read with one more query, and falls back to the rank in
+the cursor if that result no longer matches. Pages stay in step when
+ranks shift together, as they do when other users' tasks change; a
+change that reorders the results themselves can still skip or repeat a
+few of them.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Task
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor can't be decoded."""
+
+
+def pack_position(position):
+    """Encode a list of JSON values as a URL-safe cursor string."""
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def unpack_position(cursor):
+    """Decode a cursor produced by ``pack_position``."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def encode_cursor(task):
+    """
+    Encode the listing position of a task as an opaque cursor string.
+
+    Args:
+        task (Task): Last task of a page.
+
+    Returns:
+        str: URL-safe cursor.
+    """
+    return pack_position([
+        task.sort_group,
+        task.due_date.isoformat() if task.due_date else None,
+        task.created_at.isoformat(),
+        task.id,
+    ])
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by ``encode_cursor``.
+
+    Returns:
+        tuple: ``(sort_group, due_date, created_at, id)``.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    try:
+        sort_group, due_date, created_at, task_id = unpack_position(cursor)
+        return (
+            int(sort_group),
+            date.fromisoformat(due_date) if due_date else None,
+            datetime.fromisoformat(created_at),
+            int(task_id),
+        )
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def encode_search_cursor(task):
+    """Encode the position of a search result as a cursor string."""
+    return pack_position([task.search_rank, task.id])
+
+
+def decode_search_cursor(cursor):
+    """
+    Decode a cursor produced by ``encode_search_cursor``.
+
+    Returns:
+        tuple: ``(search_rank, id)``.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    try:
+        search_rank, task_id = unpack_position(cursor)
+        return float(search_rank), int(task_id)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def ranges_after(sort_group, due_date, created_at, task_id):
+    """
+    Return filters selecting the tasks listed after the given position.
+
+    The listing order mixes ascending (sort_group, due_date) and
+    descending (created_at, id) keys, so "after" can't be written as one
+    row comparison that databases turn into an index range. Instead it is
+    split into disjoint ranges, each served by a plain index range scan,
+    returned in listing order: the rest of the current created_at, the
+    rest of the current due date, the rest of the group, later groups.
+    """
+    if due_date is None:
+        same_due = Q(sort_group=sort_group, due_date__isnull=True)
+    else:
+        same_due = Q(sort_group=sort_group, due_date=due_date)
+    ranges = [
+        same_due & Q(created_at=created_at, id__lt=task_id),
+        same_due & Q(created_at__lt=created_at),
+    ]
+    if due_date is not None:
+        ranges.append(Q(sort_group=sort_group, due_date__gt=due_date))
+    ranges.append(Q(sort_group__gt=sort_group))
+    return ranges
+
+
+def search_ranges_after(search_rank, task_id):
+    """Return filters selecting the search results after the given one."""
+    return [
+        Q(search_rank=search_rank, id__lt=task_id),
+        Q(search_rank__lt=search_rank),
+    ]
+
+
+def is_search(queryset):
+    """Return True if ``queryset`` holds ranked search results."""
+    return 'search_rank' in queryset.query.annotations
+
+
+def cursor_rank_query(queryset, cursor):
+    """
+    Return a query reading the current rank of the search result a cursor
+    points at, or None if there is no search cursor.
+
+    Raises:
+        InvalidCursor: If ``cursor`` is malformed.
+    """
+    if not cursor or not is_search(queryset):
+        return None
+    _, task_id = decode_search_cursor(cursor)
+    return queryset.order_by().filter(pk=task_id).values_list(
+        'search_rank', flat=True,
+    )
+
+
+@dataclass
+class KeysetPage:
+    """A page of tasks and the cursor of the page after it."""
+
+    items: list
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        """Return True if there are more tasks after this page."""
+        return self.next_cursor is not None
+
+
+def get_page_size(requested=None):
+    """
+    Return the page size to use, clamped to ``MAX_PAGE_SIZE``.
+
+    Args:
+        requested (str, optional): Page size asked for by the client.
+    """
+    default = getattr(settings, 'TASKS_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    try:
+        size = int(requested) if requested else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def page_ranges(queryset, cursor=None, rank=None):
+    """
+    Order ``queryset`` for pagination and split what follows ``cursor``.
+
+    ``rank`` is the current rank of the result a search cursor points at,
+    if it still matches (see ``cursor_rank_query``).
+
+    Returns:
+        tuple: The ordered queryset, the ``Q`` filters of the ranges to
+        query in order, and the function encoding the cursor of a row.
+
+    Raises:
+        InvalidCursor: If ``cursor`` is malformed.
+    """
+    if is_search(queryset):
+        order = Task.SEARCH_ORDER
+        encode, decode, after = (
+            encode_search_cursor, decode_search_cursor, search_ranges_after,
+        )
+    else:
+        order = Task.LISTING_ORDER
+        encode, decode, after = encode_cursor, decode_cursor, ranges_after
+
+    ranges = [Q()]
+    if cursor:
+        position = decode(cursor)
+        if rank is not None:
+            position = (rank, *position[1:])
+        ranges = after(*position)
+    return queryset.order_by(*order), ranges, encode
+
+
+def make_page(items, page_size, encode):
+    """Return the page of ``items``, fetched with one extra row."""
+    if len(items) <= page_size:
+        return KeysetPage(items)
+    items = items[:page_size]
+    return KeysetPage(items, encode(items[-1]))
+
+
+def paginate_tasks(queryset, cursor=None, page_size=None, row=None):
+    """
+    Return one page of tasks starting after ``cursor``.
+
+    The ranges following the cursor are queried in order until the page
+    is full; one extra row is fetched to tell whether a next page exists.
+
+    Args:
+        queryset (QuerySet): Tasks to paginate; its ordering is replaced
+            with ``Task.SEARCH_ORDER`` for search results and
+            ``Task.LISTING_ORDER`` otherwise.
+        cursor (str, optional): Cursor of the previous page.
+        page_size (int, optional): Number of tasks per page.
+        row (Callable, optional): Turns each fetched item into the item of
+            the page, e.g. tuples of ``TaskQuerySet.rows()`` into objects
+            with the attributes the cursor is built from.
+
+    Returns:
+        KeysetPage: Tasks of the page and the next cursor.
+
+    Raises:
+        InvalidCursor: If ``cursor`` is malformed.
+    """
+    page_size = page_size or get_page_size()
+    rank_query = cursor_rank_query(queryset, cursor)
+    rank = rank_query.first() if rank_query is not None else None
+    queryset, ranges, encode = page_ranges(queryset, cursor, rank)
+
+    items = []
+    for position_filter in ranges:
+        wanted = page_size + 1 - len(items)
+        fetched = queryset.filter(position_filter)[:wanted]
+        items += map(row, fetched) if row else fetched
+        if len(items) > page_size:
+            break
+    return make_page(items, page_size, encode)
+
+
+async def apaginate_tasks(queryset, cursor=None, page_size=None, row=None):
+    """Async version of ``paginate_tasks``, using the async ORM."""
+    page_size = page_size or get_page_size()
+    rank_query = cursor_rank_query(queryset, cursor)
+    rank = await rank_query.afirst() if rank_query is not None else None
+    queryset, ranges, encode = page_ranges(queryset, cursor, rank)
+
+    items = []
+    for position_filter in ranges:
+        wanted = page_size + 1 - len(items)
+        fetched = [
+            item async for item in queryset.filter(position_filter)[:wanted]
+        ]
+        items += map(row, fetched) if row else fetched
+        if len(items) > page_size:
+            break
+    return make_page(items, page_size, encode)
+
+
+class TaskCursorPagination(BasePagination):
+    """
+    DRF pagination class serving task lists page by page.
+
+    Responses look like ``{"next": <url or null>, "results": [...]}``.
+    Clients follow ``next`` until it is null; ``page_size`` may be passed
+    up to ``MAX_PAGE_SIZE``.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return the tasks of the requested page."""
+        self.request = request
+        try:
+            self.page = paginate_tasks(
+                queryset,
+                cursor=request.query_params.get(self.cursor_query_param),
+                page_size=get_page_size(
+                    request.query_params.get(self.page_size_query_param)
+                ),
+            )
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        return self.page.items
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Return the tasks of the requested page, for async views.
+
+        Unlike ``paginate_queryset``, ``request`` is a Django request and
+        an invalid cursor raises ``InvalidCursor``.
+        """
+        self.request = request
+        self.page = await apaginate_tasks(
+            queryset,
+            cursor=request.GET.get(self.cursor_query_param),
+            page_size=get_page_size(
+                request.GET.get(self.page_size_query_param)
+            ),
+        )
+        return self.page.items
+
+    def get_next_link(self):
+        """Return the URL of the next page, or None on the last page."""
+        if not self.page.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.page.next_cursor,
+        )
+
+    def get_paginated_response(self, data):
+        """Wrap the serialized page with the link to the next page."""
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        """Describe the paginated response for schema generation."""
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def next_page_url(request, cursor):
+    """Return the current URL pointing at the page after ``cursor``."""
+    return replace_query_param(request.get_full_path(), 'cursor', cursor)
@@ -0,0 +1,454 @@
+"""
+Recurring tasks.
+
+A series is a task with a ``recurrence`` rule, a subset of the iCalendar
+RRULE syntax: ``FREQ`` is ``DAILY``, ``WEEKLY`` or ``MONTHLY``, with an
+optional ``INTERVAL``, ``BYDAY`` (weekly, e.g. ``MO,TH``), ``BYMONTHDAY``
+(monthly, e.g. ``1,15``), and ``COUNT`` or ``UNTIL`` (``YYYYMMDD``). The
+shortcuts ``daily``, ``weekly`` and ``monthly`` are accepted too. Rules
+count from ``Task.recurrence_start``, the first due date of the series;
+like RRULE, a monthly rule skips the months without its day.
+
+Occurrences aren't stored. The series is listed once, at its next open
+occurrence, which is kept in its ``due_date``; the occurrences falling in
+a date window are expanded when the window is viewed (``?from=&to=`` on
+the task list and the API). Only an occurrence that is completed or
+edited gets a row, with ``recurrence_of`` and ``occurrence_date`` set
+(see ``materialize``), so a year of a daily task costs one row until its
+days are done.
+
+Expansion is pure date arithmetic from the rule, the anchor and the
+window, cached with ``functools.lru_cache``: listing the same window again
+expands nothing, and rules without ``COUNT`` jump straight to the window
+instead of walking from the anchor.
+"""
+
+import calendar
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import count
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from .models import Task
+
+FREQ_DAILY = 'DAILY'
+FREQ_WEEKLY = 'WEEKLY'
+FREQ_MONTHLY = 'MONTHLY'
+
+SHORTCUTS = {
+    'daily': f'FREQ={FREQ_DAILY}',
+    'weekly': f'FREQ={FREQ_WEEKLY}',
+    'monthly': f'FREQ={FREQ_MONTHLY}',
+}
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+# Longest window expanded at once, in days.
+MAX_WINDOW_DAYS = 366
+# How far ahead the next occurrence of a series is looked for.
+LOOKAHEAD = timedelta(days=4 * 366)
+CACHE_SIZE = 4096
+
+PART_RE = re.compile(r'^([A-Z]+)=([A-Z0-9,]+)$')
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    A parsed recurrence rule.
+
+    Attributes:
+        freq (str): ``FREQ_DAILY``, ``FREQ_WEEKLY`` or ``FREQ_MONTHLY``.
+        interval (int): Periods between occurrences.
+        byday (tuple): Weekdays of a weekly rule, 0 being Monday.
+        bymonthday (tuple): Days of the month of a monthly rule.
+        count (int): Number of occurrences, or None.
+        until (date): Last possible occurrence, or None.
+    """
+
+    freq: str
+    interval: int = 1
+    byday: tuple = ()
+    bymonthday: tuple = ()
+    count: int = None
+    until: date = None
+
+    @property
+    def text(self):
+        """The rule in canonical RRULE form."""
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in self.byday))
+        if self.bymonthday:
+            parts.append('BYMONTHDAY=' + ','.join(map(str, self.bymonthday)))
+        if self.count is not None:
+            parts.append(f'COUNT={self.count}')
+        if self.until is not None:
+            parts.append(f'UNTIL={self.until:%Y%m%d}')
+        return ';'.join(parts)
+
+    def period_start(self, start, index):
+        """Return the first day of the ``index``-th period from ``start``."""
+        if self.freq == FREQ_DAILY:
+            return start + timedelta(days=index * self.interval)
+        if self.freq == FREQ_WEEKLY:
+            monday = start - timedelta(days=start.weekday())
+            return monday + timedelta(weeks=index * self.interval)
+        months = start.month - 1 + index * self.interval
+        return date(start.year + months // 12, months % 12 + 1, 1)
+
+    def period_index(self, start, day):
+        """Return the index of the period ``day`` falls in."""
+        if self.freq == FREQ_DAILY:
+            return (day - start).days // self.interval
+        if self.freq == FREQ_WEEKLY:
+            monday = start - timedelta(days=start.weekday())
+            return (day - monday).days // 7 // self.interval
+        months = (day.year - start.year) * 12 + day.month - start.month
+        return months // self.interval
+
+    def period_days(self, start, index):
+        """Return the candidate days of the ``index``-th period, sorted."""
+        first = self.period_start(start, index)
+        if self.freq == FREQ_DAILY:
+            return [first]
+        if self.freq == FREQ_WEEKLY:
+            return [
+                first + timedelta(days=weekday)
+                for weekday in self.byday or (start.weekday(),)
+            ]
+        length = calendar.monthrange(first.year, first.month)[1]
+        return [
+            first.replace(day=day)
+            for day in self.bymonthday or (start.day,)
+            if day <= length
+        ]
+
+    def occurrences(self, start, first, last):
+        """
+        Yield the occurrences from ``start`` that fall in ``[first, last]``.
+
+        Rules with a ``COUNT`` are walked from ``start``, to count the
+        occurrences before the window; others start at its first period.
+        """
+        index = 0
+        if self.count is None and first > start:
+            index = self.period_index(start, first)
+        seen = 0
+        for index in count(index):
+            if self.period_start(start, index) > last:
+                return
+            for day in self.period_days(start, index):
+                if day < start:
+                    continue
+                seen += 1
+                if self.count is not None and seen > self.count:
+                    return
+                if (self.until is not None and day > self.until) or day > last:
+                    return
+                if day >= first:
+                    yield day
+
+
+def parse_rule(text):
+    """
+    Parse a recurrence rule.
+
+    Returns:
+        Rule: The parsed rule.
+
+    Raises:
+        ValidationError: If the rule is malformed or outside the subset.
+    """
+    text = text.strip()
+    text = SHORTCUTS.get(text.lower(), text.upper())
+    if text.startswith('RRULE:'):
+        text = text[len('RRULE:'):]
+    parts = {}
+    for part in filter(None, text.split(';')):
+        match = PART_RE.match(part)
+        if match is None or match[1] in parts:
+            raise ValidationError(
+                _('Invalid recurrence rule part: %(part)s'),
+                params={'part': part},
+            )
+        parts[match[1]] = match[2]
+
+    freq = parts.pop('FREQ', None)
+    if freq not in (FREQ_DAILY, FREQ_WEEKLY, FREQ_MONTHLY):
+        raise ValidationError(
+            _('The rule needs FREQ=DAILY, FREQ=WEEKLY or FREQ=MONTHLY.')
+        )
+    values = {'freq': freq}
+    try:
+        if 'INTERVAL' in parts:
+            values['interval'] = int(parts.pop('INTERVAL'))
+            if not 1 <= values['interval'] <= 366:
+                raise ValueError
+        if 'COUNT' in parts:
+            values['count'] = int(parts.pop('COUNT'))
+            if not 1 <= values['count'] <= 1000:
+                raise ValueError
+        if 'UNTIL' in parts:
+            values['until'] = datetime.strptime(
+                parts.pop('UNTIL'), '%Y%m%d'
+            ).date()
+        if 'BYDAY' in parts and freq == FREQ_WEEKLY:
+            values['byday'] = tuple(sorted({
+                WEEKDAYS.index(day) for day in parts.pop('BYDAY').split(',')
+            }))
+        if 'BYMONTHDAY' in parts and freq == FREQ_MONTHLY:
+            values['bymonthday'] = tuple(sorted({
+                int(day) for day in parts.pop('BYMONTHDAY').split(',')
+            }))
+            if not all(1 <= day <= 31 for day in values['bymonthday']):
+                raise ValueError
+    except ValueError:
+        raise ValidationError(_('Invalid value in the recurrence rule.'))
+    if parts:
+        raise ValidationError(
+            _('Unsupported recurrence rule parts: %(parts)s'),
+            params={'parts': ', '.join(parts)},
+        )
+    if 'count' in values and 'until' in values:
+        raise ValidationError(_('A rule can have COUNT or UNTIL, not both.'))
+    return Rule(**values)
+
+
+def normalize_rule(text):
+    """Return a rule in canonical form, or '' for no rule."""
+    return parse_rule(text).text if text and text.strip() else ''
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cached_rule(text):
+    """Parse a rule read from the database, once per text."""
+    return parse_rule(text)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def expand(text, start, first, last):
+    """
+    Return the occurrences of a rule in a window, cached per rule and
+    window.
+
+    Args:
+        text (str): Recurrence rule.
+        start (date): Anchor of the series.
+        first (date): First day of the window.
+        last (date): Last day of the window, included.
+
+    Returns:
+        tuple: Dates of the occurrences, in order.
+    """
+    return tuple(cached_rule(text).occurrences(start, first, last))
+
+
+def is_occurrence(series, day):
+    """Return True if ``day`` is an occurrence of ``series``."""
+    return bool(expand(series.recurrence, series.recurrence_start, day, day))
+
+
+def next_occurrence(series, after, skip=()):
+    """
+    Return the first occurrence of ``series`` after ``after`` that isn't in
+    ``skip``, or None if the rule ended.
+    """
+    rule = cached_rule(series.recurrence)
+    days = rule.occurrences(
+        series.recurrence_start, after + timedelta(days=1), after + LOOKAHEAD,
+    )
+    return next((day for day in days if day not in skip), None)
+
+
+def parse_window(params):
+    """
+    Read the ``from`` and ``to`` dates of a windowed listing.
+
+    Returns:
+        tuple: ``(first, last)``, or None if the request has no window.
+
+    Raises:
+        ValidationError: If a date is invalid or the window is empty or
+            longer than ``MAX_WINDOW_DAYS``.
+    """
+    if not params.get('from') and not params.get('to'):
+        return None
+    try:
+        first = date.fromisoformat(params.get('from', ''))
+        last = date.fromisoformat(params.get('to', ''))
+    except ValueError:
+        raise ValidationError(
+            _('"from" and "to" must be dates in YYYY-MM-DD format.')
+        )
+    if not 0 <= (last - first).days < MAX_WINDOW_DAYS:
+        raise ValidationError(
+            _('"to" must be on or after "from", at most %(days)d days later.'),
+            params={'days': MAX_WINDOW_DAYS - 1},
+        )
+    return first, last
+
+
+def in_window(first, last):
+    """
+    Return a filter of the tasks listed in the window ``[first, last]``:
+    tasks due in it, and open series due by its end, whose occurrences
+    may fall in it.
+    """
+    return Q(recurrence='', due_date__range=(first, last)) | (
+        ~Q(recurrence='')
+        & ~Q(status=Task.STATUS_COMPLETED)
+        & Q(due_date__lte=last)
+    )
+
+
+def window_occurrences(series, first, last):
+    """
+    Return the occurrences of the series in a window that have no row.
+
+    Occurrences before the due date of a series, its next open one, all
+    have a row. Costs one query for the occurrences with a row.
+
+    Args:
+        series (list): ``(id, recurrence, recurrence_start, due_date)``
+            of open series.
+
+    Returns:
+        list: ``(series_id, date)`` pairs.
+    """
+    if not series:
+        return []
+    materialized = set(
+        Task.objects.filter(
+            recurrence_of__in=[pk for pk, *_ in series],
+            occurrence_date__range=(first, last),
+        ).values_list('recurrence_of_id', 'occurrence_date')
+    )
+    return [
+        (pk, day)
+        for pk, text, start, due_date in series
+        for day in expand(text, start, max(first, due_date), last)
+        if (pk, day) not in materialized
+    ]
+
+
+def occurrence_task(series, day):
+    """Return an unsaved task for the occurrence of ``series`` on ``day``."""
+    return Task(
+        user_id=series.user_id,
+        title=series.title,
+        description=series.description,
+        status=series.status,
+        due_date=day,
+        due_time=series.due_time,
+        tag_list=series.tag_list,
+        recurrence_of_id=series.pk,
+        occurrence_date=day,
+        created_at=series.created_at,
+        updated_at=series.updated_at,
+    )
+
+
+def window_tasks(queryset, first, last):
+    """
+    Return the tasks of ``queryset`` listed in a window, with unsaved
+    tasks for the occurrences without a row, ordered by due date.
+
+    Costs two queries, whatever the number of occurrences.
+    """
+    tasks = []
+    series = {}
+    for task in queryset.filter(in_window(first, last)).order_by():
+        if task.recurrence:
+            series[task.pk] = task
+        else:
+            tasks.append(task)
+    tasks += [
+        occurrence_task(series[pk], day)
+        for pk, day in window_occurrences(
+            [
+                (task.pk, task.recurrence, task.recurrence_start, task.due_date)
+                for task in series.values()
+            ],
+            first, last,
+        )
+    ]
+    tasks.sort(key=lambda task: (
+        task.due_date,
+        task.status == Task.STATUS_COMPLETED,
+        task.due_time is None,
+        task.due_time or datetime.min.time(),
+        task.recurrence_of_id or task.pk,
+    ))
+    return tasks
+
+
+def advance_series(series):
+    """
+    Move a series to its next occurrence without a row, or complete it
+    when its rule has ended.
+    """
+    materialized = set(
+        series.occurrences.filter(
+            occurrence_date__gt=series.due_date,
+        ).values_list('occurrence_date', flat=True)
+    )
+    day = next_occurrence(series, series.due_date, materialized)
+    if day is None:
+        series.status = Task.STATUS_COMPLETED
+    else:
+        series.due_date = day
+    series.save(
+        update_fields=['due_date', 'status', 'updated_at', 'change_seq'],
+    )
+
+
+def materialize(series, day, **values):
+    """
+    Give the occurrence of ``series`` on ``day`` a row, or update its row.
+
+    The row copies the series with its tags, then takes ``values``. When
+    the occurrence is the series' next open one, the series moves on.
+
+    Returns:
+        Task: The row of the occurrence.
+
+    Raises:
+        ValidationError: If ``day`` isn't an occurrence of the series.
+    """
+    if series.recurrence_start is None or not is_occurrence(series, day):
+        raise ValidationError(
+            _('%(day)s is not an occurrence of this task.'),
+            params={'day': day.isoformat()},
+        )
+    with transaction.atomic():
+        task = series.occurrences.filter(occurrence_date=day).first()
+        created = False
+        if task is None:
+            task = occurrence_task(series, day)
+            try:
+                with transaction.atomic():
+                    for name, value in values.items():
+                        setattr(task, name, value)
+                    task.save()
+                created = True
+            except IntegrityError:
+                # A concurrent request gave the occurrence its row first.
+                task = series.occurrences.get(occurrence_date=day)
+        if not created:
+            for name, value in values.items():
+                setattr(task, name, value)
+            task.save()
+        if created and series.tag_list:
+            task.tags.set([pk for pk, _ in series.tag_list])
+        if day == series.due_date and series.status != Task.STATUS_COMPLETED:
+            advance_series(series)
+    return task
@@ -0,0 +1,399 @@
+"""
+Reminders of task deadlines.
+
+A task's deadline is its ``due_date`` at its ``due_time`` in the current
+time zone, or at ``TASKS_REMINDER_ALL_DAY_TIME`` for a task with a date
+only. Its reminder is due ``TASKS_REMINDER_LEAD`` seconds earlier.
+
+``manage.py run_reminders`` runs a ``ReminderScheduler``. Every scan reads
+the open tasks whose reminders fall in the next window with one range scan
+of the ``(due_date, due_time)`` index, so its cost depends on the tasks
+due soon, not on the size of the table, and keeps them in a heap ordered
+by reminder time. Between scans the worker sleeps until the earliest
+reminder is due, then pops what is due and dispatches it in batches.
+Reminders missed while no worker ran are still sent up to
+``TASKS_REMINDER_GRACE`` seconds late.
+
+A batch is dispatched in three steps:
+
+- the tasks are read again, dropping those completed, deleted or moved
+  to another deadline since the scan;
+- a ``TaskReminder`` is inserted per task and deadline, skipping those
+  that exist; the batch keeps the ones it inserted, so two workers, or
+  two scans, never claim the same reminder;
+- the backend selected by ``TASKS_REMINDER_BACKEND`` sends them and the
+  claims are marked sent. If it fails, the claims are released and the
+  next scan retries them.
+
+Reminders are therefore sent once per deadline. A worker stopped between
+sending a batch and marking it leaves the claims unsent: they aren't
+sent again, a duplicate being worse than a missed reminder.
+"""
+
+import heapq
+import logging
+import sys
+import time as time_module
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import send_mass_mail
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .models import Task, TaskReminder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEAD = 60 * 60
+DEFAULT_GRACE = 60 * 60
+DEFAULT_ALL_DAY_TIME = '09:00'
+DEFAULT_WINDOW = 10 * 60
+DEFAULT_BATCH_SIZE = 100
+
+REMINDER_FIELDS = (
+    'pk', 'user_id', 'user__username', 'user__email', 'title', 'due_date',
+    'due_time',
+)
+
+
+def get_lead():
+    """Return how long before a deadline its reminder is due."""
+    return timedelta(seconds=getattr(
+        settings, 'TASKS_REMINDER_LEAD', DEFAULT_LEAD,
+    ))
+
+
+def get_grace():
+    """Return how late a missed reminder is still sent."""
+    return timedelta(seconds=getattr(
+        settings, 'TASKS_REMINDER_GRACE', DEFAULT_GRACE,
+    ))
+
+
+def all_day_time():
+    """Return the time of day of the deadline of tasks without a time."""
+    return time.fromisoformat(getattr(
+        settings, 'TASKS_REMINDER_ALL_DAY_TIME', DEFAULT_ALL_DAY_TIME,
+    ))
+
+
+def deadline(due_date, due_time):
+    """Return the aware deadline of a task due on ``due_date``."""
+    return timezone.make_aware(
+        datetime.combine(due_date, due_time or all_day_time())
+    )
+
+
+@dataclass(order=True)
+class Reminder:
+    """
+    Reminder of one deadline of a task, ordered by when it is due.
+
+    Attributes:
+        remind_at (datetime): When the reminder is due.
+        task_id (int): Task to remind of.
+        due_at (datetime): Deadline of the task.
+        user_id (int): Owner of the task.
+        username (str): Owner's username.
+        email (str): Owner's email address, possibly empty.
+        title (str): Title of the task.
+    """
+
+    remind_at: datetime
+    task_id: int
+    due_at: datetime = field(compare=False)
+    user_id: int = field(compare=False)
+    username: str = field(compare=False)
+    email: str = field(compare=False)
+    title: str = field(compare=False)
+
+    @property
+    def key(self):
+        """The task and deadline identifying the reminder."""
+        return self.task_id, self.due_at
+
+
+def on_day(day, after=None, before=None):
+    """
+    Return a filter of the tasks due on ``day`` between two times.
+
+    Tasks without a time are included if the all-day time is in range.
+    """
+    times = Q()
+    if after is not None:
+        times &= Q(due_time__gte=after)
+    if before is not None:
+        times &= Q(due_time__lt=before)
+    all_day = all_day_time()
+    if times and (after is None or all_day >= after) and (
+        before is None or all_day < before
+    ):
+        times |= Q(due_time__isnull=True)
+    return Q(due_date=day) & times
+
+
+def due_between(start, end):
+    """
+    Return a filter of the tasks with a deadline in ``[start, end)``.
+
+    Each condition is a range of the ``(due_date, due_time)`` index.
+    """
+    start = timezone.localtime(start)
+    end = timezone.localtime(end)
+    first, last = start.date(), end.date()
+    if first == last:
+        return on_day(first, start.time(), end.time())
+    return (
+        on_day(first, after=start.time())
+        | Q(due_date__gt=first, due_date__lt=last)
+        | on_day(last, before=end.time())
+    )
+
+
+def load_reminders(queryset):
+    """Yield the reminders of the open tasks of ``queryset``."""
+    lead = get_lead()
+    rows = (
+        queryset.exclude(status=Task.STATUS_COMPLETED)
+        .order_by()
+        .values_list(*REMINDER_FIELDS)
+        .iterator()
+    )
+    for task_id, user_id, username, email, title, due_date, due_time in rows:
+        due_at = deadline(due_date, due_time)
+        yield Reminder(
+            remind_at=due_at - lead,
+            task_id=task_id,
+            due_at=due_at,
+            user_id=user_id,
+            username=username,
+            email=email,
+            title=title,
+        )
+
+
+def scan_reminders(start, end):
+    """
+    Return the reminders due in ``[start, end)`` that nobody claimed yet.
+
+    Costs two indexed range queries: the tasks with a deadline in the
+    range, and the claimed reminders of those deadlines.
+    """
+    lead = get_lead()
+    claimed = set(
+        TaskReminder.objects.filter(
+            due_at__gte=start + lead, due_at__lt=end + lead,
+        ).values_list('task_id', 'due_at')
+    )
+    return [
+        reminder
+        for reminder in load_reminders(
+            Task.objects.filter(due_between(start + lead, end + lead))
+        )
+        if start <= reminder.remind_at < end and reminder.key not in claimed
+    ]
+
+
+def claim_reminders(reminders, batch):
+    """
+    Claim reminders for a dispatch batch.
+
+    Returns:
+        list: The reminders the batch claimed, without those claimed
+        before.
+    """
+    TaskReminder.objects.bulk_create(
+        [
+            TaskReminder(task_id=reminder.task_id, due_at=reminder.due_at,
+                         batch=batch)
+            for reminder in reminders
+        ],
+        ignore_conflicts=True,
+    )
+    claimed = set(
+        TaskReminder.objects.filter(batch=batch).values_list('task_id', flat=True)
+    )
+    return [reminder for reminder in reminders if reminder.task_id in claimed]
+
+
+class ConsoleBackend:
+    """Write reminders to a stream, by default standard output."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def send(self, reminders):
+        """Write one line per reminder."""
+        stream = self.stream or sys.stdout
+        for reminder in reminders:
+            due_at = timezone.localtime(reminder.due_at)
+            stream.write(
+                f'Reminder for {reminder.username}: "{reminder.title}" '
+                f'is due {due_at:%Y-%m-%d %H:%M}\n'
+            )
+        stream.flush()
+
+
+class EmailBackend:
+    """
+    Email reminders to the owners of the tasks, through Django's email
+    backend.
+
+    A batch is sent over one connection. Owners without an email address
+    are skipped.
+    """
+
+    def message(self, reminder):
+        """Return the ``(subject, body, from, to)`` of a reminder."""
+        due_at = timezone.localtime(reminder.due_at)
+        subject = _('Reminder: %(title)s') % {'title': reminder.title}
+        body = _('Your task "%(title)s" is due %(due)s.') % {
+            'title': reminder.title,
+            'due': f'{due_at:%Y-%m-%d %H:%M}',
+        }
+        return subject, body, None, [reminder.email]
+
+    def send(self, reminders):
+        """Send one email per reminder."""
+        send_mass_mail(
+            [self.message(reminder) for reminder in reminders if reminder.email],
+            fail_silently=False,
+        )
+
+
+BACKENDS = {
+    'console': ConsoleBackend,
+    'email': EmailBackend,
+}
+
+
+def get_backend():
+    """Return the backend selected by ``TASKS_REMINDER_BACKEND``."""
+    name = getattr(settings, 'TASKS_REMINDER_BACKEND', None) or 'console'
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ImproperlyConfigured(f'Unknown reminder backend {name!r}.')
+
+
+class ReminderScheduler:
+    """
+    Heap of the reminders of the next window, dispatched when due.
+
+    Attributes:
+        backend: Sends the reminders, see ``BACKENDS``.
+        window (timedelta): How far ahead each scan reads.
+        batch_size (int): Reminders sent per batch.
+        heap (list): Scanned reminders not sent yet, earliest first.
+    """
+
+    def __init__(self, backend=None, window=DEFAULT_WINDOW,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.backend = backend or get_backend()
+        self.window = timedelta(seconds=window)
+        self.batch_size = batch_size
+        self.heap = []
+
+    def scan(self, now=None):
+        """
+        Replace the heap with the reminders due from ``TASKS_REMINDER_GRACE``
+        ago to the end of the window, and delete the claims of deadlines
+        too old to be scanned again.
+
+        Returns:
+            int: Reminders in the heap.
+        """
+        now = now or timezone.now()
+        start = now - get_grace()
+        TaskReminder.objects.filter(due_at__lt=start + get_lead()).delete()
+        self.heap = scan_reminders(start, now + self.window)
+        heapq.heapify(self.heap)
+        return len(self.heap)
+
+    def next_due(self):
+        """Return when the earliest reminder of the heap is due, or None."""
+        return self.heap[0].remind_at if self.heap else None
+
+    def pop_due(self, now):
+        """Remove and return the reminders of the heap due by ``now``."""
+        due = []
+        while self.heap and self.heap[0].remind_at <= now:
+            due.append(heapq.heappop(self.heap))
+        return due
+
+    def dispatch(self, reminders):
+        """
+        Send reminders that still match their task, if nobody claimed them.
+
+        Returns:
+            int: Reminders sent.
+        """
+        current = {
+            reminder.key: reminder
+            for reminder in load_reminders(Task.objects.filter(
+                pk__in=[reminder.task_id for reminder in reminders],
+            ))
+        }
+        reminders = [
+            current[reminder.key] for reminder in reminders
+            if reminder.key in current
+        ]
+        if not reminders:
+            return 0
+        batch = uuid.uuid4()
+        reminders = claim_reminders(reminders, batch)
+        if not reminders:
+            return 0
+        claims = TaskReminder.objects.filter(batch=batch)
+        try:
+            self.backend.send(reminders)
+        except Exception:
+            logger.exception('Sending %d reminders failed.', len(reminders))
+            claims.delete()
+            return 0
+        claims.update(sent_at=timezone.now())
+        return len(reminders)
+
+    def run_pending(self, now=None):
+        """
+        Dispatch the reminders due by ``now`` in batches.
+
+        Returns:
+            int: Reminders sent.
+        """
+        due = self.pop_due(now or timezone.now())
+        return sum(
+            self.dispatch(due[index:index + self.batch_size])
+            for index in range(0, len(due), self.batch_size)
+        )
+
+    def run(self, interval, sleep=time_module.sleep, report=None):
+        """
+        Scan every ``interval`` seconds and send reminders when due, until
+        interrupted.
+
+        Args:
+            interval (int): Seconds between scans, at most the window.
+            sleep (Callable[[float], None]): Waits a number of seconds.
+            report (Callable[[int, int], None], optional): Called after
+                each scan with the reminders scanned and those sent since
+                the previous scan.
+        """
+        next_scan = timezone.now()
+        sent = 0
+        while True:
+            now = timezone.now()
+            if now >= next_scan:
+                scanned = self.scan(now)
+                if report is not None:
+                    report(scanned, sent)
+                sent = 0
+                next_scan = now + timedelta(seconds=interval)
+            sent += self.run_pending(now)
+            wake = min(next_scan, self.next_due() or next_scan)
+            sleep(max((wake - timezone.now()).total_seconds(), 0))
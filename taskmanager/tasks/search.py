@@ -0,0 +1,232 @@
+"""
+Ranked full-text search over task titles, descriptions and tag names.
+
+Searchable text lives in ``TaskSearchEntry`` rows, one per task, indexed
+by a database-specific backend:
+
+- PostgreSQL: a weighted ``tsvector`` column with a GIN index, plus a
+  trigram index on title and tag names for substring matches.
+- SQLite: an FTS5 table kept in sync with the entries by triggers.
+- Anything else: ``icontains`` lookups on the entries, unranked.
+
+The backend is picked from the database vendor and can be forced with the
+``TASKS_SEARCH_BACKEND`` setting (``'postgres'``, ``'sqlite'`` or
+``'basic'``). Given the user, matches are looked up among their entries
+only, rather than among those of every user. Entries are refreshed once
+per transaction after tasks or their tags change, and ``manage.py
+rebuild_search_index`` rebuilds them.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Task, TaskSearchEntry
+from .transactions import OnCommitBatch
+
+ENTRY_TABLE = TaskSearchEntry._meta.db_table
+FTS_TABLE = f'{ENTRY_TABLE}_fts'
+TASK_ID = f'"{Task._meta.db_table}"."id"'
+
+
+def query_terms(query):
+    """Split a search query into words."""
+    return re.findall(r'\w+', query or '')
+
+
+class BasicSearchBackend:
+    """Unranked substring search usable on any database."""
+
+    def search(self, queryset, query, user=None):
+        """
+        Filter tasks matching ``query`` and annotate their ``search_rank``.
+
+        Args:
+            queryset (QuerySet): Tasks to search.
+            query (str): Search query typed by the user.
+            user (optional): Owner of the tasks, whose entries are the
+                only ones searched.
+
+        Returns:
+            QuerySet: Matching tasks with a ``search_rank`` annotation,
+            higher meaning more relevant.
+        """
+        entries = TaskSearchEntry.objects.filter(
+            Q(title__icontains=query)
+            | Q(description__icontains=query)
+            | Q(tag_names__icontains=query)
+        )
+        if user is not None:
+            entries = entries.filter(user=user)
+        return queryset.filter(
+            pk__in=entries.values('task_id'),
+        ).annotate(
+            search_rank=Value(0.0, output_field=FloatField()),
+        )
+
+    def rebuild(self):
+        """Rebuild the backend's own index structures, if any."""
+
+
+class SQLiteSearchBackend(BasicSearchBackend):
+    """Search backed by an SQLite FTS5 table ranked with bm25."""
+
+    # bm25 weights of the title, tag_names and description columns.
+    WEIGHTS = '10.0, 5.0, 1.0'
+
+    def search(self, queryset, query, user=None):
+        """
+        Filter tasks with an FTS5 prefix query, ranked by bm25.
+
+        bm25 weighs terms with statistics of the whole FTS table, so ranks
+        change as other users' tasks do; see ``tasks.pagination`` for how
+        search cursors cope with it.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return super().search(queryset, query, user)
+
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        params = (match,)
+        if user is not None:
+            sql += (
+                f' AND rowid IN (SELECT task_id FROM {ENTRY_TABLE} '
+                f'WHERE user_id = %s)'
+            )
+            params += (user.pk,)
+        return queryset.filter(
+            pk__in=RawSQL(sql, params),
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, {self.WEIGHTS}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = {TASK_ID}',
+                (match,),
+                output_field=FloatField(),
+            ),
+        )
+
+    def rebuild(self):
+        """Rebuild the FTS5 table from the search entries."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+            )
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    """
+    Search backed by a weighted tsvector and a trigram index.
+
+    Words are matched as prefixes by full-text search; the whole query is
+    also matched as a substring of the title and tag names, which the
+    trigram index serves. Rank combines ``ts_rank`` and trigram similarity.
+    """
+
+    TRIGRAM_TEXT = "(title || ' ' || tag_names)"
+
+    def search(self, queryset, query, user=None):
+        """Filter tasks with a prefix tsquery or substring match, ranked."""
+        terms = query_terms(query)
+        if not terms:
+            return super().search(queryset, query, user)
+
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        pattern = '%{}%'.format(re.sub(r'([%_\\])', r'\\\1', query))
+        sql = (
+            f"SELECT task_id FROM {ENTRY_TABLE} "
+            f"WHERE (document @@ to_tsquery('simple', %s) "
+            f"OR {self.TRIGRAM_TEXT} ILIKE %s)"
+        )
+        params = (tsquery, pattern)
+        if user is not None:
+            sql += ' AND user_id = %s'
+            params += (user.pk,)
+        return queryset.filter(
+            pk__in=RawSQL(sql, params),
+        ).annotate(
+            search_rank=RawSQL(
+                f"SELECT ts_rank(document, to_tsquery('simple', %s)) "
+                f"+ similarity({self.TRIGRAM_TEXT}, %s) "
+                f"FROM {ENTRY_TABLE} WHERE task_id = {TASK_ID}",
+                (tsquery, query),
+                output_field=FloatField(),
+            ),
+        )
+
+    def rebuild(self):
+        """Refresh planner statistics of the search entries."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {ENTRY_TABLE}')
+
+
+BACKENDS = {
+    'basic': BasicSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+    'postgres': PostgresSearchBackend,
+}
+
+VENDOR_BACKENDS = {
+    'sqlite': 'sqlite',
+    'postgresql': 'postgres',
+}
+
+
+def get_search_backend():
+    """Return the search backend for the default database."""
+    name = getattr(settings, 'TASKS_SEARCH_BACKEND', None)
+    if not name:
+        name = VENDOR_BACKENDS.get(connection.vendor, 'basic')
+    return BACKENDS[name]()
+
+
+def index_tasks(task_ids):
+    """
+    Refresh the search entries of the given tasks.
+
+    Tag names are read from ``Task.tag_list``, in the same query as the
+    tasks. Entries of tasks that no longer exist are removed by the
+    cascade when the task is deleted, so only existing tasks are written.
+
+    Args:
+        task_ids (Iterable[int]): Ids of the tasks to index.
+
+    Returns:
+        int: Number of entries written.
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return 0
+
+    entries = [
+        TaskSearchEntry(
+            task_id=task_id,
+            user_id=user_id,
+            title=title,
+            description=description,
+            tag_names=' '.join(name for _, name in tag_list),
+        )
+        for task_id, user_id, title, description, tag_list in (
+            Task.objects.filter(pk__in=task_ids).values_list(
+                'id', 'user_id', 'title', 'description', 'tag_list',
+            )
+        )
+    ]
+    TaskSearchEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['task'],
+        update_fields=['user', 'title', 'description', 'tag_names'],
+    )
+    return len(entries)
+
+
+search_reindex = OnCommitBatch(index_tasks)
+
+
+def schedule_reindex(task_ids):
+    """Refresh the search entries of the given tasks after commit."""
+    search_reindex.add(task_ids)
@@ -1,8 +1,80 @@
 """Serializers for the tasks app."""
 
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
 from .models import Task, Tag
+from .recurrence import normalize_rule
+from .tags import resolve_tags
+
+EMBED_PARAM = 'embed'
+EMBED_TAGS = 'tags'
+
+
+def embeds_tags(request):
+    """Return True if the request asks for tag names with ``?embed=tags``."""
+    if request is None:
+        return False
+    return EMBED_TAGS in request.GET.get(EMBED_PARAM, '').split(',')
+
+
+class UserTagField(serializers.PrimaryKeyRelatedField):
+    """Id of one of the requesting user's tags."""
+
+    def get_queryset(self):
+        """Return the tags of the user in ``context['request']``."""
+        return Tag.objects.filter(user=self.context['request'].user)
+
+
+class TagIdsField(serializers.ManyRelatedField):
+    """
+    Tags of a task, as ids of the requesting user's tags.
+
+    Submitted ids are checked with one query for the whole list, instead
+    of one per id. Tags are read from ``Task.tag_list``, ordered by name,
+    so serializing tasks doesn't query their tags. With
+    ``context['embed_tags']`` they are represented as
+    ``{'id': ..., 'name': ...}`` objects rather than ids.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(child_relation=UserTagField(), **kwargs)
+
+    def to_internal_value(self, data):
+        """Return the user's tags with the submitted ids, in their order."""
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        pks = []
+        for value in data:
+            try:
+                if isinstance(value, bool):
+                    raise TypeError
+                pk = int(value)
+                if pk != value and str(pk) != value:
+                    # int() truncates fractions, e.g. 1.9 to 1.
+                    raise ValueError
+                pks.append(pk)
+            except (TypeError, ValueError):
+                child.fail('incorrect_type', data_type=type(value).__name__)
+        tags = child.get_queryset().in_bulk(pks) if pks else {}
+        for pk in pks:
+            if pk not in tags:
+                child.fail('does_not_exist', pk_value=pk)
+        return [tags[pk] for pk in dict.fromkeys(pks)]
+
+    def get_attribute(self, instance):
+        """Return the ``[id, name]`` pairs of the task's tags."""
+        return instance.tag_list
+
+    def to_representation(self, tag_list):
+        """Return the tag ids, or the tags with their names if embedded."""
+        if self.context.get('embed_tags'):
+            return [{'id': pk, 'name': name} for pk, name in tag_list]
+        return [pk for pk, _ in tag_list]
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -10,19 +82,25 @@ class TaskSerializer(serializers.ModelSerializer):
     Serializer for Task model with support for tags.
 
     Fields:
-        - tags: PrimaryKeyRelatedField for existing tags.
+        - tags: Ids of existing tags of the requesting user (see
+          ``TagIdsField``).
         - tags_names: List of tag names to create or associate with task.
+        - recurrence: Recurrence rule of a series (see
+          ``tasks.recurrence``).
+        - series, occurrence_date: Series and date of an occurrence;
+          occurrences without a row, listed in date windows, have a null
+          ``id``.
     """
 
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all(),
-    )
+    tags = TagIdsField()
     tags_names = serializers.ListField(
-        child=serializers.CharField(),
+        child=serializers.CharField(
+            max_length=Tag._meta.get_field('name').max_length,
+        ),
         write_only=True,
         required=False,
     )
+    series = serializers.IntegerField(source='recurrence_of_id', read_only=True)
 
     class Meta:
         """Meta options for TaskSerializer."""
@@ -35,8 +113,31 @@ class TaskSerializer(serializers.ModelSerializer):
             'due_date',
             'tags',
             'tags_names',
+            'recurrence',
+            'series',
+            'occurrence_date',
+            'updated_at',
         ]
 
+    def validate_recurrence(self, value):
+        """Return the recurrence rule in canonical form."""
+        try:
+            return normalize_rule(value)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+
+    def validate(self, attrs):
+        """Require a due date on a recurring task, its first occurrence."""
+        recurrence = attrs.get(
+            'recurrence', getattr(self.instance, 'recurrence', ''),
+        )
+        due_date = attrs.get('due_date', getattr(self.instance, 'due_date', None))
+        if recurrence and not due_date:
+            raise serializers.ValidationError(
+                {'due_date': _('A recurring task needs a due date.')}
+            )
+        return attrs
+
     def create(self, validated_data):
         """
         Create a new Task instance.
@@ -47,12 +148,10 @@ class TaskSerializer(serializers.ModelSerializer):
         tags_names = validated_data.pop('tags_names', [])
         task = super().create(validated_data)
 
-        for name in tags_names:
-            tag, _ = Tag.objects.get_or_create(
-                name=name,
-                user=self.context['request'].user,
+        if tags_names:
+            task.tags.add(
+                *resolve_tags(self.context['request'].user, tags_names)
             )
-            task.tags.add(tag)
 
         return task
 
@@ -64,15 +163,72 @@ class TaskSerializer(serializers.ModelSerializer):
         associate the new ones, creating tags as needed.
         """
         tags_names = validated_data.pop('tags_names', [])
+        if any(
+            name in validated_data
+            and validated_data[name] != getattr(instance, name)
+            for name in ('recurrence', 'due_date')
+        ):
+            # Anchored again at the new due date when saved.
+            instance.recurrence_start = None
         task = super().update(instance, validated_data)
 
         if tags_names:
-            task.tags.clear()
-            for name in tags_names:
-                tag, _ = Tag.objects.get_or_create(
-                    name=name,
-                    user=self.context['request'].user,
-                )
-                task.tags.add(tag)
+            task.tags.set(
+                resolve_tags(self.context['request'].user, tags_names)
+            )
 
         return task
+
+
+class TagSerializer(serializers.ModelSerializer):
+    """Read-only serializer of a tag, used by delta sync."""
+
+    class Meta:
+        """Meta options for TagSerializer."""
+        model = Tag
+        fields = ['id', 'name']
+        read_only_fields = fields
+
+
+class BulkTaskSerializer(TaskSerializer):
+    """
+    Validates one item of a bulk create or update request.
+
+    Tags are taken as plain ids here; ``tasks.bulk`` checks them against
+    the user's tags for the whole batch in one query.
+    """
+
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+    )
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """
+    Validates the ids of a bulk status change or delete request.
+
+    The largest allowed batch is read from ``context['max_batch_size']``.
+    """
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+    )
+
+    def validate_ids(self, ids):
+        """Reject batches larger than the allowed size."""
+        max_batch_size = self.context.get('max_batch_size')
+        if max_batch_size is not None and len(ids) > max_batch_size:
+            raise serializers.ValidationError(
+                self.fields['ids'].error_messages['max_length'].format(
+                    max_length=max_batch_size,
+                )
+            )
+        return ids
+
+
+class BulkStatusSerializer(BulkIdsSerializer):
+    """Validates a bulk status change request."""
+
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES)
@@ -1,38 +1,451 @@
-"""Signals for automatically cleaning up unused tags in tasks app."""
+"""
+Signals keeping tags and the task search index in shape.
 
-from django.db.models import Count
-from django.db.models.signals import m2m_changed, post_delete
-from django.dispatch import receiver
+Unused tags are cleaned up automatically. Only tags detached from a task
+in the current transaction are checked. With ``TASKS_TAG_CLEANUP =
+'queued'`` a cleanup job per tag is queued in the transaction and the
+orphans among them are deleted by the worker (see ``tasks.jobs``). With
+``'immediate'`` their ids are collected while the transaction runs and the
+orphans are deleted once it commits, before the response. With
+``'deferred'`` the signals do nothing and orphans are removed by the
+``cleanup_tags`` management command instead.
 
-from .models import Task, Tag
+Search entries of tasks whose title, description or tags change are
+refreshed once the transaction commits (see ``tasks.search``). Changes to
+tasks and tags bump the owner's change counter right away, in the same
+transaction, which versions the cached lists and tag autocomplete
+indexes (see ``tasks.caching`` and ``tasks.autocomplete``). The written rows are then stamped
+with the new counter value and deletions leave tombstones, for delta
+sync (see ``tasks.sync``). Once the transaction commits, the owner's live
+event stream is told which tasks were created, updated or deleted (see
+``tasks.events``). Task saves and deletions also update the owner's
+task statistics (see ``tasks.stats``); bulk changes queue a recount.
+The tag lists of tasks whose links change, or whose tags are renamed or
+deleted, are refreshed right away (see ``tasks.tags``), and the tasks are
+stamped. Saving or deleting a user drops their cached API authentication
+(see ``tasks.authentication``) once the transaction commits.
 
+Bulk operations (see ``tasks.bulk``) write rows with ``bulk_create``,
+``bulk_update`` and queryset deletes inside ``bulk_changes()``, which makes
+the per-task receivers stand aside, and send ``tasks_bulk_changed`` once
+per batch instead.
+"""
 
-def delete_unused_tags():
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import Signal
+
+from .authentication import schedule_user_invalidation
+from .caching import bump_change_counters
+from .events import (
+    CREATED,
+    DELETED,
+    STATUS,
+    STATUS_FIELDS,
+    UPDATED,
+    schedule_events,
+)
+from .jobs import enqueue, register
+from .models import ChangeCounter, Task, Tag, Tombstone, User
+from .search import schedule_reindex
+from .stats import count_change, invalidate_stats, schedule_rebuild
+from .sync import record_deletions, stamp
+from .tags import refresh_tag_lists
+from .timing import receiver
+from .transactions import OnCommitBatch
+
+CLEANUP_QUEUED = 'queued'
+CLEANUP_IMMEDIATE = 'immediate'
+CLEANUP_DEFERRED = 'deferred'
+
+TAG_CLEANUP_JOB = 'tags.cleanup'
+
+# Sent with sender=Task, user_id, task_ids, detached_tag_ids, deleted,
+# created, and status when the batch only set the status.
+tasks_bulk_changed = Signal()
+
+_bulk_state = threading.local()
+
+
+@contextmanager
+def bulk_changes():
+    """
+    Silence the per-task receivers while a bulk operation runs.
+
+    The caller is expected to send ``tasks_bulk_changed`` for the batch.
+    """
+    previous = in_bulk_changes()
+    _bulk_state.active = True
+    try:
+        yield
+    finally:
+        _bulk_state.active = previous
+
+
+def in_bulk_changes():
+    """Return True inside a ``bulk_changes()`` block."""
+    return getattr(_bulk_state, 'active', False)
+
+
+def delete_unused_tags(tag_ids):
+    """
+    Delete the given tags if they are not associated with any tasks.
+
+    The deletions are counted and leave tombstones once per owner, instead
+    of per tag as the receivers below would.
+
+    Args:
+        tag_ids (Iterable[int]): Ids of the tags to check.
+
+    Returns:
+        int: Number of deleted tags.
+    """
+    tag_ids = list(tag_ids)
+    if not tag_ids:
+        return 0
+    with transaction.atomic(), bulk_changes():
+        # Locked so a task can't be linked to an orphan before it's deleted.
+        orphans = {}
+        for pk, user_id in (
+            Tag.objects.filter(pk__in=tag_ids, tasks__isnull=True)
+            .select_for_update(of=('self',))
+            .values_list('pk', 'user_id')
+        ):
+            orphans.setdefault(user_id, []).append(pk)
+        if not orphans:
+            return 0
+        bump_change_counters(orphans)
+        _, deleted = Tag.objects.filter(
+            pk__in=[pk for pks in orphans.values() for pk in pks],
+        ).delete()
+        for user_id, pks in orphans.items():
+            record_deletions(user_id, Tombstone.KIND_TAG, pks)
+    return deleted.get(Tag._meta.label, 0)
+
+
+def cleanup_mode():
+    """Return when orphaned tags are deleted, see ``TASKS_TAG_CLEANUP``."""
+    return getattr(settings, 'TASKS_TAG_CLEANUP', CLEANUP_QUEUED)
+
+
+def cleanup_is_deferred():
+    """Return True if orphaned tags are left to the cleanup_tags command."""
+    return cleanup_mode() == CLEANUP_DEFERRED
+
+
+tag_cleanup = OnCommitBatch(delete_unused_tags)
+register(TAG_CLEANUP_JOB, delete_unused_tags)
+
+
+def schedule_tag_cleanup(tag_ids):
     """
-    Delete tags that are not associated with any tasks.
+    Check the given tags for orphans once the current transaction commits,
+    in a job or right away depending on ``TASKS_TAG_CLEANUP``.
     """
-    unused_tags = Tag.objects.annotate(
-        task_count=Count('tasks'),
-    ).filter(task_count=0)
-    unused_tags.delete()
+    mode = cleanup_mode()
+    if mode == CLEANUP_QUEUED:
+        enqueue(TAG_CLEANUP_JOB, tag_ids)
+    elif mode == CLEANUP_IMMEDIATE:
+        tag_cleanup.add(tag_ids)
 
 
 @receiver(m2m_changed, sender=Task.tags.through)
-def tags_changed(sender, instance, action, **kwargs):
+def tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
     """
     Signal handler triggered when Task.tags ManyToMany field changes.
 
-    Deletes unused tags after tasks are updated.
+    Schedules cleanup of the tags removed from tasks. ``reverse`` is True
+    when the change is made through ``task.tags``, in which case
+    ``pk_set`` holds tag ids; otherwise ``instance`` is the tag itself.
     """
-    if action in ['post_remove', 'post_clear', 'post_add']:
-        delete_unused_tags()
+    if cleanup_is_deferred():
+        return
+    if action == 'post_remove':
+        schedule_tag_cleanup(pk_set if reverse else {instance.pk})
+    elif action == 'pre_clear':
+        if reverse:
+            schedule_tag_cleanup(
+                set(instance.tags.values_list('pk', flat=True))
+            )
+        else:
+            schedule_tag_cleanup({instance.pk})
 
 
-@receiver(post_delete, sender=Task)
+@receiver(pre_delete, sender=Task)
 def task_deleted(sender, instance, **kwargs):
     """
-    Signal handler triggered when a Task instance is deleted.
+    Signal handler triggered before a Task instance is deleted.
+
+    Collects the task's tags while its links still exist so they can be
+    checked after the deletion commits.
+    """
+    if cleanup_is_deferred() or in_bulk_changes():
+        return
+    schedule_tag_cleanup(set(instance.tags.values_list('pk', flat=True)))
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, **kwargs):
+    """Refresh the search entry of a saved task."""
+    schedule_reindex({instance.pk})
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def task_tags_reindex(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Refresh the search entries of tasks whose tags changed.
+
+    When the change is made through ``tag.tasks`` (``reverse`` is False),
+    the affected tasks are in ``pk_set``, or linked to the tag on clear.
+    """
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            schedule_reindex({instance.pk})
+    elif action in ('post_add', 'post_remove'):
+        schedule_reindex(pk_set)
+    elif action == 'pre_clear':
+        schedule_reindex(set(instance.tasks.values_list('pk', flat=True)))
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    """Refresh the search entries of a renamed tag's tasks."""
+    if not created:
+        schedule_reindex(set(instance.tasks.values_list('pk', flat=True)))
+
+
+@receiver(tasks_bulk_changed, sender=Task)
+def tasks_changed_in_bulk(sender, user_id, task_ids=(), detached_tag_ids=(),
+                          deleted=False, created=False, status=None,
+                          **kwargs):
+    """Schedule the work of the per-task receivers for a whole batch."""
+    if not deleted:
+        schedule_reindex(task_ids)
+    schedule_tag_cleanup(detached_tag_ids)
+    bump_change_counters({user_id})
+    invalidate_stats({user_id})
+    schedule_rebuild({user_id})
+    if deleted:
+        record_deletions(user_id, Tombstone.KIND_TASK, task_ids)
+        schedule_events(user_id, DELETED, task_ids)
+    else:
+        stamp(Task, task_ids, user_id)
+        if created:
+            schedule_events(user_id, CREATED, task_ids)
+        elif status:
+            schedule_events(user_id, STATUS, task_ids, status)
+        else:
+            schedule_events(user_id, UPDATED, task_ids)
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    """Give new users a change counter, so bumps are single updates."""
+    if created:
+        ChangeCounter.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Drop the cached authentication of a changed or deleted user."""
+    schedule_user_invalidation(instance)
+
+
+def deleted_with_owner(kwargs):
+    """Return True if the object is deleted because its owner is."""
+    origin = kwargs.get('origin')
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, User)
+    return isinstance(origin, User)
+
+
+@receiver(pre_save, sender=Task)
+@receiver(pre_save, sender=Tag)
+def task_list_changing(sender, instance, raw=False, **kwargs):
+    """
+    Count a change to the owner's tasks before a task or tag is written.
+
+    The row is stamped with the new counter value as it is written (see
+    ``ChangeSeqField``).
+    """
+    if not raw and not in_bulk_changes():
+        bump_change_counters({instance.user_id})
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Tag)
+def task_list_deleted(sender, instance, **kwargs):
+    """Count the deletion of a task or tag and leave a tombstone."""
+    if in_bulk_changes() or deleted_with_owner(kwargs):
+        return
+    bump_change_counters({instance.user_id})
+    kind = Tombstone.KIND_TASK if sender is Task else Tombstone.KIND_TAG
+    record_deletions(instance.user_id, kind, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def task_list_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Count a change to the owner's task lists when tags are linked, and
+    stamp the tasks whose tags changed.
+
+    When the change is made through ``tag.tasks``, the tasks are in
+    ``pk_set``, or read before the links are cleared.
+    """
+    if reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        task_ids = {instance.pk}
+    elif not reverse and action in ('post_add', 'post_remove'):
+        task_ids = pk_set
+    elif not reverse and action == 'pre_clear':
+        task_ids = set(instance.tasks.values_list('pk', flat=True))
+    else:
+        return
+    bump_change_counters({instance.user_id})
+    stamp(Task, task_ids, instance.user_id)
+
+
+@receiver(post_save, sender=Task)
+def task_event_saved(sender, instance, created, raw=False, update_fields=None,
+                     **kwargs):
+    """
+    Send the owner a created, updated or status event for a saved task.
+
+    Saves limited to ``STATUS_FIELDS`` are status changes, which the task
+    list applies without reloading the card.
+    """
+    if raw or in_bulk_changes():
+        return
+    if created:
+        schedule_events(instance.user_id, CREATED, [instance.pk])
+    elif update_fields is not None and update_fields <= STATUS_FIELDS:
+        schedule_events(
+            instance.user_id, STATUS, [instance.pk], instance.status,
+        )
+    else:
+        schedule_events(instance.user_id, UPDATED, [instance.pk])
+
+
+@receiver(post_delete, sender=Task)
+def task_event_deleted(sender, instance, **kwargs):
+    """Send the owner a deleted event for a deleted task."""
+    if in_bulk_changes() or deleted_with_owner(kwargs):
+        return
+    schedule_events(instance.user_id, DELETED, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def task_event_tags_changed(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    """Send the owner updated events for tasks whose tags changed."""
+    if reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        task_ids = {instance.pk}
+    elif not reverse and action in ('post_add', 'post_remove'):
+        task_ids = pk_set
+    elif not reverse and action == 'pre_clear':
+        task_ids = set(instance.tasks.values_list('pk', flat=True))
+    else:
+        return
+    schedule_events(instance.user_id, UPDATED, task_ids)
+
+
+@receiver(post_save, sender=Task)
+def task_stats_saved(sender, instance, created, raw=False, update_fields=None,
+                     **kwargs):
+    """
+    Count the difference a save makes to the owner's statistics.
+
+    The previous values are those the task was loaded with; when they
+    aren't known the statistics are recounted on their next read.
+    """
+    if raw or in_bulk_changes():
+        return
+    old_state = None if created else getattr(
+        instance, 'loaded_stats_state', None,
+    )
+    new_state = instance.stats_state()
+    if None not in (update_fields, old_state, new_state):
+        new_state = {
+            name: new_state[name] if name in update_fields else value
+            for name, value in old_state.items()
+        }
+    if new_state is None or (old_state is None and not created):
+        invalidate_stats({instance.user_id})
+    else:
+        count_change(instance.user_id, old_state, new_state)
+    instance.loaded_stats_state = new_state
+
+
+@receiver(post_delete, sender=Task)
+def task_stats_deleted(sender, instance, **kwargs):
+    """Take a deleted task out of the owner's statistics."""
+    if in_bulk_changes() or deleted_with_owner(kwargs):
+        return
+    old_state = getattr(instance, 'loaded_stats_state', None)
+    if old_state is None:
+        invalidate_stats({instance.user_id})
+    else:
+        count_change(instance.user_id, old_state, None)
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def task_tag_list_changed(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """
+    Refresh the tag lists of tasks whose tags were linked or unlinked.
+
+    Through ``task.tags`` the task itself gets its new list too. Tasks
+    unlinked by clearing ``tag.tasks`` are read before the clear.
+    """
+    if reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        instance.tag_list = refresh_tag_lists([instance.pk])[instance.pk]
+    elif not reverse and action in ('post_add', 'post_remove'):
+        refresh_tag_lists(pk_set)
+    elif not reverse and action == 'pre_clear':
+        instance.cleared_task_ids = list(
+            instance.tasks.values_list('pk', flat=True)
+        )
+    elif not reverse and action == 'post_clear':
+        refresh_tag_lists(getattr(instance, 'cleared_task_ids', ()))
+
+
+@receiver(post_save, sender=Tag)
+def tag_list_renamed(sender, instance, created, raw=False, **kwargs):
+    """
+    Refresh the tag lists of a saved tag's tasks, for its new name, and
+    stamp the tasks for delta sync.
+    """
+    if not created and not raw:
+        lists = refresh_tag_lists(instance.tasks.values_list('pk', flat=True))
+        stamp(Task, lists, instance.user_id)
+
 
-    Ensures unused tags are removed after task deletion.
+@receiver(pre_delete, sender=Tag)
+def tag_list_deleting(sender, instance, **kwargs):
+    """Read the tasks of a tag before its links are deleted with it."""
+    if in_bulk_changes() or deleted_with_owner(kwargs):
+        return
+    instance.deleted_task_ids = list(
+        instance.tasks.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+def tag_list_deleted(sender, instance, **kwargs):
+    """
+    Drop a deleted tag from the tag lists of its tasks, and stamp the
+    tasks for delta sync.
     """
-    delete_unused_tags()
+    lists = refresh_tag_lists(getattr(instance, 'deleted_task_ids', ()))
+    stamp(Task, lists, instance.user_id)
@@ -1,16 +1,17 @@
 document.addEventListener('DOMContentLoaded', () => {
-  const deleteButtons = document.querySelectorAll('.delete-task-btn');
   const confirmDeleteBtn = document.getElementById('confirmDeleteBtn');
   const deleteModal = new bootstrap.Modal(document.getElementById('deleteConfirmModal'));
   const langPrefixMatch = window.location.pathname.match(/^\/(en|ru|uk)(\/|$)/);
   const langPrefix = langPrefixMatch ? `/${langPrefixMatch[1]}` : '';
 
-  deleteButtons.forEach(button => {
-    button.addEventListener('click', () => {
-      const taskId = button.getAttribute('data-task-id');
-      confirmDeleteBtn.setAttribute('data-task-id', taskId);
-      deleteModal.show();
-    });
+  // Delegated so that tasks appended by infinite scroll work too.
+  document.addEventListener('click', (e) => {
+    const button = e.target.closest('.delete-task-btn');
+    if (!button) return;
+
+    const taskId = button.getAttribute('data-task-id');
+    confirmDeleteBtn.setAttribute('data-task-id', taskId);
+    deleteModal.show();
   });
 
   confirmDeleteBtn.addEventListener('click', () => {
@@ -0,0 +1,29 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const langCode = document.documentElement.lang;
+    const dueDateInput = document.getElementById('id_due_date');
+    const dueTimeWrapper = document.getElementById('due-time-wrapper');
+
+    if (dueDateInput.value) {
+        dueTimeWrapper.style.display = "block";
+    }
+
+    flatpickr(dueDateInput, {
+        dateFormat: "Y-m-d",
+        locale: (langCode === "uk") ? "uk" : (langCode === "ru") ? "ru" : "default",
+        onChange: function(selectedDates) {
+            if (selectedDates.length > 0) {
+                dueTimeWrapper.style.display = "block";
+            } else {
+                dueTimeWrapper.style.display = "none";
+            }
+        }
+    });
+
+    flatpickr("#id_due_time", {
+        enableTime: true,
+        noCalendar: true,
+        dateFormat: "H:i",
+        time_24hr: true,
+        locale: (langCode === "uk") ? "uk" : (langCode === "ru") ? "ru" : "default"
+    });
+});
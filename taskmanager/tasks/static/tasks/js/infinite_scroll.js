@@ -0,0 +1,50 @@
+document.addEventListener('DOMContentLoaded', function () {
+  const taskList = document.getElementById('task-list');
+  const loadMore = document.getElementById('task-list-more');
+  if (!taskList || !loadMore || !('IntersectionObserver' in window)) return;
+
+  let nextUrl = loadMore.getAttribute('data-next-url');
+  let loading = false;
+
+  const observer = new IntersectionObserver(entries => {
+    if (entries.some(entry => entry.isIntersecting)) {
+      loadNextPage();
+    }
+  }, { rootMargin: '400px' });
+
+  loadMore.querySelector('a').addEventListener('click', function (e) {
+    e.preventDefault();
+    loadNextPage();
+  });
+
+  observer.observe(loadMore);
+
+  function loadNextPage() {
+    if (loading || !nextUrl) return;
+    loading = true;
+
+    fetch(nextUrl, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+      .then(response => {
+        if (!response.ok) throw new Error(response.statusText);
+        nextUrl = response.headers.get('X-Next-Page');
+        return response.text();
+      })
+      .then(html => {
+        const page = document.createElement('template');
+        page.innerHTML = html;
+        // Tasks added by live updates may already be on the page.
+        page.content.querySelectorAll('[data-task-id][id]').forEach(item => {
+          if (document.getElementById(item.id)) item.remove();
+        });
+        taskList.append(page.content);
+        if (!nextUrl) {
+          observer.disconnect();
+          loadMore.remove();
+        }
+      })
+      .catch(error => console.error('Failed to load tasks:', error))
+      .finally(() => {
+        loading = false;
+      });
+  }
+});
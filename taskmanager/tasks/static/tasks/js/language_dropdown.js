@@ -0,0 +1,9 @@
+document.addEventListener('DOMContentLoaded', function () {
+  const dropdownToggle = document.getElementById('languageDropdown');
+
+  dropdownToggle.addEventListener('hidden.bs.dropdown', function () {
+    setTimeout(() => {
+      dropdownToggle.blur();
+    }, 0);
+  });
+});
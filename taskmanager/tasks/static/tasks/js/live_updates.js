@@ -0,0 +1,75 @@
+document.addEventListener('DOMContentLoaded', function () {
+  // Applies changes made in other tabs, devices or through the API, pushed
+  // by the server as Server-Sent Events.
+  const live = document.getElementById('live-updates');
+  if (!live || !('EventSource' in window)) return;
+
+  const itemUrl = live.getAttribute('data-item-url');
+  const params = new URLSearchParams(window.location.search);
+  const statusFilter = params.get('status');
+  let connected = false;
+
+  const source = new EventSource(live.getAttribute('data-events-url'));
+
+  source.addEventListener('open', function () {
+    // Changes made while reconnecting weren't received.
+    if (connected) window.location.reload();
+    connected = true;
+  });
+
+  source.addEventListener('created', e => showTask(JSON.parse(e.data).id, true));
+  source.addEventListener('updated', e => showTask(JSON.parse(e.data).id, false));
+
+  source.addEventListener('status', function (e) {
+    const data = JSON.parse(e.data);
+    const taskElement = document.getElementById(`task-${data.id}`);
+    if (!taskElement) return;
+    if (statusFilter && statusFilter !== data.status) {
+      taskElement.remove();
+      return;
+    }
+    const button = taskElement.querySelector(`.status-btns button[data-status="${data.status}"]`);
+    window.applyTaskStatus(data.id, data.status, button ? button.title : data.status);
+  });
+
+  source.addEventListener('deleted', function (e) {
+    const taskElement = document.getElementById(`task-${JSON.parse(e.data).id}`);
+    if (taskElement) taskElement.remove();
+  });
+
+  source.addEventListener('resync', () => window.location.reload());
+
+  // Any change can move the counts of the header widget.
+  for (const type of ['created', 'updated', 'status', 'deleted']) {
+    source.addEventListener(type, () => document.dispatchEvent(new Event('tasks:changed')));
+  }
+
+  function showTask(taskId, created) {
+    const query = new URLSearchParams(params);
+    query.delete('cursor');
+    query.set('id', taskId);
+
+    fetch(`${itemUrl}?${query}`)
+      .then(response => {
+        if (!response.ok) throw new Error(response.statusText);
+        return response.status === 204 ? '' : response.text();
+      })
+      .then(html => {
+        const taskList = document.getElementById('task-list');
+        const taskElement = document.getElementById(`task-${taskId}`);
+        if (!html) {
+          // Deleted meanwhile, or no longer matching the filters.
+          if (taskElement) taskElement.remove();
+        } else if (taskElement) {
+          taskElement.outerHTML = html;
+        } else if (created) {
+          if (!taskList) {
+            window.location.reload();
+            return;
+          }
+          taskList.insertAdjacentHTML('afterbegin', html);
+        }
+      })
+      .catch(error => console.error('Failed to load task:', error));
+  }
+});
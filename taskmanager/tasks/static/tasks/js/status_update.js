@@ -1,17 +1,44 @@
 document.addEventListener('DOMContentLoaded', function () {
-  const statusButtons = document.querySelectorAll('.status-btns button');
   const langPrefixMatch = window.location.pathname.match(/^\/(en|ru|uk)(\/|$)/);
   const langPrefix = langPrefixMatch ? `/${langPrefixMatch[1]}` : '';
 
-  statusButtons.forEach(button => {
-    button.addEventListener('click', function () {
-      const newStatus = this.getAttribute('data-status');
-      const taskId = this.parentElement.getAttribute('data-task-id');
+  // Delegated so that tasks appended by infinite scroll work too.
+  document.addEventListener('click', function (e) {
+    const button = e.target.closest('.status-btns button');
+    if (!button) return;
 
+    const newStatus = button.getAttribute('data-status');
+    const taskId = button.parentElement.getAttribute('data-task-id');
+    const statusUrl = button.parentElement.getAttribute('data-status-url');
+
+    if (statusUrl) {
+      updateOccurrenceStatus(statusUrl, newStatus);
+    } else {
       updateTaskStatus(taskId, newStatus);
-    });
+    }
   });
 
+  // Occurrences of recurring tasks: the list is reloaded, since the card
+  // of the series moves on to its next occurrence.
+  function updateOccurrenceStatus(statusUrl, newStatus) {
+    fetch(statusUrl, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'X-CSRFToken': getCookie('csrftoken'),
+      },
+      body: `status=${encodeURIComponent(newStatus)}`
+    })
+      .then(response => response.json())
+      .then(data => {
+        if (data.success) {
+          window.location.reload();
+        } else {
+          alert('Помилка зміни статусу: ' + data.error);
+        }
+      });
+  }
+
   function updateTaskStatus(taskId, newStatus) {
     fetch(`${langPrefix}/${taskId}/update-status/`, {
       method: 'POST',
@@ -24,19 +51,27 @@ document.addEventListener('DOMContentLoaded', function () {
       .then(response => response.json())
       .then(data => {
         if (data.success) {
-          const taskElement = document.getElementById(`task-${taskId}`);
-          const dueDateStr = taskElement.getAttribute('data-due-date');
-
-          updateStatusText(taskId, data.new_status_display);
-          updateStatusButtons(taskId, newStatus);
-          updateDueDateColor(taskElement, dueDateStr, newStatus);
-          reorderTask(taskElement, newStatus, dueDateStr);
+          applyTaskStatus(taskId, newStatus, data.new_status_display);
         } else {
           alert('Помилка зміни статусу: ' + data.error);
         }
       });
   }
 
+  function applyTaskStatus(taskId, newStatus, statusText) {
+    const taskElement = document.getElementById(`task-${taskId}`);
+    if (!taskElement) return;
+    const dueDateStr = taskElement.getAttribute('data-due-date');
+
+    updateStatusText(taskId, statusText);
+    updateStatusButtons(taskId, newStatus);
+    updateDueDateColor(taskElement, dueDateStr, newStatus);
+    reorderTask(taskElement, newStatus, dueDateStr);
+  }
+
+  // Also applies status changes pushed by live_updates.js.
+  window.applyTaskStatus = applyTaskStatus;
+
   function updateStatusText(taskId, statusText) {
     const statusDisplay = document.querySelector(`#task-${taskId} .status-display`);
     if (statusDisplay) {
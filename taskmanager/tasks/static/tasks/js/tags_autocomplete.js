@@ -1,21 +1,12 @@
 document.addEventListener('DOMContentLoaded', () => {
   const input = document.getElementById('tags-input');
   const suggestionsBox = document.getElementById('tag-suggestions');
+  const url = suggestionsBox.dataset.url;
+  const debounceMs = 150;
+  let timer = null;
+  let controller = null;
 
-  input.addEventListener('input', async () => {
-    console.log('🔍 Input changed:', input.value);
-    const currentText = input.value;
-    const parts = currentText.split(',');
-    const lastTerm = parts[parts.length - 1].trim();
-
-    if (lastTerm.length < 1) {
-      suggestionsBox.innerHTML = '';
-      return;
-    }
-
-    const response = await fetch(`/tags/autocomplete/?term=${encodeURIComponent(lastTerm)}`);
-    const suggestions = await response.json();
-
+  const showSuggestions = (parts, suggestions) => {
     suggestionsBox.innerHTML = '';
     suggestions.forEach(tag => {
       const item = document.createElement('button');
@@ -30,6 +21,37 @@ document.addEventListener('DOMContentLoaded', () => {
       };
       suggestionsBox.appendChild(item);
     });
+  };
+
+  const fetchSuggestions = async () => {
+    const parts = input.value.split(',');
+    const lastTerm = parts[parts.length - 1].trim();
+
+    if (controller) {
+      controller.abort();
+    }
+    if (lastTerm.length < 1) {
+      suggestionsBox.innerHTML = '';
+      return;
+    }
+
+    controller = new AbortController();
+    try {
+      const response = await fetch(
+        `${url}?term=${encodeURIComponent(lastTerm)}`,
+        { signal: controller.signal }
+      );
+      showSuggestions(parts, await response.json());
+    } catch (error) {
+      if (error.name !== 'AbortError') {
+        throw error;
+      }
+    }
+  };
+
+  input.addEventListener('input', () => {
+    clearTimeout(timer);
+    timer = setTimeout(fetchSuggestions, debounceMs);
   });
 
   document.addEventListener('click', (e) => {
@@ -0,0 +1,32 @@
+document.addEventListener('DOMContentLoaded', function () {
+  // Fills the task counts of the header, and refreshes them when the live
+  // updates report a change.
+  const widget = document.getElementById('task-stats');
+  if (!widget) return;
+
+  const url = widget.getAttribute('data-stats-url');
+  let pending = null;
+
+  function refresh() {
+    fetch(url, {headers: {'Accept': 'application/json'}})
+      .then(response => {
+        if (!response.ok) throw new Error(response.statusText);
+        return response.json();
+      })
+      .then(stats => {
+        widget.querySelectorAll('[data-stat]').forEach(element => {
+          element.textContent = stats[element.getAttribute('data-stat')];
+        });
+        widget.classList.replace('d-none', 'd-inline-flex');
+      })
+      .catch(error => console.error('Failed to load task stats:', error));
+  }
+
+  document.addEventListener('tasks:changed', function () {
+    // A batch of changes arrives as a burst of events.
+    clearTimeout(pending);
+    pending = setTimeout(refresh, 300);
+  });
+
+  refresh();
+});
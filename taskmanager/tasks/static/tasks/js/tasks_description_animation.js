@@ -1,12 +1,27 @@
 document.addEventListener('DOMContentLoaded', function () {
-    document.querySelectorAll('.list-group-item').forEach(item => {
-      item.addEventListener('click', function (e) {
-        if (e.target.closest('button') || e.target.closest('a')) return;
+    // Descriptions aren't part of the list page; each one is fetched the
+    // first time its card is expanded.
+    async function loadDescription(desc) {
+      if (desc.dataset.loaded) return;
+      const response = await fetch(desc.dataset.url);
+      if (!response.ok) return;
+      const data = await response.json();
+      desc.querySelector('.task-description-text').textContent = data.description;
+      desc.dataset.loaded = 'true';
+    }
 
-        const desc = this.querySelector('.task-description');
-        if (desc) {
-          desc.classList.toggle('expanded');
+    // Delegated so that tasks appended by infinite scroll work too.
+    document.addEventListener('click', async function (e) {
+      const item = e.target.closest('.list-group-item[data-task-id]');
+      if (!item) return;
+      if (e.target.closest('button') || e.target.closest('a')) return;
+
+      const desc = item.querySelector('.task-description');
+      if (desc) {
+        if (!desc.classList.contains('expanded')) {
+          await loadDescription(desc);
         }
-      });
+        desc.classList.toggle('expanded');
+      }
     });
 });
@@ -0,0 +1,258 @@
+"""
+Counts of a user's tasks by status and due date, read in O(1).
+
+Every user has a ``TaskStats`` row of counters. Task saves and deletions
+change them by the difference they make, with one UPDATE in the same
+transaction (see ``tasks.signals``). Bulk operations, whose receivers
+don't see the previous values, mark the user's row stale instead and
+queue a job recounting it (see ``tasks.jobs``); a read before the worker
+gets to it recounts the row itself.
+
+A recount locks the rows before counting the tasks and keeps them locked
+until it commits. The UPDATE of a task change committing meanwhile waits
+for the lock, then applies to the recounted row, so the change is counted
+whether the recount saw it or not. Rows are marked stale rather than
+deleted, so that there is a row to lock.
+
+Counts by due date and completion date are relative to the day of the
+row (``as_of``): a task due today is overdue tomorrow without being
+saved. A row from an earlier day is therefore rebuilt from the tasks, with
+one aggregate query, the first time it is read on a new day, and changes
+made meanwhile leave it alone. Reads otherwise cost one primary key
+lookup however many tasks the user has.
+
+``manage.py rebuild_task_stats`` recounts every row and reports those
+that drifted, e.g. after tasks were changed with ``QuerySet.update()``.
+"""
+
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, When
+from django.utils import timezone
+
+from .jobs import enqueue, register
+from .models import Task, TaskStats, User
+
+STATS_REBUILD_JOB = 'stats.rebuild'
+
+# ``as_of`` of rows waiting for a recount.
+STALE = date.min
+
+COUNTERS = (
+    'pending', 'in_progress', 'completed', 'overdue', 'due_today',
+    'completed_this_week',
+)
+
+STATUS_COUNTERS = {
+    Task.STATUS_PENDING: 'pending',
+    Task.STATUS_IN_PROGRESS: 'in_progress',
+    Task.STATUS_COMPLETED: 'completed',
+}
+
+
+def week_start(today):
+    """Return the Monday of the week of ``today``."""
+    return today - timedelta(days=today.weekday())
+
+
+def counted(state, today):
+    """
+    Return the counters a task adds to, relative to ``today``.
+
+    Args:
+        state (dict): The task's ``Task.STATS_FIELDS``, or None for a task
+            that doesn't exist.
+        today (date): Day of the counts.
+    """
+    if state is None:
+        return []
+    counters = [STATUS_COUNTERS[state['status']]]
+    due_date = state['due_date']
+    if state['status'] != Task.STATUS_COMPLETED:
+        if due_date is not None and due_date < today:
+            counters.append('overdue')
+        elif due_date == today:
+            counters.append('due_today')
+    elif state['completed_at'] is not None and (
+        timezone.localtime(state['completed_at']).date() >= week_start(today)
+    ):
+        counters.append('completed_this_week')
+    return counters
+
+
+def count_tasks(user_ids, today):
+    """
+    Count the tasks of the given users with one aggregate query.
+
+    Returns:
+        dict: Counters of each user with tasks, by user id.
+    """
+    open_tasks = ~Q(status=Task.STATUS_COMPLETED)
+    since = timezone.make_aware(datetime.combine(week_start(today), time.min))
+    rows = (
+        Task.objects.filter(user_id__in=user_ids)
+        .values('user_id')
+        .order_by()
+        .annotate(
+            pending=Count('pk', filter=Q(status=Task.STATUS_PENDING)),
+            in_progress=Count('pk', filter=Q(status=Task.STATUS_IN_PROGRESS)),
+            completed=Count('pk', filter=Q(status=Task.STATUS_COMPLETED)),
+            overdue=Count('pk', filter=open_tasks & Q(due_date__lt=today)),
+            due_today=Count('pk', filter=open_tasks & Q(due_date=today)),
+            completed_this_week=Count('pk', filter=Q(
+                status=Task.STATUS_COMPLETED, completed_at__gte=since,
+            )),
+        )
+    )
+    return {row.pop('user_id'): row for row in rows}
+
+
+def rebuild_stats(user_ids, today=None, save=True):
+    """
+    Recount the statistics of the given users.
+
+    Args:
+        user_ids (Iterable[int]): Users to recount.
+        today (date, optional): Day of the counts; defaults to today.
+        save (bool): Whether to save the recounted rows.
+
+    Returns:
+        list: The recounted ``TaskStats``. Their ``drift`` maps the
+        counters the saved row of the same day got wrong to
+        ``(saved, actual)`` values.
+    """
+    user_ids = list(user_ids)
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        if save:
+            saved = lock_stats(user_ids)
+        else:
+            saved = TaskStats.objects.in_bulk(user_ids)
+        counts = count_tasks(user_ids, today)
+        rebuilt = []
+        for user_id in user_ids:
+            stats = TaskStats(
+                user_id=user_id,
+                as_of=today,
+                **counts.get(user_id, dict.fromkeys(COUNTERS, 0)),
+            )
+            stats.drift = {}
+            previous = saved.get(user_id)
+            if previous is not None and previous.as_of == today:
+                stats.drift = {
+                    name: (getattr(previous, name), getattr(stats, name))
+                    for name in COUNTERS
+                    if getattr(previous, name) != getattr(stats, name)
+                }
+            rebuilt.append(stats)
+        if save:
+            TaskStats.objects.bulk_create(
+                rebuilt,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['as_of', *COUNTERS],
+            )
+    return rebuilt
+
+
+def lock_stats(user_ids):
+    """
+    Lock the statistics rows of the given users, creating missing ones.
+
+    Returns:
+        dict: The existing rows, by user id.
+    """
+    saved = {
+        stats.user_id: stats
+        for stats in TaskStats.objects.select_for_update().filter(
+            user_id__in=user_ids,
+        )
+    }
+    TaskStats.objects.bulk_create(
+        [
+            TaskStats(user_id=user_id, as_of=STALE)
+            for user_id in user_ids if user_id not in saved
+        ],
+        ignore_conflicts=True,
+    )
+    return saved
+
+
+def get_stats(user):
+    """Return the user's statistics for today, rebuilding them if stale."""
+    today = timezone.localdate()
+    stats = TaskStats.objects.filter(user=user, as_of=today).first()
+    if stats is None:
+        stats = rebuild_stats([user.pk], today)[0]
+    return stats
+
+
+async def aget_stats(user):
+    """Async version of ``get_stats``."""
+    today = timezone.localdate()
+    stats = await TaskStats.objects.filter(user=user, as_of=today).afirst()
+    if stats is None:
+        stats = (await sync_to_async(rebuild_stats)([user.pk], today))[0]
+    return stats
+
+
+def stats_dict(stats):
+    """Return the counters of a ``TaskStats`` as a dict."""
+    return {name: getattr(stats, name) for name in COUNTERS}
+
+
+def stats_data(stats):
+    """Return the JSON data of the stats endpoints."""
+    return {'as_of': stats.as_of.isoformat(), **stats_dict(stats)}
+
+
+def count_change(user_id, old_state, new_state):
+    """
+    Apply the difference a task change makes to its owner's counters.
+
+    Rows of an earlier day, or missing ones, are left to be rebuilt when
+    read.
+
+    Args:
+        user_id (int): Owner of the task.
+        old_state (dict): ``Task.stats_state()`` before the change, None
+            for a new task.
+        new_state (dict): ``Task.stats_state()`` after it, None for a
+            deleted task.
+    """
+    today = timezone.localdate()
+    delta = Counter(counted(new_state, today))
+    delta.subtract(counted(old_state, today))
+    changes = {
+        name: Case(When(as_of=today, then=F(name) + value), default=F(name))
+        for name, value in delta.items() if value
+    }
+    if changes:
+        # Matched by user only, so that the update waits for a recount
+        # holding the row and checks the day of the recounted row.
+        TaskStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def invalidate_stats(user_ids):
+    """Have the statistics of the given users recounted when next read."""
+    user_ids = set(user_ids)
+    if user_ids:
+        TaskStats.objects.filter(user_id__in=user_ids).update(as_of=STALE)
+
+
+def rebuild_user_stats(user_ids):
+    """Recount the statistics of the given users that still exist."""
+    rebuild_stats(
+        User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+    )
+
+
+register(STATS_REBUILD_JOB, rebuild_user_stats)
+
+
+def schedule_rebuild(user_ids):
+    """Queue a recount of the statistics of the given users."""
+    enqueue(STATS_REBUILD_JOB, user_ids)
@@ -0,0 +1,32 @@
+"""
+Storage of the static files collected by ``collectstatic``.
+
+Files are stored under names holding a hash of their content, with gzip
+and, when the ``brotli`` package is installed, Brotli versions next to
+them. WhiteNoise serves the compressed version the browser accepts and
+marks hashed names as immutable, so browsers cache them for good and a
+changed file gets a new URL.
+"""
+
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Fingerprinted, precompressed static files.
+
+    Files missing from the manifest keep their plain name instead of
+    failing the render, which lets templates render before
+    ``collectstatic`` has run, e.g. in tests.
+    """
+
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        """Return the hashed name, or ``name`` if it wasn't collected."""
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if content is not None:
+                raise
+            return name
@@ -0,0 +1,188 @@
+"""
+Delta sync of a user's tasks and tags.
+
+Clients send back the sync token of their last sync and receive only the
+tasks and tags written since then, plus the ids of those deleted since
+then, instead of refetching the whole list.
+
+Changes are sequenced by the user's ``ChangeCounter``. Every change bumps
+the counter, then stamps the rows it writes with the new value in
+``change_seq``, in the same transaction (see ``tasks.signals``), and
+deletions leave a ``Tombstone`` with that value. Since the counter row is
+locked from the bump until the commit, the changes of one user commit in
+counter order, and everything at or below a value read from the counter
+is committed. A token holds that value, so a sync returns the rows and
+tombstones above it.
+
+Tombstones are pruned once older than ``TASKS_SYNC_TOMBSTONE_RETENTION``
+seconds, by ``manage.py prune_tombstones`` or by a sync request at most
+every ``TASKS_SYNC_PRUNE_INTERVAL`` seconds. Tokens expire after the same
+retention, so an expired, tampered or missing token gets a full resync.
+"""
+
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+
+from .caching import get_change_counter
+from .models import Tag, Task, Tombstone, current_change_seq
+
+DEFAULT_RETENTION = 60 * 60 * 24 * 30
+DEFAULT_PRUNE_INTERVAL = 60 * 60
+TOKEN_SALT = 'tasks.sync'
+PRUNE_LOCK_KEY = 'tasks:sync:pruned'
+
+
+def get_retention():
+    """Return for how many seconds tombstones and tokens are kept."""
+    return getattr(settings, 'TASKS_SYNC_TOMBSTONE_RETENTION', DEFAULT_RETENTION)
+
+
+def stamp(model, pks, user_id):
+    """
+    Mark rows as changed by the current value of their owner's counter.
+
+    Args:
+        model: ``Task`` or ``Tag``.
+        pks (Iterable[int]): Rows to stamp, all owned by ``user_id``.
+        user_id (int): Owner of the rows.
+    """
+    pks = list(pks)
+    if pks:
+        model.objects.filter(pk__in=pks).update(
+            change_seq=current_change_seq(user_id),
+        )
+
+
+def record_deletions(user_id, kind, object_ids):
+    """
+    Leave tombstones for deleted objects of one user.
+
+    Args:
+        user_id (int): Owner of the objects.
+        kind (str): ``Tombstone.KIND_TASK`` or ``Tombstone.KIND_TAG``.
+        object_ids (Iterable[int]): Primary keys of the deleted objects.
+    """
+    seq = current_change_seq(user_id)
+    Tombstone.objects.bulk_create(
+        Tombstone(user_id=user_id, kind=kind, object_id=pk, change_seq=seq)
+        for pk in object_ids
+    )
+
+
+def make_token(user, seq):
+    """Return a signed sync token for the user at counter value ``seq``."""
+    return signing.dumps({'user': user.pk, 'seq': seq}, salt=TOKEN_SALT)
+
+
+def read_token(user, token):
+    """
+    Return the counter value of a sync token.
+
+    Returns:
+        int: The value, or None if the token is missing, invalid, expired
+        or issued to another user.
+    """
+    if not token:
+        return None
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=get_retention())
+    except signing.BadSignature:
+        return None
+    if data.get('user') != user.pk or not isinstance(data.get('seq'), int):
+        return None
+    return data['seq']
+
+
+@dataclass
+class SyncResult:
+    """
+    Changes of a user's tasks and tags since a sync token.
+
+    Attributes:
+        token (str): Token to send with the next sync.
+        full (bool): True if ``tasks`` and ``tags`` are everything the
+            user has, to replace the client's copy.
+        tasks (QuerySet): Tasks written since the token.
+        tags (QuerySet): Tags written since the token.
+        deleted_tasks (list): Ids of tasks deleted since the token.
+        deleted_tags (list): Ids of tags deleted since the token.
+    """
+
+    token: str
+    full: bool
+    tasks: object
+    tags: object
+    deleted_tasks: list = field(default_factory=list)
+    deleted_tags: list = field(default_factory=list)
+
+
+def changes_since(user, token=None):
+    """
+    Return the user's changes since ``token``, or everything.
+
+    The counter is read first: rows written by transactions committing
+    meanwhile may be returned twice, but none is missed.
+
+    Args:
+        user: Owner of the tasks and tags.
+        token (str, optional): Token of the client's last sync.
+
+    Returns:
+        SyncResult: The changes and the next token.
+    """
+    since = read_token(user, token)
+    seq = get_change_counter(user).value
+    tasks = Task.objects.for_user(user).order_by('id')
+    tags = Tag.objects.filter(user=user).order_by('id')
+    result = SyncResult(
+        token=make_token(user, seq),
+        full=since is None,
+        tasks=tasks,
+        tags=tags,
+    )
+    if since is None:
+        return result
+
+    result.tasks = tasks.filter(change_seq__gt=since)
+    result.tags = tags.filter(change_seq__gt=since)
+    tombstones = Tombstone.objects.filter(
+        user=user, change_seq__gt=since,
+    ).values_list('kind', 'object_id')
+    for kind, object_id in tombstones:
+        if kind == Tombstone.KIND_TASK:
+            result.deleted_tasks.append(object_id)
+        else:
+            result.deleted_tags.append(object_id)
+    return result
+
+
+def prune_tombstones(retention=None):
+    """
+    Delete tombstones older than the retention.
+
+    Args:
+        retention (int, optional): Age in seconds; defaults to
+            ``TASKS_SYNC_TOMBSTONE_RETENTION``.
+
+    Returns:
+        int: Number of deleted tombstones.
+    """
+    if retention is None:
+        retention = get_retention()
+    cutoff = timezone.now() - timedelta(seconds=retention)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+def prune_if_due():
+    """Prune tombstones if no process did in the last prune interval."""
+    interval = getattr(
+        settings, 'TASKS_SYNC_PRUNE_INTERVAL', DEFAULT_PRUNE_INTERVAL
+    )
+    if interval and cache.add(PRUNE_LOCK_KEY, True, interval):
+        prune_tombstones()
@@ -0,0 +1,152 @@
+"""
+Tag resolution shared by the forms, views and serializers.
+
+Turning a list of tag names into Tag objects takes at most four queries,
+however many names there are: one select for the existing tags, one bulk
+insert of the missing ones, one select to read back the inserted rows and
+one update of the owner's change counter.
+
+Tasks keep the ids and names of their tags in ``Task.tag_list``, so the
+task list, the API and the search index read them without joining the
+tags. ``refresh_tag_lists`` copies them from the links; it runs whenever
+links are added or removed and tags are renamed or deleted (see
+``tasks.signals``), and bulk writes set the lists themselves.
+``manage.py check_tag_lists`` finds and fixes lists that drifted.
+"""
+
+from .caching import bump_change_counters
+from .models import Tag, Task, current_change_seq
+
+
+def normalize_tag_names(names):
+    """
+    Strip tag names and drop empty and repeated ones, keeping their order.
+
+    Args:
+        names (Iterable[str]): Raw tag names.
+
+    Returns:
+        list: Cleaned, unique tag names.
+    """
+    unique = {}
+    for name in names:
+        name = name.strip()
+        if name:
+            unique.setdefault(name, None)
+    return list(unique)
+
+
+def parse_tag_names(tags_str):
+    """Split a comma-separated tags string into cleaned tag names."""
+    return normalize_tag_names(tags_str.split(','))
+
+
+def resolve_tags(user, names):
+    """
+    Return the user's tags with the given names, creating missing ones.
+
+    Missing tags are inserted with ``ignore_conflicts`` so a concurrent
+    request creating the same tag doesn't fail on the (user, name) unique
+    constraint; the inserted rows are then read back by name.
+
+    Args:
+        user: Owner of the tags.
+        names (Iterable[str]): Tag names, cleaned by
+            ``normalize_tag_names``.
+
+    Returns:
+        list: Tag objects in the order of ``names``.
+    """
+    names = normalize_tag_names(names)
+    if not names:
+        return []
+
+    tags = {
+        tag.name: tag
+        for tag in Tag.objects.filter(user=user, name__in=names)
+    }
+    missing = [name for name in names if name not in tags]
+    if missing:
+        # New tags are a change for delta sync; bulk_create sends no
+        # signals, so count it here. The rows are stamped with the new
+        # counter value as they are inserted, which inside bulk_changes()
+        # ChangeSeqField leaves to the caller.
+        bump_change_counters({user.pk})
+        seq = current_change_seq(user.pk)
+        Tag.objects.bulk_create(
+            [Tag(user=user, name=name, change_seq=seq) for name in missing],
+            ignore_conflicts=True,
+        )
+        tags.update(
+            (tag.name, tag)
+            for tag in Tag.objects.filter(user=user, name__in=missing)
+        )
+
+    return [tags[name] for name in names]
+
+
+def make_tag_list(tags):
+    """
+    Return the ``Task.tag_list`` of tags given as ``(id, name)`` pairs.
+
+    Returns:
+        list: ``[id, name]`` of each tag, ordered by name.
+    """
+    return sorted(
+        ([pk, name] for pk, name in tags),
+        key=lambda tag: (tag[1], tag[0]),
+    )
+
+
+def linked_tag_lists(task_ids):
+    """
+    Return the tag lists of the given tasks read from their links.
+
+    Returns:
+        dict: ``Task.tag_list`` of every given task, by task id.
+    """
+    task_ids = list(task_ids)
+    tags = {task_id: [] for task_id in task_ids}
+    if task_ids:
+        for task_id, tag_id, name in Task.tags.through.objects.filter(
+            task_id__in=task_ids,
+        ).values_list('task_id', 'tag_id', 'tag__name'):
+            tags[task_id].append((tag_id, name))
+    return {task_id: make_tag_list(pairs) for task_id, pairs in tags.items()}
+
+
+def refresh_tag_lists(task_ids):
+    """
+    Copy the tags linked to the given tasks to their ``tag_list``.
+
+    Takes one query to read the links and one to write the lists.
+
+    Returns:
+        dict: The new tag list of every given task, by task id.
+    """
+    lists = linked_tag_lists(task_ids)
+    if lists:
+        Task.objects.bulk_update(
+            [Task(pk=task_id, tag_list=tags) for task_id, tags in lists.items()],
+            ['tag_list'],
+        )
+    return lists
+
+
+def stale_tag_lists(task_ids):
+    """
+    Return the tag lists of the given tasks that differ from their links.
+
+    Returns:
+        dict: The linked tag list of every task whose ``tag_list`` is
+        wrong, by task id.
+    """
+    task_ids = list(task_ids)
+    linked = linked_tag_lists(task_ids)
+    return {
+        task_id: linked[task_id]
+        for task_id, tag_list in Task.objects.filter(
+            pk__in=task_ids,
+        ).values_list('pk', 'tag_list')
+        if tag_list != linked[task_id]
+    }
@@ -1,10 +1,48 @@
-from django.test import TestCase, Client
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
-from tasks.models import Task, Tag
+from tasks.autocomplete import TagIndex, get_tag_index
+from tasks.bulk import bulk_delete_tasks, bulk_set_status
+from tasks.events import Subscription, change_events, get_broker
+from tasks.imports import FORMAT_NDJSON, import_tasks
+from tasks.jobs import (
+    Worker, claim_jobs, enqueue, register, release_expired_jobs,
+)
+from tasks.models import Job, Task, TaskReminder, TaskStats, Tag, Tombstone
 from tasks.forms import TaskForm
+from tasks.recurrence import (
+    expand, materialize, occurrence_task, parse_rule, window_tasks,
+)
+from tasks.reminders import ConsoleBackend, ReminderScheduler, due_between
+from tasks.signals import TAG_CLEANUP_JOB, tag_cleanup
+from tasks.stats import get_stats, rebuild_stats, stats_dict
+from tasks.tags import parse_tag_names, resolve_tags
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.urls import reverse
+from django.utils import timezone
 
 
 # ------------------------------
@@ -112,3 +150,2210 @@ class TaskAPITest(TestCase):
         response = self.client.delete(f'{self.lang_prefix}/api/{self.task.id}/')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Task.objects.filter(id=self.task.id).exists())
+
+
+# ------------------------------
+# Static files tests
+# ------------------------------
+class StaticFilesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='static', password='pass')
+        self.client.force_login(self.user)
+
+    def test_pages_have_no_inline_scripts_or_styles(self):
+        for url in ['/en/', '/en/create/']:
+            response = self.client.get(url)
+            self.assertNotContains(response, '<script>')
+            self.assertNotContains(response, '<style>')
+            self.assertContains(response, 'tasks/js/language_dropdown.js')
+
+    def test_collected_files_are_served_before_sessions(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = staticfiles_storage.url('tasks/css/style.css')
+            self.assertRegex(url, r'^/static/tasks/css/style\.[0-9a-f]{12}\.css$')
+            with mock.patch.object(SessionMiddleware, 'process_request') as sessions:
+                response = Client().get(url, HTTP_ACCEPT_ENCODING='gzip')
+            sessions.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+# ------------------------------
+# Tag cleanup tests
+# ------------------------------
+@override_settings(TASKS_TAG_CLEANUP='immediate')
+class TagCleanupTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.task = Task.objects.create(title='Task', user=self.user)
+        self.keep = Tag.objects.create(name='keep', user=self.user)
+        self.drop = Tag.objects.create(name='drop', user=self.user)
+        self.task.tags.add(self.keep, self.drop)
+        # Orphans that no event in these tests touches.
+        self.stale = Tag.objects.create(name='stale', user=self.user)
+        self.foreign = Tag.objects.create(name='foreign', user=self.other)
+
+    def test_removed_tag_is_deleted_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.tags.set([self.keep])
+            self.assertTrue(Tag.objects.filter(pk=self.drop.pk).exists())
+        self.assertFalse(Tag.objects.filter(pk=self.drop.pk).exists())
+        self.assertTrue(Tag.objects.filter(pk=self.keep.pk).exists())
+
+    def test_cleanup_only_checks_detached_tags(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.tags.clear()
+        self.assertEqual(
+            set(Tag.objects.values_list('name', flat=True)),
+            {'stale', 'foreign'},
+        )
+
+    def test_tag_shared_with_other_task_is_kept(self):
+        other_task = Task.objects.create(title='Other', user=self.user)
+        other_task.tags.add(self.drop)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.delete()
+        self.assertTrue(Tag.objects.filter(pk=self.drop.pk).exists())
+        self.assertFalse(Tag.objects.filter(pk=self.keep.pk).exists())
+
+    def test_cleanup_runs_once_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.task.tags.remove(self.keep)
+            self.task.tags.remove(self.drop)
+        with CaptureQueriesContext(connection) as context:
+            for callback in callbacks:
+                callback()
+        deletes = [
+            q for q in context.captured_queries
+            if q['sql'].startswith('DELETE FROM "tasks_tag"')
+        ]
+        self.assertEqual(len(deletes), 1)
+        self.assertFalse(Tag.objects.filter(pk=self.keep.pk).exists())
+
+    @override_settings(TASKS_TAG_CLEANUP='deferred')
+    def test_deferred_mode_leaves_cleanup_to_command(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.task.delete()
+        self.assertNotIn(tag_cleanup.flush, callbacks)
+        self.assertEqual(Tag.objects.count(), 4)
+
+        call_command('cleanup_tags', batch_size=1, stdout=StringIO())
+        self.assertEqual(Tag.objects.count(), 0)
+
+    @override_settings(TASKS_TAG_CLEANUP='queued')
+    def test_queued_mode_leaves_cleanup_to_worker(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.task.tags.remove(self.keep)
+            self.task.delete()
+        self.assertNotIn(tag_cleanup.flush, callbacks)
+        self.assertEqual(
+            set(Job.objects.values_list('name', 'object_id')),
+            {(TAG_CLEANUP_JOB, self.keep.pk), (TAG_CLEANUP_JOB, self.drop.pk)},
+        )
+        self.assertEqual(Tag.objects.count(), 4)
+
+        Worker().drain()
+        self.assertEqual(
+            set(Tag.objects.values_list('name', flat=True)),
+            {'stale', 'foreign'},
+        )
+        self.assertFalse(Job.objects.exists())
+
+
+# ------------------------------
+# Pagination tests
+# ------------------------------
+@override_settings(TASKS_PAGE_SIZE=4)
+class TaskPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', password='pass')
+        self.client = Client()
+        self.client.login(username='pager', password='pass')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.lang_prefix = '/en'
+
+        today = timezone.localdate()
+        due_dates = [today, today, None, today + timedelta(days=1), None]
+        statuses = ['pending', 'completed']
+        for i in range(10):
+            Task.objects.create(
+                title=f'Task {i}',
+                user=self.user,
+                due_date=due_dates[i % len(due_dates)],
+                status=statuses[i % 3 == 0],
+            )
+        self.expected = [
+            task.id for task in Task.objects.filter(user=self.user).ordered()
+        ]
+
+    def walk_api(self):
+        ids, url = [], f'{self.lang_prefix}/api/'
+        while url:
+            response = self.api_client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [task['id'] for task in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_api_pages_cover_listing_in_order(self):
+        self.assertEqual(self.walk_api(), self.expected)
+
+    def test_undated_tasks_come_after_dated_ones(self):
+        dates = list(
+            Task.objects.filter(user=self.user, status='pending')
+            .ordered().values_list('due_date', flat=True)
+        )
+        first_undated = dates.index(None)
+        self.assertTrue(all(d is None for d in dates[first_undated:]))
+
+    def test_cursor_is_stable_under_inserts(self):
+        response = self.api_client.get(f'{self.lang_prefix}/api/')
+        first_page = [task['id'] for task in response.data['results']]
+        Task.objects.create(title='New', user=self.user)
+
+        rest = []
+        url = response.data['next']
+        while url:
+            response = self.api_client.get(url)
+            rest += [task['id'] for task in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(first_page + rest, self.expected)
+
+    def test_html_pages_and_partial_response(self):
+        response = self.client.get(f'{self.lang_prefix}/')
+        self.assertEqual(len(response.context['tasks']), 4)
+        next_url = response.context['next_url']
+        self.assertContains(response, 'id="task-list-more"')
+
+        seen = [task.id for task in response.context['tasks']]
+        while next_url:
+            response = self.client.get(
+                next_url, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+            self.assertTemplateNotUsed(response, 'tasks/tasks.html')
+            seen += [task.id for task in response.context['tasks']]
+            next_url = response.get('X-Next-Page')
+        self.assertEqual(seen, self.expected)
+
+    def test_invalid_cursor(self):
+        response = self.api_client.get(f'{self.lang_prefix}/api/', {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f'{self.lang_prefix}/', {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
+
+
+# ------------------------------
+# Task row tests
+# ------------------------------
+class TaskRowTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rows', password='pass')
+        self.client = Client()
+        self.client.login(username='rows', password='pass')
+        self.lang_prefix = '/en'
+        self.today = timezone.localdate()
+
+    def test_urgency_buckets(self):
+        cases = {
+            'overdue': ('pending', self.today - timedelta(days=1)),
+            'today': ('pending', self.today),
+            'upcoming': ('pending', self.today + timedelta(days=1)),
+            'undated': ('pending', None),
+            'done': ('completed', self.today - timedelta(days=1)),
+        }
+        for title, (task_status, due_date) in cases.items():
+            Task.objects.create(
+                title=title, status=task_status, due_date=due_date, user=self.user,
+            )
+        urgency = dict(
+            Task.objects.for_user(self.user)
+            .with_urgency(self.today).values_list('title', 'urgency')
+        )
+        self.assertEqual(urgency, {
+            'overdue': Task.URGENCY_OVERDUE,
+            'today': Task.URGENCY_TODAY,
+            'upcoming': Task.URGENCY_UPCOMING,
+            'undated': Task.URGENCY_UPCOMING,
+            'done': Task.URGENCY_DONE,
+        })
+
+    def test_list_shows_rows_without_descriptions(self):
+        task = Task.objects.create(
+            title='Late', description='Secret details', user=self.user,
+            due_date=self.today - timedelta(days=1),
+        )
+        task.tags.add(Tag.objects.create(name='home', user=self.user))
+        response = self.client.get(f'{self.lang_prefix}/')
+
+        row = response.context['tasks'][0]
+        self.assertEqual(row.tag_names, ['home'])
+        self.assertTrue(row.has_description)
+        self.assertEqual(row.due_highlight, 'text-danger')
+        self.assertNotContains(response, 'Secret details')
+        self.assertContains(response, reverse('task_description', args=[task.id]))
+
+    def test_description_endpoint(self):
+        task = Task.objects.create(
+            title='Mine', description='Secret details', user=self.user,
+        )
+        response = self.client.get(reverse('task_description', args=[task.id]))
+        self.assertEqual(response.json(), {'description': 'Secret details'})
+
+        other = User.objects.create_user(username='other', password='pass')
+        foreign = Task.objects.create(title='Theirs', description='x', user=other)
+        response = self.client.get(reverse('task_description', args=[foreign.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+# ------------------------------
+# Search tests
+# ------------------------------
+class TaskSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='seeker', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.client = Client()
+        self.client.login(username='seeker', password='pass')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.lang_prefix = '/en'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_title = Task.objects.create(
+                title='Plan the garden', user=self.user,
+            )
+            self.in_description = Task.objects.create(
+                title='Weekend', description='Buy seeds for the garden',
+                user=self.user,
+            )
+            self.in_tags = Task.objects.create(title='Errands', user=self.user)
+            self.in_tags.tags.add(Tag.objects.create(name='gardening', user=self.user))
+            Task.objects.create(title='Unrelated', user=self.user)
+            Task.objects.create(title='Garden of other', user=self.other)
+
+    def search(self, query):
+        return list(Task.objects.for_listing(self.user, query=query))
+
+    def test_search_covers_title_description_and_tags(self):
+        self.assertEqual(
+            self.search('garden'),
+            [self.in_title, self.in_tags, self.in_description],
+        )
+
+    def test_search_matches_all_words(self):
+        self.assertEqual(self.search('garden seeds'), [self.in_description])
+        self.assertEqual(self.search('seeds !?'), [self.in_description])
+
+    def test_search_index_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_title.title = 'Plan the trip'
+            self.in_title.save()
+            self.in_tags.tags.clear()
+        self.assertEqual(self.search('garden'), [self.in_description])
+
+        tag = Tag.objects.create(name='holiday', user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.tasks.add(self.in_title)
+        self.assertEqual(self.search('holiday'), [self.in_title])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'vacation'
+            tag.save()
+        self.assertEqual(self.search('vacation'), [self.in_title])
+
+    @override_settings(TASKS_SEARCH_BACKEND='basic')
+    def test_basic_backend(self):
+        self.assertEqual(
+            set(self.search('garden')),
+            {self.in_title, self.in_description, self.in_tags},
+        )
+
+    def test_search_results_are_paginated_by_rank(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                Task.objects.create(title=f'garden bed {i}', user=self.user)
+        expected = self.search('garden')
+        url = f'{self.lang_prefix}/api/?q=garden&page_size=3'
+        results = []
+        while url:
+            response = self.api_client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results += [task['id'] for task in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(results, [task.id for task in expected])
+
+    def test_search_pages_ignore_other_users_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                Task.objects.create(title=f'garden bed {i}', user=self.user)
+        expected = [task.id for task in self.search('garden')]
+        url = f'{self.lang_prefix}/api/?q=garden&page_size=3'
+        results = []
+        while url:
+            response = self.api_client.get(url)
+            results += [task['id'] for task in response.data['results']]
+            url = response.data['next']
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(10):
+                    Task.objects.create(
+                        title=f'garden garden {i}', description='x ' * i,
+                        user=self.other,
+                    )
+        self.assertEqual(results, expected)
+
+    def test_html_list_search(self):
+        response = self.client.get(f'{self.lang_prefix}/', {'q': 'seeds'})
+        self.assertContains(response, 'Weekend')
+        self.assertNotContains(response, 'Plan the garden')
+
+    def test_api_search_with_status(self):
+        self.in_tags.status = Task.STATUS_COMPLETED
+        self.in_tags.save()
+        response = self.api_client.get(
+            f'{self.lang_prefix}/api/', {'q': 'garden', 'status': 'pending'}
+        )
+        self.assertEqual(
+            [task['id'] for task in response.data['results']],
+            [self.in_title.id, self.in_description.id],
+        )
+
+    def test_rebuild_search_index(self):
+        Task.objects.filter(pk=self.in_description.pk).update(
+            description='Call the plumber'
+        )
+        self.assertEqual(len(self.search('plumber')), 0)
+        call_command(
+            'rebuild_search_index', user='seeker', batch_size=2,
+            stdout=StringIO(),
+        )
+        self.assertEqual(self.search('plumber'), [self.in_description])
+
+
+# ------------------------------
+# Tag autocomplete tests
+# ------------------------------
+class TagAutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='typist', password='pass')
+        other = User.objects.create_user(username='other', password='pass')
+        self.client = Client()
+        self.client.login(username='typist', password='pass')
+        self.url = '/en/tags/autocomplete/'
+        for name, usage in [('Work', 1), ('workout', 3), ('homework', 5), ('home', 0)]:
+            tag = Tag.objects.create(name=name, user=self.user)
+            for i in range(usage):
+                tag.tasks.add(Task.objects.create(title=f'{name} {i}', user=self.user))
+        Tag.objects.create(name='workshop', user=other)
+
+    def test_prefix_matches_ranked_before_substring_matches(self):
+        response = self.client.get(self.url, {'term': 'wor'})
+        self.assertEqual(response.json(), ['workout', 'Work', 'homework'])
+
+    def test_limit(self):
+        response = self.client.get(self.url, {'term': 'o', 'limit': '2'})
+        self.assertEqual(response.json(), ['homework', 'workout'])
+
+    def test_index_is_cached_until_the_tags_change(self):
+        self.client.get(self.url, {'term': 'ho'})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url, {'term': 'hom'})
+        self.assertFalse(
+            any('tasks_tag' in q['sql'] for q in context.captured_queries)
+        )
+
+        Tag.objects.create(name='hobby', user=self.user)
+        response = self.client.get(self.url, {'term': 'ho'})
+        self.assertEqual(response.json(), ['homework', 'hobby', 'home'])
+
+    def test_index_built_before_a_change_is_not_served_after_it(self):
+        build = TagIndex.build
+
+        def build_then_change(user_id):
+            index = build(user_id)
+            Tag.objects.create(name='hobby', user=self.user)
+            return index
+
+        with mock.patch.object(TagIndex, 'build', build_then_change):
+            self.assertNotIn('hobby', get_tag_index(self.user.pk).search('ho'))
+        self.assertIn('hobby', get_tag_index(self.user.pk).search('ho'))
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url, {'term': 'work'})
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        response = self.client.get(
+            self.url, {'term': 'work'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.get(name='home').tasks.add(
+                Task.objects.create(title='New', user=self.user)
+            )
+        response = self.client.get(
+            self.url, {'term': 'work'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+# ------------------------------
+# Query budget tests
+# ------------------------------
+class QueryBudgetMixin:
+    """Assert that a block of code stays within a fixed number of queries."""
+
+    def assertMaxQueries(self, budget, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+        executed = len(context.captured_queries)
+        self.assertLessEqual(
+            executed,
+            budget,
+            f'{executed} queries executed, budget is {budget}:\n'
+            + '\n'.join(q['sql'] for q in context.captured_queries),
+        )
+        return result
+
+    def create_tasks(self, user, count, tags_per_task):
+        tags = [
+            Tag.objects.get_or_create(name=f'tag{i}', user=user)[0]
+            for i in range(tags_per_task)
+        ]
+        for i in range(count):
+            task = Task.objects.create(title=f'Task {i}', user=user)
+            task.tags.add(*tags)
+        return tags
+
+
+class TaskListQueryBudgetTest(QueryBudgetMixin, TestCase):
+    LIST_BUDGET = 5
+    API_LIST_BUDGET = 3
+    EDIT_FORM_BUDGET = 4
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='budget', password='pass')
+        self.client = Client()
+        self.client.login(username='budget', password='pass')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.lang_prefix = '/en'
+
+    def test_task_list_budget_does_not_grow(self):
+        self.create_tasks(self.user, 1, 1)
+        self.assertMaxQueries(
+            self.LIST_BUDGET, self.client.get, f'{self.lang_prefix}/'
+        )
+        self.create_tasks(self.user, 30, 5)
+        response = self.assertMaxQueries(
+            self.LIST_BUDGET, self.client.get, f'{self.lang_prefix}/'
+        )
+        self.assertContains(response, 'tag4')
+
+    def test_task_list_search_budget(self):
+        self.create_tasks(self.user, 30, 5)
+        self.assertMaxQueries(
+            self.LIST_BUDGET,
+            self.client.get,
+            f'{self.lang_prefix}/',
+            {'q': 'tag', 'status': 'pending'},
+        )
+
+    def test_api_list_budget(self):
+        self.create_tasks(self.user, 30, 5)
+        response = self.assertMaxQueries(
+            self.API_LIST_BUDGET, self.api_client.get, f'{self.lang_prefix}/api/'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_edit_form_budget(self):
+        self.create_tasks(self.user, 1, 20)
+        task = Task.objects.get(user=self.user)
+        self.assertMaxQueries(
+            self.EDIT_FORM_BUDGET,
+            self.client.get,
+            f'{self.lang_prefix}/edit/{task.id}/',
+        )
+
+
+class TaskTagsSerializerTest(QueryBudgetMixin, TestCase):
+    WRITE_BUDGET = 13
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tagged', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.url = '/en/api/'
+        self.tags = [
+            Tag.objects.create(name=f'tag{i}', user=self.user) for i in range(10)
+        ]
+
+    def test_write_budget_does_not_grow_with_tags(self):
+        for count in (1, 10):
+            ids = [tag.id for tag in self.tags[:count]]
+            response = self.assertMaxQueries(
+                self.WRITE_BUDGET, self.api_client.post, self.url,
+                {'title': f'{count} tags', 'tags': ids}, format='json',
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['tags'], ids)
+            response = self.assertMaxQueries(
+                self.WRITE_BUDGET, self.api_client.put,
+                f'{self.url}{response.data["id"]}/',
+                {'title': 'Renamed', 'tags': ids[::-1]}, format='json',
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(sorted(response.data['tags']), ids)
+
+    def test_other_users_tags_are_rejected(self):
+        foreign = Tag.objects.create(name='secret', user=self.other)
+        response = self.api_client.post(
+            self.url, {'title': 'Stolen', 'tags': [self.tags[0].id, foreign.id]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['tags'][0].code, 'does_not_exist')
+        for value in ('x', True, {'id': 1}, self.tags[0].id + 0.9, '1.5'):
+            response = self.api_client.post(
+                self.url, {'title': 'Bad', 'tags': [value]}, format='json',
+            )
+            self.assertEqual(response.data['tags'][0].code, 'incorrect_type')
+        self.assertFalse(Task.objects.exists())
+
+        ids = [str(self.tags[0].id), float(self.tags[1].id)]
+        response = self.api_client.post(
+            self.url, {'title': 'Good', 'tags': ids}, format='json',
+        )
+        self.assertEqual(response.data['tags'], [self.tags[0].id, self.tags[1].id])
+
+    def test_embedded_tags(self):
+        task = Task.objects.create(title='Embedded', user=self.user)
+        task.tags.add(*self.tags[:2])
+        expected = [{'id': tag.id, 'name': tag.name} for tag in self.tags[:2]]
+        response = self.assertMaxQueries(
+            TaskListQueryBudgetTest.API_LIST_BUDGET,
+            self.api_client.get, self.url, {'embed': 'tags'},
+        )
+        self.assertEqual(response.data['results'][0]['tags'], expected)
+        response = self.api_client.get(f'{self.url}{task.id}/', {'embed': 'tags'})
+        self.assertEqual(response.data['tags'], expected)
+        self.assertEqual(
+            self.api_client.get(self.url).data['results'][0]['tags'],
+            [tag.id for tag in self.tags[:2]],
+        )
+
+        token = RefreshToken.for_user(self.user).access_token
+        response = self.client.get(
+            self.url, {'embed': 'tags'}, HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+        self.assertEqual(response.json()['results'][0]['tags'], expected)
+
+
+# ------------------------------
+# Bulk API tests
+# ------------------------------
+class BulkAPITest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bulk', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.url = '/en/api/bulk/'
+        self.tag = Tag.objects.create(name='home', user=self.user)
+        self.foreign_tag = Tag.objects.create(name='home', user=self.other)
+
+    def test_bulk_create_uses_fixed_number_of_queries(self):
+        items = [
+            {'title': f'Task {i}', 'tags': [self.tag.id], 'tags_names': ['new', 'home']}
+            for i in range(50)
+        ]
+        response = self.assertMaxQueries(
+            14, self.api_client.post, self.url, items, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertEqual(response.data['errors'], [])
+        task = Task.objects.get(title='Task 7', user=self.user)
+        self.assertEqual(
+            sorted(task.tags.values_list('name', flat=True)), ['home', 'new']
+        )
+
+    def test_bulk_create_reports_item_errors(self):
+        items = [
+            {'title': 'Good'},
+            {'title': 'Bad status', 'status': 'nope'},
+            {'title': 'Foreign tag', 'tags': [self.foreign_tag.id]},
+        ]
+        response = self.api_client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([e['index'] for e in response.data['errors']], [1, 2])
+        self.assertIn('status', response.data['errors'][0]['errors'])
+        self.assertIn('tags', response.data['errors'][1]['errors'])
+        self.assertEqual(
+            list(Task.objects.filter(user=self.user).values_list('title', flat=True)),
+            ['Good'],
+        )
+
+    @override_settings(TASKS_BULK_MAX_BATCH_SIZE=2)
+    def test_bulk_batch_size_limit(self):
+        response = self.api_client.post(
+            self.url, [{'title': str(i)} for i in range(3)], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.api_client.post(
+            f'{self.url}delete/', {'ids': [1, 2, 3]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Task.objects.exists())
+
+    def test_bulk_update(self):
+        tasks = [
+            Task.objects.create(title=f'Task {i}', user=self.user) for i in range(3)
+        ]
+        for task in tasks:
+            task.tags.add(self.tag)
+        foreign = Task.objects.create(title='Foreign', user=self.other)
+        items = [
+            {'id': tasks[0].id, 'title': 'Renamed'},
+            {'id': tasks[1].id, 'tags_names': ['work']},
+            {'id': tasks[2].id, 'tags': []},
+            {'id': foreign.id, 'title': 'Stolen'},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api_client.patch(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([e['index'] for e in response.data['errors']], [3])
+        self.assertEqual(
+            [task['title'] for task in response.data['results']],
+            ['Renamed', 'Task 1', 'Task 2'],
+        )
+        self.assertEqual(list(tasks[0].tags.all()), [self.tag])
+        self.assertEqual(
+            list(tasks[1].tags.values_list('name', flat=True)), ['work']
+        )
+        self.assertFalse(tasks[2].tags.exists())
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.title, 'Foreign')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api_client.patch(
+                self.url, [{'id': tasks[0].id, 'tags': []}], format='json'
+            )
+        Worker().drain()
+        self.assertFalse(Tag.objects.filter(pk=self.tag.pk).exists())
+
+    def test_bulk_update_rejects_boolean_ids(self):
+        task = Task.objects.create(title='First', user=self.user, pk=1)
+        response = self.api_client.patch(
+            self.url,
+            [{'id': True, 'title': 'Hijacked'}, {'id': '1', 'title': 'Text'}],
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [error['errors']['id'] for error in response.data['errors']],
+            [['A valid integer is required.'], ['A valid integer is required.']],
+        )
+        task.refresh_from_db()
+        self.assertEqual(task.title, 'First')
+
+    def test_bulk_status(self):
+        tasks = [
+            Task.objects.create(title=f'Task {i}', user=self.user) for i in range(3)
+        ]
+        response = self.assertMaxQueries(
+            9, self.api_client.post, f'{self.url}status/',
+            {'ids': [task.id for task in tasks] + [999], 'status': 'completed'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['errors'][0]['index'], 3)
+        self.assertEqual(
+            Task.objects.filter(status=Task.STATUS_COMPLETED).count(), 3
+        )
+
+    def test_bulk_delete(self):
+        tasks = [
+            Task.objects.create(title=f'Task {i}', user=self.user) for i in range(3)
+        ]
+        for task in tasks:
+            task.tags.add(self.tag)
+        foreign = Task.objects.create(title='Foreign', user=self.other)
+        ids = [task.id for task in tasks] + [foreign.id]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api_client.post(
+                f'{self.url}delete/', {'ids': ids}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['results'], ids[:3])
+        self.assertEqual(list(Task.objects.all()), [foreign])
+        Worker().drain()
+        self.assertFalse(Tag.objects.filter(pk=self.tag.pk).exists())
+
+    def test_bulk_changes_refresh_search_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api_client.post(
+                self.url, [{'title': 'Find me', 'tags_names': ['garden']}],
+                format='json',
+            )
+        task = Task.objects.get(title='Find me')
+        self.assertEqual(
+            list(Task.objects.for_listing(self.user, query='garden')), [task]
+        )
+
+
+# ------------------------------
+# Async view tests
+# ------------------------------
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='async', password='pass')
+        self.task = Task.objects.create(title='Async task', user=self.user)
+        self.task.tags.add(Tag.objects.create(name='work', user=self.user))
+        token = RefreshToken.for_user(self.user).access_token
+        self.jwt = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+
+    def test_api_reads_match_drf_responses(self):
+        for url in ['/en/api/', f'/en/api/{self.task.id}/']:
+            response = self.client.get(url, **self.jwt)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), self.api_client.get(url).json())
+
+    def test_other_api_requests_go_to_drf(self):
+        response = self.client.get('/en/api/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/en/api/', HTTP_ACCEPT='text/html', **self.jwt)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        response = self.client.get('/en/api/', {'cursor': 'bogus'}, **self.jwt)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/en/api/999/', **self.jwt)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_html_views_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/en/')
+        self.assertContains(response, 'Async task')
+
+        response = await self.async_client.get(
+            reverse('tag_autocomplete'), {'term': 'wo'},
+        )
+        self.assertEqual(response.json(), ['work'])
+
+        response = await self.async_client.post(
+            reverse('task_update_status_ajax', args=[self.task.id]),
+            {'status': 'completed'},
+        )
+        self.assertTrue(response.json()['success'])
+        task = await Task.objects.aget(pk=self.task.id)
+        self.assertEqual(task.status, 'completed')
+
+
+# ------------------------------
+# Authentication cache tests
+# ------------------------------
+@override_settings(TASKS_AUTH_USER_CACHE_TIMEOUT=300)
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cached', password='pass')
+        token = RefreshToken.for_user(self.user).access_token
+        self.jwt = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **self.jwt)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q for q in queries if 'FROM "auth_user"' in q['sql']]
+
+    def test_user_is_read_once(self):
+        for url in ['/en/api/', '/en/api/sync/']:
+            cache.clear()
+            self.assertEqual(len(self.user_queries(url)), 1)
+            self.assertEqual(self.user_queries(url), [])
+
+    def test_changed_user_is_read_again(self):
+        self.user_queries('/en/api/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('changed')
+            self.user.save()
+        self.assertEqual(len(self.user_queries('/en/api/')), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        for url in ['/en/api/', '/en/api/sync/']:
+            response = self.client.get(url, **self.jwt)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_keeps_only_what_tokens_are_checked_against(self):
+        self.user_queries('/en/api/')
+        state = cache.get(f'tasks:auth-user:{self.user.pk}')
+        self.assertEqual(set(state), {'pk', 'is_active', 'password'})
+        self.assertNotIn(self.user.password, state.values())
+
+    @override_settings(TASKS_AUTH_USER_CACHE_TIMEOUT=0)
+    def test_zero_timeout_reads_the_user_on_every_request(self):
+        self.assertEqual(len(self.user_queries('/en/api/')), 1)
+        self.assertEqual(len(self.user_queries('/en/api/')), 1)
+
+
+# ------------------------------
+# Export tests
+# ------------------------------
+class TaskExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='export', password='pass')
+        work = Tag.objects.create(name='work', user=self.user)
+        home = Tag.objects.create(name='home', user=self.user)
+        for i in range(5):
+            task = Task.objects.create(
+                title=f'Task {i}',
+                status='completed' if i == 4 else 'pending',
+                user=self.user,
+            )
+            task.tags.add(work, home)
+        other = User.objects.create_user(username='other', password='pass')
+        Task.objects.create(title='Not mine', user=other)
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('task_export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_streams_tasks_with_tags(self):
+        rows = list(csv.DictReader(self.export().splitlines()))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['tags'], 'home, work')
+        self.assertNotIn('Not mine', [row['title'] for row in rows])
+
+    def test_ndjson_export_applies_list_filters(self):
+        lines = self.export(format='ndjson', status='completed').splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['title'] for record in records], ['Task 4'])
+        self.assertEqual(records[0]['tags'], ['home', 'work'])
+
+    def test_export_accepts_jwt_and_rejects_anonymous(self):
+        self.client.logout()
+        response = self.client.get(reverse('task_export'))
+        self.assertEqual(response.status_code, 302)
+        token = RefreshToken.for_user(self.user).access_token
+        response = self.client.get(
+            reverse('task_export'), HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        response = self.client.get(
+            reverse('task_export'), HTTP_AUTHORIZATION='Bearer bogus',
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_export_streams_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse('task_export'), {'format': 'ndjson'},
+        )
+        content = b''.join([block async for block in response.streaming_content])
+        self.assertEqual(len(content.splitlines()), 5)
+
+    def test_command_reads_tags_with_the_tasks(self):
+        out = StringIO()
+        # User, then the tasks with their tag lists.
+        with self.assertNumQueries(2):
+            call_command(
+                'export_tasks', 'export', '--format', 'ndjson',
+                '--chunk-size', '2', stdout=out,
+            )
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+
+
+# ------------------------------
+# Import tests
+# ------------------------------
+class TaskImportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='pass')
+        self.work = Tag.objects.create(name='work', user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('task-import-tasks')
+
+    def post(self, body, content_type):
+        return self.client.generic('POST', self.url, body, content_type)
+
+    def test_ndjson_import_reports_rejected_rows(self):
+        body = '\n'.join([
+            json.dumps({'title': 'A', 'tags': ['work', 'new']}),
+            json.dumps({'title': '', 'status': 'bogus'}),
+            '',
+            'not json',
+            json.dumps({'title': 'B', 'due_date': '2030-01-02', 'tags': 'new, x'}),
+        ])
+        response = self.post(body, 'application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(
+            [error['line'] for error in response.data['errors']], [2, 4],
+        )
+        self.assertEqual(
+            set(response.data['errors'][0]['errors']), {'title', 'status'},
+        )
+        task = Task.objects.get(title='A')
+        self.assertEqual(task.status, 'pending')
+        self.assertEqual(
+            sorted(task.tags.values_list('name', flat=True)), ['new', 'work'],
+        )
+        self.assertTrue(task.tags.filter(pk=self.work.pk).exists())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+
+    def test_csv_export_imports_back(self):
+        task = Task.objects.create(title='Round, "trip"', user=self.user)
+        task.tags.add(self.work)
+        web = Client()
+        web.force_login(self.user)
+        export = b''.join(web.get(reverse('task_export')).streaming_content)
+
+        other = User.objects.create_user(username='copy', password='pass')
+        self.client.force_authenticate(user=other)
+        response = self.post(export, 'text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        copy = Task.objects.get(user=other)
+        self.assertEqual(copy.title, 'Round, "trip"')
+        self.assertEqual(list(copy.tags.values_list('name', flat=True)), ['work'])
+
+    def test_malformed_input_is_rejected(self):
+        response = self.post('name\nA\n', 'text/csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.post('{}', 'application/json')
+        self.assertEqual(
+            response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+
+    def test_chunk_queries_do_not_grow_with_rows(self):
+        def queries(rows):
+            lines = [
+                json.dumps({'title': f'T{i}', 'tags': ['work', f'tag{i}']})
+                for i in range(rows)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                import_tasks(self.user, lines, FORMAT_NDJSON, chunk_size=100)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(queries(3), queries(30))
+
+    def test_command_reports_progress_and_errors(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('title,tags\nOne,work\n,\nTwo,\nThree,work\n')
+        self.addCleanup(os.remove, f.name)
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_tasks', 'importer', f.name, '--chunk-size', '2',
+            stdout=out, stderr=err,
+        )
+        self.assertIn('Imported 2 tasks, rejected 1 rows.', out.getvalue())
+        self.assertIn('Done: 3 tasks imported, 1 rows rejected.', out.getvalue())
+        self.assertIn('Line 3:', err.getvalue())
+        self.assertEqual(self.work.tasks.count(), 2)
+
+
+# ------------------------------
+# Live event tests
+# ------------------------------
+class TaskEventsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='live', password='pass')
+        self.task = Task.objects.create(title='Live task', user=self.user)
+        self.other = Task.objects.create(title='Other task', user=self.user)
+        self.client.force_login(self.user)
+        change_events.pending.clear()
+
+    def commit(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    async def published(self, change):
+        async with get_broker().subscribe(self.user.pk) as subscription:
+            await sync_to_async(self.commit)(change)
+            # Events are handed over with call_soon_threadsafe.
+            await asyncio.sleep(0)
+            events = []
+            while not subscription.queue.empty():
+                events.append(subscription.queue.get_nowait())
+        return events
+
+    async def test_saves_publish_one_event_per_task(self):
+        def create():
+            task = Task.objects.create(title='New', user=self.user)
+            task.tags.add(Tag.objects.create(name='work', user=self.user))
+            self.new_id = task.pk
+
+        events = await self.published(create)
+        self.assertEqual(events, [{'type': 'created', 'id': self.new_id}])
+
+        events = await self.published(lambda: self.client.post(
+            reverse('task_update_status_ajax', args=[self.task.pk]),
+            {'status': 'completed'},
+        ))
+        self.assertEqual(
+            events,
+            [{'type': 'status', 'id': self.task.pk, 'status': 'completed'}],
+        )
+
+        def edit():
+            self.task.title = 'Renamed'
+            self.task.save()
+
+        events = await self.published(edit)
+        self.assertEqual(events, [{'type': 'updated', 'id': self.task.pk}])
+
+        task_id = self.task.pk
+        events = await self.published(self.task.delete)
+        self.assertEqual(events, [{'type': 'deleted', 'id': task_id}])
+
+    async def test_rolled_back_changes_publish_nothing(self):
+        def rolled_back():
+            try:
+                with transaction.atomic():
+                    Task.objects.create(title='Phantom', user=self.user)
+                    Task.objects.filter(pk=self.other.pk).delete()
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+
+        self.assertEqual(await self.published(rolled_back), [])
+
+        def edit_then_roll_back():
+            self.task.title = 'Renamed'
+            self.task.save()
+            rolled_back()
+
+        events = await self.published(edit_then_roll_back)
+        self.assertEqual(events, [{'type': 'updated', 'id': self.task.pk}])
+
+    async def test_bulk_changes_publish_one_event_per_task(self):
+        ids = [self.task.pk, self.other.pk]
+
+        events = await self.published(lambda: bulk_set_status(
+            self.user, {'ids': ids, 'status': 'in_progress'}, {},
+        ))
+        self.assertEqual(events, [
+            {'type': 'status', 'id': pk, 'status': 'in_progress'}
+            for pk in ids
+        ])
+
+        events = await self.published(
+            lambda: bulk_delete_tasks(self.user, {'ids': ids}, {})
+        )
+        self.assertEqual(events, [{'type': 'deleted', 'id': pk} for pk in ids])
+
+    async def test_stream_sends_events_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('task_events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertIn(b': connected', await anext(stream))
+        get_broker().publish(self.user.pk, [{'type': 'deleted', 'id': 7}])
+        message = await asyncio.wait_for(anext(stream), 1)
+        self.assertEqual(
+            message, b'event: deleted\ndata: {"type": "deleted", "id": 7}\n\n',
+        )
+
+        # The handler cancels the stream when the client disconnects.
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(get_broker().subscribers, {})
+
+    def test_stream_is_not_served_under_wsgi(self):
+        response = self.client.get(reverse('task_events'))
+        self.assertEqual(response.status_code, 204)
+
+    def test_item_returns_the_card_in_the_list_filters(self):
+        url = reverse('task_item')
+        response = self.client.get(url, {'id': self.task.pk})
+        self.assertContains(response, f'id="task-{self.task.pk}"')
+        response = self.client.get(
+            url, {'id': self.task.pk, 'status': 'completed'},
+        )
+        self.assertEqual(response.status_code, 204)
+
+    @override_settings(TASKS_EVENTS_QUEUE_SIZE=2)
+    async def test_slow_subscriber_gets_resync(self):
+        subscription = Subscription(get_broker(), self.user.pk)
+        subscription.deliver([
+            {'type': 'deleted', 'id': pk} for pk in range(3)
+        ])
+        self.assertEqual(await subscription.get(), {'type': 'resync'})
+        self.assertTrue(subscription.queue.empty())
+
+
+# ------------------------------
+# Delta sync tests
+# ------------------------------
+class SyncAPITest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='syncer', password='pass')
+        self.client = Client()
+        self.client.login(username='syncer', password='pass')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.url = '/en/api/sync/'
+        self.kept = Task.objects.create(title='Kept', user=self.user)
+        self.changed = Task.objects.create(title='Changed', user=self.user)
+        self.doomed = Task.objects.create(title='Doomed', user=self.user)
+
+    def sync(self, token=None):
+        response = self.api_client.get(self.url, {'token': token} if token else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_full_sync_without_token(self):
+        data = self.sync()
+        self.assertTrue(data['full'])
+        self.assertEqual(
+            [task['id'] for task in data['tasks']],
+            [self.kept.id, self.changed.id, self.doomed.id],
+        )
+        self.assertEqual(data['deleted'], {'tasks': [], 'tags': []})
+
+    def test_delta_holds_only_changes_and_deletions(self):
+        token = self.sync()['token']
+        self.api_client.patch(
+            f'/en/api/{self.changed.id}/', {'title': 'New title'}, format='json',
+        )
+        created = self.api_client.post(
+            '/en/api/', {'title': 'Created', 'tags': [], 'tags_names': ['home']},
+            format='json',
+        ).data
+        self.api_client.delete(f'/en/api/{self.doomed.id}/')
+
+        data = self.sync(token)
+        self.assertFalse(data['full'])
+        self.assertEqual(
+            [task['id'] for task in data['tasks']],
+            [self.changed.id, created['id']],
+        )
+        self.assertEqual([tag['name'] for tag in data['tags']], ['home'])
+        self.assertEqual(data['deleted']['tasks'], [self.doomed.id])
+
+        data = self.sync(data['token'])
+        self.assertEqual((data['tasks'], data['tags']), ([], []))
+        self.assertEqual(data['deleted'], {'tasks': [], 'tags': []})
+
+    def test_tag_changes_and_html_delete(self):
+        tag = Tag.objects.create(name='work', user=self.user)
+        self.doomed.tags.add(tag)
+        token = self.sync()['token']
+
+        self.kept.tags.add(tag)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('task_delete', args=[self.doomed.id]))
+            self.kept.tags.clear()
+        Worker().drain()
+
+        data = self.sync(token)
+        self.assertEqual([task['id'] for task in data['tasks']], [self.kept.id])
+        self.assertEqual(data['deleted'], {'tasks': [self.doomed.id], 'tags': [tag.id]})
+
+    def test_bulk_changes_are_synced(self):
+        token = self.sync()['token']
+        self.api_client.post(
+            '/en/api/bulk/status/',
+            {'ids': [self.changed.id], 'status': 'completed'}, format='json',
+        )
+        self.api_client.post(
+            '/en/api/bulk/delete/', {'ids': [self.doomed.id]}, format='json',
+        )
+        data = self.sync(token)
+        self.assertEqual([task['id'] for task in data['tasks']], [self.changed.id])
+        self.assertEqual(data['deleted']['tasks'], [self.doomed.id])
+
+    def test_renaming_or_deleting_a_tag_syncs_its_tasks(self):
+        tag = Tag.objects.create(name='work', user=self.user)
+        self.kept.tags.add(tag)
+        token = self.sync()['token']
+
+        tag.name = 'job'
+        tag.save()
+        data = self.sync(token)
+        self.assertEqual([task['id'] for task in data['tasks']], [self.kept.id])
+        self.assertEqual([tag['name'] for tag in data['tags']], ['job'])
+
+        tag_id = tag.id
+        tag.delete()
+        data = self.sync(data['token'])
+        self.assertEqual([task['id'] for task in data['tasks']], [self.kept.id])
+        self.assertEqual(data['tasks'][0]['tags'], [])
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+
+    def test_tags_created_by_bulk_writes_are_synced(self):
+        token = self.sync()['token']
+        self.api_client.post(
+            '/en/api/bulk/', [{'title': 'Bulk', 'tags_names': ['errands']}],
+            format='json',
+        )
+        data = self.sync(token)
+        self.assertEqual([tag['name'] for tag in data['tags']], ['errands'])
+        self.assertEqual(
+            data['tasks'][0]['tags'], [tag['id'] for tag in data['tags']],
+        )
+
+        self.api_client.generic(
+            'POST', reverse('task-import-tasks'),
+            json.dumps({'title': 'Imported', 'tags': ['errands', 'garden']}),
+            'application/x-ndjson',
+        )
+        data = self.sync(data['token'])
+        self.assertEqual([tag['name'] for tag in data['tags']], ['garden'])
+        self.assertEqual([task['title'] for task in data['tasks']], ['Imported'])
+
+    def test_foreign_or_expired_token_gets_full_resync(self):
+        other = User.objects.create_user(username='other', password='pass')
+        other_client = APIClient()
+        other_client.force_authenticate(user=other)
+        foreign_token = other_client.get(self.url).data['token']
+        self.assertTrue(self.sync(foreign_token)['full'])
+        self.assertTrue(self.sync('bogus')['full'])
+
+        token = self.sync()['token']
+        with override_settings(TASKS_SYNC_TOMBSTONE_RETENTION=-1):
+            self.assertTrue(self.sync(token)['full'])
+
+    @override_settings(TASKS_SYNC_PRUNE_INTERVAL=0)
+    def test_prune_command(self):
+        self.doomed.delete()
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertIn('Deleted 0 tombstones', out.getvalue())
+        call_command('prune_tombstones', '--retention', '-1', stdout=out)
+        self.assertIn('Deleted 1 tombstones', out.getvalue())
+
+
+# ------------------------------
+# List cache tests
+# ------------------------------
+class ListCacheTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cached', password='pass')
+        self.client = Client()
+        self.client.login(username='cached', password='pass')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.lang_prefix = '/en'
+        self.task = Task.objects.create(title='First', user=self.user)
+
+    def task_queries(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            response = func(*args, **kwargs)
+        queries = [
+            q['sql'] for q in context.captured_queries
+            if '"tasks_task"' in q['sql']
+        ]
+        return response, queries
+
+    def test_unchanged_list_is_served_from_cache(self):
+        url = f'{self.lang_prefix}/'
+        self.client.get(url)
+        response, queries = self.task_queries(self.client.get, url)
+        self.assertContains(response, 'First')
+        self.assertEqual(queries, [])
+
+        Task.objects.create(title='Second', user=self.user)
+        response, queries = self.task_queries(self.client.get, url)
+        self.assertContains(response, 'Second')
+        self.assertNotEqual(queries, [])
+
+    def test_conditional_get_returns_not_modified(self):
+        url = f'{self.lang_prefix}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        response, queries = self.task_queries(
+            self.client.get, url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, [])
+
+        response = self.client.get(url, {'status': 'pending'})
+        self.assertNotEqual(response['ETag'], etag)
+
+        self.task.tags.add(Tag.objects.create(name='new', user=self.user))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'new')
+
+    def test_pages_with_messages_are_not_validated(self):
+        response = self.client.post(
+            f'{self.lang_prefix}/create/',
+            {'title': 'Created', 'status': 'pending'},
+            follow=True,
+        )
+        self.assertContains(response, 'Created')
+        self.assertNotIn('ETag', response)
+
+    def test_api_list_cache_and_not_modified(self):
+        url = f'{self.lang_prefix}/api/'
+        response = self.api_client.get(url)
+        etag = response['ETag']
+        response, queries = self.task_queries(self.api_client.get, url)
+        self.assertEqual(response.data['results'][0]['title'], 'First')
+        self.assertEqual(queries, [])
+        response = self.api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.api_client.patch(f'{url}{self.task.id}/', {'title': 'Renamed'})
+        response = self.api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+
+
+# ------------------------------
+# Migration tests
+# ------------------------------
+class MergeDuplicateTagsMigrationTest(TransactionTestCase):
+    migrate_from = [('tasks', '0001_squashed_0014_delete_telegramprofile')]
+    migrate_to = [('tasks', '0016_task_indexes_tag_unique_name')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        OldTag = apps.get_model('tasks', 'Tag')
+        OldTask = apps.get_model('tasks', 'Task')
+        OldUser = apps.get_model('auth', 'User')
+
+        user = OldUser.objects.create(username='dupes')
+        self.first = OldTag.objects.create(name='work', user_id=user.id)
+        second = OldTag.objects.create(name='work', user_id=user.id)
+        task_a = OldTask.objects.create(title='A', user_id=user.id)
+        task_b = OldTask.objects.create(title='B', user_id=user.id)
+        self.first.tasks.add(task_a)
+        second.tasks.add(task_a, task_b)
+        self.task_ids = {task_a.id, task_b.id}
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        self.apps = executor.loader.project_state(self.migrate_to).apps
+
+    def tearDown(self):
+        # Leave the latest schema to the test cases running after this one.
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_are_merged_into_oldest_tag(self):
+        tag = self.apps.get_model('tasks', 'Tag').objects.get(name='work')
+        self.assertEqual(tag.id, self.first.id)
+        self.assertEqual(
+            set(tag.tasks.values_list('id', flat=True)), self.task_ids
+        )
+
+
+# ------------------------------
+# Tag service tests
+# ------------------------------
+class TagServiceTest(QueryBudgetMixin, TestCase):
+    TAG_COUNT = 20
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tagger', password='pass')
+        self.client = Client()
+        self.client.login(username='tagger', password='pass')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.lang_prefix = '/en'
+        self.names = [f'tag{i}' for i in range(self.TAG_COUNT)]
+
+    def test_parse_tag_names(self):
+        self.assertEqual(
+            parse_tag_names(' work, urgent,,work , home '),
+            ['work', 'urgent', 'home'],
+        )
+
+    def test_resolve_tags_creates_missing_in_constant_queries(self):
+        Tag.objects.create(name='tag0', user=self.user)
+        tags = self.assertMaxQueries(4, resolve_tags, self.user, self.names)
+        self.assertEqual([tag.name for tag in tags], self.names)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), self.TAG_COUNT)
+
+        tags = self.assertMaxQueries(1, resolve_tags, self.user, self.names)
+        self.assertEqual(len(tags), self.TAG_COUNT)
+
+    def test_resolve_tags_is_scoped_to_user(self):
+        other = User.objects.create_user(username='other', password='pass')
+        foreign = Tag.objects.create(name='tag0', user=other)
+        tag = resolve_tags(self.user, ['tag0'])[0]
+        self.assertNotEqual(tag.pk, foreign.pk)
+        self.assertEqual(tag.user, self.user)
+
+    def test_create_view_with_many_tags(self):
+        data = {
+            'title': 'Tagged', 'status': 'pending',
+            'tags_input': ', '.join(self.names),
+        }
+        self.assertMaxQueries(
+            18, self.client.post, f'{self.lang_prefix}/create/', data
+        )
+        task = Task.objects.get(title='Tagged')
+        self.assertEqual(task.tags.count(), self.TAG_COUNT)
+
+    def test_edit_view_with_many_tags(self):
+        task = Task.objects.create(title='Edit me', user=self.user)
+        data = {
+            'title': 'Edited', 'status': 'pending',
+            'tags_input': ', '.join(self.names),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertMaxQueries(
+                18, self.client.post,
+                f'{self.lang_prefix}/edit/{task.id}/', data,
+            )
+        self.assertEqual(task.tags.count(), self.TAG_COUNT)
+
+    def test_api_create_and_update_with_many_tags(self):
+        response = self.assertMaxQueries(
+            16, self.api_client.post, f'{self.lang_prefix}/api/',
+            {'title': 'API', 'tags': [], 'tags_names': self.names},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task_id = response.data['id']
+
+        renamed = [f'new{i}' for i in range(self.TAG_COUNT)]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.assertMaxQueries(
+                22, self.api_client.patch,
+                f'{self.lang_prefix}/api/{task_id}/',
+                {'tags_names': renamed}, format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        Worker().drain()
+        self.assertEqual(
+            sorted(Tag.objects.filter(user=self.user).values_list('name', flat=True)),
+            sorted(renamed),
+        )
+
+    def test_form_rejects_too_long_tag(self):
+        form = TaskForm(
+            data={'title': 'T', 'status': 'pending', 'tags_input': 'x' * 51},
+            user=self.user,
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('tags_input', form.errors)
+
+
+# ------------------------------
+# Benchmark data tests
+# ------------------------------
+class SeedBenchmarkTest(TestCase):
+    def seed(self, *args):
+        call_command(
+            'seed_benchmark', '--users', '2', '--tasks', '30', '--tags', '5',
+            *args, stdout=StringIO(),
+        )
+        return Task.objects.filter(user__username__startswith='bench-0-')
+
+    def test_same_seed_generates_same_data(self):
+        tasks = self.seed('--password', 'pass')
+        first = list(tasks.order_by('pk').values_list('title', 'status', 'due_date'))
+        self.assertEqual(len(first), 60)
+        self.assertTrue(self.client.login(username='bench-0-1', password='pass'))
+        self.assertTrue(Task.objects.search(first[0][0].split()[0]).exists())
+
+        tasks = self.seed('--clear')
+        self.assertEqual(
+            list(tasks.order_by('pk').values_list('title', 'status', 'due_date')),
+            first,
+        )
+        self.assertFalse(Tombstone.objects.exists())
+
+
+# ------------------------------
+# Server timing tests
+# ------------------------------
+@override_settings(TASKS_SERVER_TIMING=True)
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='timed', password='pass')
+        self.client.force_login(self.user)
+
+    def metrics(self, response):
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_header_splits_the_request_time(self):
+        response = self.client.get('/en/create/')
+        metrics = self.metrics(response)
+        self.assertEqual(set(metrics), {'db', 'tpl', 'signals', 'total'})
+        self.assertRegex(metrics['db']['desc'], r'^"[1-9]\d* queries"$')
+        self.assertGreater(float(metrics['tpl']['dur']), 0)
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']), float(metrics['tpl']['dur']),
+        )
+
+    @override_settings(DEBUG=False)
+    def test_header_is_off_by_default_outside_debug(self):
+        del settings.TASKS_SERVER_TIMING
+        response = self.client.get('/en/create/')
+        self.assertNotIn('Server-Timing', response)
+
+    async def test_queries_of_async_views_are_counted(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/en/')
+        self.assertNotEqual(self.metrics(response)['db']['desc'], '"0 queries"')
+
+    @override_settings(TASKS_SLOW_REQUEST_MS=1)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        data = {'title': 'Timed', 'description': '', 'tags_input': 'a, b', 'status': 'pending'}
+        with self.assertLogs('tasks.timing', 'WARNING') as logs:
+            response = self.client.post('/en/create/', data)
+        self.assertGreater(float(self.metrics(response)['signals']['dur']), 0)
+        self.assertIn('view=task_create', logs.output[0])
+        self.assertIn('INSERT INTO "tasks_task"', logs.output[0])
+        self.assertEqual(logs.records[0].timing['status'], 302)
+
+
+# ------------------------------
+# Tag list tests
+# ------------------------------
+class TaskTagListTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='listed', password='pass')
+        self.client.force_login(self.user)
+        self.task = Task.objects.create(title='Task', user=self.user)
+        self.home, self.work = [
+            Tag.objects.create(name=name, user=self.user) for name in ('home', 'work')
+        ]
+
+    def tag_list(self, task=None):
+        return Task.objects.get(pk=(task or self.task).pk).tag_list
+
+    def test_tag_changes_update_the_tag_list(self):
+        self.task.tags.add(self.work, self.home)
+        expected = [[self.home.pk, 'home'], [self.work.pk, 'work']]
+        self.assertEqual(self.task.tag_list, expected)
+        self.assertEqual(self.tag_list(), expected)
+
+        self.work.name = 'job'
+        self.work.save()
+        self.assertEqual(self.tag_list()[0], [self.home.pk, 'home'])
+        self.assertEqual(self.tag_list()[1], [self.work.pk, 'job'])
+        self.task.tags.remove(self.home)
+        self.assertEqual(self.tag_list(), [[self.work.pk, 'job']])
+        self.work.tasks.clear()
+        self.assertEqual(self.tag_list(), [])
+        self.home.tasks.add(self.task)
+        self.task.tags.add(self.work)
+        self.home.delete()
+        self.assertEqual(self.tag_list(), [[self.work.pk, 'job']])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.tags.clear()
+        self.assertEqual(self.tag_list(), [])
+        Worker().drain()
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_writes_set_the_tag_list(self):
+        api_client = APIClient()
+        api_client.force_authenticate(user=self.user)
+        response = api_client.post(
+            '/en/api/bulk/',
+            [{'title': 'Bulk', 'tags': [self.work.pk], 'tags_names': ['new', 'home']}],
+            format='json',
+        )
+        task = Task.objects.get(pk=response.data['results'][0]['id'])
+        self.assertEqual(task.tag_names, ['home', 'new', 'work'])
+        api_client.patch(
+            '/en/api/bulk/', [{'id': task.pk, 'tags': [self.home.pk]}], format='json',
+        )
+        self.assertEqual(self.tag_list(task), [[self.home.pk, 'home']])
+
+        import_tasks(self.user, ['{"title": "Imported", "tags": ["work", "b"]}'], FORMAT_NDJSON)
+        self.assertEqual(
+            Task.objects.get(title='Imported').tag_names, ['b', 'work'],
+        )
+
+    def test_reads_do_not_join_the_tags(self):
+        self.task.tags.add(self.home)
+        api_client = APIClient()
+        api_client.force_authenticate(user=self.user)
+        for get in (
+            lambda: self.client.get('/en/'),
+            lambda: self.client.get('/en/', {'q': 'home'}),
+            lambda: api_client.get('/en/api/', {'embed': 'tags'}),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = get()
+            self.assertContains(response, 'home')
+            self.assertFalse(
+                [q['sql'] for q in queries if 'tasks_tag' in q['sql']],
+            )
+
+    def test_check_command_finds_and_fixes_drift(self):
+        Tag.tasks.through.objects.create(task=self.task, tag=self.home)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_tag_lists', stdout=out)
+        self.assertIn(f'Task {self.task.pk}: [home]', out.getvalue())
+        call_command('check_tag_lists', '--fix', stdout=out)
+        self.assertEqual(self.tag_list(), [[self.home.pk, 'home']])
+        call_command('check_tag_lists', stdout=out)
+        self.assertIn('Found 0 stale tag lists.', out.getvalue())
+
+
+# ------------------------------
+# Task statistics tests
+# ------------------------------
+class TaskStatsTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counted', password='pass')
+        self.client.force_login(self.user)
+        self.today = timezone.localdate()
+        get_stats(self.user)
+
+    def assertStatsMatchTasks(self):
+        stats = self.assertMaxQueries(1, get_stats, self.user)
+        expected = rebuild_stats([self.user.pk], save=False)[0]
+        self.assertEqual(stats_dict(stats), stats_dict(expected))
+        return stats_dict(stats)
+
+    def test_counters_follow_saves_and_deletes(self):
+        overdue = Task.objects.create(
+            title='Overdue', user=self.user, due_date=self.today - timedelta(days=1),
+        )
+        today = Task.objects.create(title='Today', user=self.user, due_date=self.today)
+        Task.objects.create(title='Done', user=self.user, status='completed')
+        stats = self.assertStatsMatchTasks()
+        self.assertEqual(
+            (stats['pending'], stats['overdue'], stats['due_today']), (2, 1, 1),
+        )
+        self.assertEqual(stats['completed_this_week'], 1)
+
+        self.client.post(
+            reverse('task_update_status_ajax', args=[overdue.id]),
+            {'status': 'completed'},
+        )
+        overdue.refresh_from_db()
+        self.assertIsNotNone(overdue.completed_at)
+        stats = self.assertStatsMatchTasks()
+        self.assertEqual((stats['overdue'], stats['completed']), (0, 2))
+
+        today = Task.objects.get(pk=today.pk)
+        today.due_date = None
+        today.save(update_fields=['title'])
+        self.assertStatsMatchTasks()
+        today.status = 'in_progress'
+        today.save()
+        self.assertEqual(self.assertStatsMatchTasks()['due_today'], 0)
+        Task.objects.get(pk=overdue.pk).delete()
+        self.assertEqual(self.assertStatsMatchTasks()['completed'], 1)
+
+        Task.objects.only('title').get(pk=today.pk).save()
+        self.assertFalse(TaskStats.objects.filter(as_of=self.today).exists())
+        get_stats(self.user)
+        self.assertStatsMatchTasks()
+
+    def test_bulk_changes_and_new_days_recount(self):
+        tasks = [Task.objects.create(title=str(i), user=self.user) for i in range(3)]
+        bulk_set_status(
+            self.user, {'ids': [task.id for task in tasks], 'status': 'completed'}, {},
+        )
+        self.assertFalse(TaskStats.objects.filter(as_of=self.today).exists())
+        self.assertEqual(get_stats(self.user).completed_this_week, 3)
+        self.assertStatsMatchTasks()
+
+        TaskStats.objects.update(as_of=self.today - timedelta(days=1), completed=0)
+        Task.objects.create(title='Late', user=self.user, status='completed')
+        self.assertEqual(get_stats(self.user).completed, 4)
+
+    def test_rebuild_command_reports_drift(self):
+        Task.objects.create(title='Task', user=self.user)
+        get_stats(self.user)
+        Task.objects.update(due_date=self.today)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_task_stats', '--check', stdout=out)
+        self.assertIn(f'User {self.user.pk}: due_today 0 -> 1', out.getvalue())
+        call_command('rebuild_task_stats', stdout=out)
+        call_command('rebuild_task_stats', '--check', stdout=out)
+        self.assertIn('Checked the statistics of 1 users, 0 drifted.', out.getvalue())
+
+    def test_endpoints_and_widget(self):
+        Task.objects.create(title='Today', user=self.user, due_date=self.today)
+        response = self.client.get(reverse('task_stats'))
+        self.assertEqual(response.json()['due_today'], 1)
+        self.assertEqual(response.json()['as_of'], self.today.isoformat())
+        api_client = APIClient()
+        api_client.force_authenticate(user=self.user)
+        self.assertEqual(api_client.get('/en/api/stats/').data, response.json())
+        self.assertContains(
+            self.client.get('/en/'), f'data-stats-url="{reverse("task_stats")}"',
+        )
+
+
+# ------------------------------
+# Reminder tests
+# ------------------------------
+class FailingBackend:
+    def send(self, reminders):
+        raise OSError('unreachable')
+
+
+@override_settings(
+    TASKS_REMINDER_LEAD=60 * 60,
+    TASKS_REMINDER_GRACE=60 * 60,
+    TASKS_REMINDER_ALL_DAY_TIME='13:00',
+)
+class TaskReminderTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='u', password='p', email='u@example.com',
+        )
+        self.day = date(2026, 5, 4)
+        self.now = timezone.make_aware(datetime.combine(self.day, time(12)))
+        self.output = StringIO()
+
+    def task(self, title, due_time=None, due_date=None, **fields):
+        return Task.objects.create(
+            title=title, user=self.user, due_date=due_date or self.day,
+            due_time=due_time, **fields,
+        )
+
+    def scheduler(self, backend=None):
+        return ReminderScheduler(
+            backend=backend or ConsoleBackend(self.output), window=60 * 60,
+        )
+
+    def test_scan_reads_open_tasks_due_in_the_window(self):
+        soon = self.task('Soon', time(13, 30))
+        late = self.task('Missed', time(12, 30))
+        all_day = self.task('All day')
+        self.task('Later', time(15))
+        self.task('Done', time(13, 30), status=Task.STATUS_COMPLETED)
+        self.task('Yesterday', time(13, 30), self.day - timedelta(days=1))
+        scheduler = self.scheduler()
+        with self.assertNumQueries(3):
+            self.assertEqual(scheduler.scan(self.now), 3)
+        self.assertEqual(
+            [reminder.task_id for reminder in scheduler.heap[:1]], [late.pk],
+        )
+        self.assertEqual(
+            {reminder.task_id for reminder in scheduler.heap},
+            {soon.pk, late.pk, all_day.pk},
+        )
+        plan = Task.objects.filter(
+            due_between(self.now, self.now + timedelta(hours=1)),
+        ).explain()
+        self.assertIn('task_due_idx', plan)
+
+    def test_reminders_are_sent_once_when_due(self):
+        self.task('Soon', time(13, 30))
+        self.task('Missed', time(12, 30))
+        scheduler = self.scheduler()
+        scheduler.scan(self.now)
+        self.assertEqual(scheduler.run_pending(self.now), 1)
+        self.assertEqual(
+            self.output.getvalue(),
+            'Reminder for u: "Missed" is due 2026-05-04 12:30\n',
+        )
+        self.assertEqual(scheduler.next_due(), self.now + timedelta(minutes=30))
+        self.assertEqual(scheduler.run_pending(self.now + timedelta(hours=1)), 1)
+
+        again = self.scheduler()
+        self.assertEqual(again.scan(self.now), 0)
+        self.assertEqual(
+            TaskReminder.objects.filter(sent_at__isnull=False).count(), 2,
+        )
+
+    def test_moved_and_completed_tasks_are_skipped(self):
+        moved = self.task('Moved', time(13, 30))
+        done = self.task('Done', time(13, 30))
+        scheduler = self.scheduler()
+        scheduler.scan(self.now)
+        moved.due_time = time(13, 45)
+        moved.save()
+        done.status = Task.STATUS_COMPLETED
+        done.save()
+        self.assertEqual(scheduler.run_pending(self.now + timedelta(hours=1)), 0)
+        scheduler.scan(self.now)
+        self.assertEqual(scheduler.run_pending(self.now + timedelta(hours=1)), 1)
+        self.assertIn('"Moved" is due 2026-05-04 13:45', self.output.getvalue())
+
+    def test_failed_batch_is_retried(self):
+        self.task('Missed', time(12, 30))
+        scheduler = self.scheduler(FailingBackend())
+        scheduler.scan(self.now)
+        with self.assertLogs('tasks.reminders', 'ERROR'):
+            self.assertEqual(scheduler.run_pending(self.now), 0)
+        self.assertFalse(TaskReminder.objects.exists())
+        scheduler.backend = ConsoleBackend(self.output)
+        scheduler.scan(self.now)
+        self.assertEqual(scheduler.run_pending(self.now), 1)
+
+    @override_settings(TASKS_REMINDER_BACKEND='email')
+    def test_command_emails_due_reminders(self):
+        other = User.objects.create_user(username='v', password='p')
+        due = timezone.localtime() + timedelta(minutes=30)
+        self.task('Mine', due.time(), due.date())
+        Task.objects.create(
+            title='No address', user=other, due_date=due.date(),
+            due_time=due.time(),
+        )
+        out = StringIO()
+        call_command('run_reminders', '--once', stdout=out)
+        self.assertIn('Sent 2 reminders.', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['u@example.com'])
+        self.assertEqual(mail.outbox[0].subject, 'Reminder: Mine')
+        with self.assertRaises(CommandError):
+            call_command('run_reminders', '--interval', '0')
+
+
+# ------------------------------
+# Job queue tests
+# ------------------------------
+class JobQueueTest(TestCase):
+    def setUp(self):
+        self.batches = []
+        self.failure = None
+        register('tests.record', self.record)
+
+    def record(self, ids):
+        if self.failure:
+            raise self.failure
+        self.batches.append(ids)
+
+    def test_identical_jobs_are_deduplicated_and_batched(self):
+        enqueue('tests.record', [1, 2])
+        enqueue('tests.record', [2, 3])
+        self.assertEqual(Job.objects.count(), 3)
+        self.assertEqual(Worker(batch_size=2).drain(), 3)
+        self.assertEqual(self.batches, [{1, 2}, {3}])
+        self.assertFalse(Job.objects.exists())
+
+    def test_job_queued_while_running_runs_again(self):
+        enqueue('tests.record', [1])
+        jobs = claim_jobs(10)
+        enqueue('tests.record', [1])
+        self.assertEqual(
+            sorted(Job.objects.values_list('state', flat=True)),
+            [Job.STATE_QUEUED, Job.STATE_RUNNING],
+        )
+        self.assertEqual(Worker().drain(), 1)
+        self.assertEqual(Job.objects.get().pk, jobs[0].pk)
+
+    @override_settings(TASKS_JOB_MAX_ATTEMPTS=2, TASKS_JOB_RETRY_DELAY=0)
+    def test_failed_batches_are_retried_then_marked_failed(self):
+        enqueue('tests.record', [1, 2])
+        self.failure = ValueError('broken')
+        with self.assertLogs('tasks.jobs', 'ERROR') as logs:
+            self.assertEqual(Worker().drain(), 0)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(
+            list(Job.objects.values_list('state', 'attempts', 'last_error')),
+            [(Job.STATE_FAILED, 2, "ValueError('broken')")] * 2,
+        )
+        enqueue('tests.record', [1])
+        self.failure = None
+        self.assertEqual(Worker().drain(), 1)
+        self.assertEqual(self.batches, [{1}])
+
+    def test_expired_claims_are_released(self):
+        enqueue('tests.record', [1])
+        claim_jobs(10)
+        self.assertIsNone(Worker().run_once())
+        self.assertEqual(
+            release_expired_jobs(timezone.now() + timedelta(hours=1)), 1,
+        )
+        job = Job.objects.get()
+        self.assertEqual((job.state, job.attempts), (Job.STATE_QUEUED, 1))
+        job.run_after = timezone.now()
+        job.save()
+        self.assertEqual(Worker().drain(), 1)
+
+    def test_bulk_changes_queue_a_stats_rebuild(self):
+        user = User.objects.create_user(username='u', password='p')
+        task = Task.objects.create(title='Task', user=user)
+        get_stats(user)
+        bulk_set_status(user, {'ids': [task.pk], 'status': 'completed'}, {})
+        self.assertFalse(
+            TaskStats.objects.filter(as_of=timezone.localdate()).exists()
+        )
+        Worker().drain()
+        self.assertEqual(TaskStats.objects.get(user=user).completed, 1)
+
+
+class RunWorkerCommandTest(TransactionTestCase):
+    def setUp(self):
+        self.batches = []
+        register('tests.record', self.batches.append)
+
+    def test_command_runs_committed_jobs(self):
+        # One thread: SQLite's shared in-memory test database locks
+        # tables between threads.
+        enqueue('tests.record', range(10))
+        out = StringIO()
+        call_command(
+            'run_worker', '--burst', '--threads', '1', '--batch-size', '3',
+            stdout=out,
+        )
+        self.assertIn('Ran 10 jobs.', out.getvalue())
+        self.assertEqual(self.batches, [{0, 1, 2}, {3, 4, 5}, {6, 7, 8}, {9}])
+        self.assertFalse(Job.objects.exists())
+
+    def test_database_errors_do_not_stop_the_threads(self):
+        enqueue('tests.record', [1])
+        errors = [OperationalError('database table is locked')]
+
+        def claim(batch_size):
+            if errors:
+                raise errors.pop()
+            return claim_jobs(batch_size)
+
+        with mock.patch('tasks.jobs.claim_jobs', claim), \
+                self.assertLogs('tasks.jobs', 'ERROR') as logs:
+            self.assertEqual(Worker(threads=1, poll=0).run(burst=True), 1)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(self.batches, [{1}])
+
+
+# ------------------------------
+# Recurring task tests
+# ------------------------------
+class RecurrenceRuleTest(TestCase):
+    def test_rules_are_parsed_and_normalized(self):
+        self.assertEqual(parse_rule('weekly').text, 'FREQ=WEEKLY')
+        self.assertEqual(
+            parse_rule('rrule:freq=weekly;byday=th,mo;interval=2').text,
+            'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH',
+        )
+        for text in ['FREQ=YEARLY', 'FREQ=DAILY;COUNT=0', 'FREQ=DAILY;BYHOUR=9',
+                     'FREQ=DAILY;COUNT=2;UNTIL=20260101', 'FREQ=WEEKLY;BYDAY=XX']:
+            with self.assertRaises(ValidationError):
+                parse_rule(text)
+
+    def test_occurrences_in_a_window(self):
+        start = date(2026, 1, 5)
+        self.assertEqual(
+            expand('FREQ=WEEKLY;BYDAY=MO,TH', start,
+                   date(2026, 3, 1), date(2026, 3, 10)),
+            (date(2026, 3, 2), date(2026, 3, 5), date(2026, 3, 9)),
+        )
+        self.assertEqual(
+            expand('FREQ=MONTHLY', date(2026, 1, 31),
+                   date(2026, 1, 1), date(2026, 5, 31)),
+            (date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31)),
+        )
+        self.assertEqual(
+            expand('FREQ=DAILY;INTERVAL=2;COUNT=3', start,
+                   date(2026, 1, 7), date(2026, 12, 31)),
+            (date(2026, 1, 7), date(2026, 1, 9)),
+        )
+        self.assertEqual(
+            expand('FREQ=DAILY;UNTIL=20260106', start,
+                   date(2026, 1, 1), date(2026, 1, 31)),
+            (date(2026, 1, 5), date(2026, 1, 6)),
+        )
+
+
+class RecurringTaskTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='repeat', password='pass')
+        self.client.login(username='repeat', password='pass')
+        self.api_client = APIClient()
+        self.api_client.force_authenticate(user=self.user)
+        self.series = Task.objects.create(
+            title='Standup', user=self.user, due_date=date(2026, 1, 5),
+            recurrence='FREQ=WEEKLY;BYDAY=MO,TH',
+        )
+        self.series.tags.add(Tag.objects.create(name='team', user=self.user))
+        Task.objects.create(
+            title='One-off', user=self.user, due_date=date(2026, 1, 7),
+        )
+        self.window = {'from': '2026-01-01', 'to': '2026-01-31'}
+
+    def test_window_lists_occurrences_without_storing_them(self):
+        response = self.api_client.get('/en/api/', self.window)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 9)
+        self.assertEqual(
+            [(item['id'] is None, item['due_date']) for item in results[:3]],
+            [(True, '2026-01-05'), (False, '2026-01-07'), (True, '2026-01-08')],
+        )
+        self.assertEqual(results[0]['series'], self.series.pk)
+        self.assertEqual(results[0]['tags'], [self.series.tag_list[0][0]])
+        self.assertEqual(Task.objects.count(), 2)
+
+        token = RefreshToken.for_user(self.user).access_token
+        response = self.client.get(
+            '/en/api/', self.window, HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+        self.assertEqual(response.json()['results'], results)
+
+        response = self.api_client.get('/en/api/', {'from': '2026-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_window_costs_the_same_for_any_number_of_occurrences(self):
+        queryset = Task.objects.for_listing(self.user)
+        with self.assertNumQueries(2):
+            tasks = window_tasks(queryset, date(2026, 1, 1), date(2026, 12, 31))
+        self.assertEqual(len(tasks), 105)
+
+    def test_completing_an_occurrence_materializes_it(self):
+        response = self.api_client.post(
+            f'/en/api/{self.series.pk}/occurrences/',
+            {'occurrence_date': '2026-01-05', 'status': 'completed'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        occurrence = Task.objects.get(pk=response.json()['id'])
+        self.assertEqual(occurrence.recurrence_of, self.series)
+        self.assertEqual(occurrence.status, 'completed')
+        self.assertEqual(occurrence.tag_names, ['team'])
+        self.series.refresh_from_db()
+        self.assertEqual(self.series.due_date, date(2026, 1, 8))
+        self.assertEqual(self.series.recurrence_start, date(2026, 1, 5))
+
+        results = self.api_client.get('/en/api/', self.window).json()['results']
+        self.assertEqual(len(results), 9)
+        self.assertEqual(
+            (results[0]['id'], results[0]['status']),
+            (occurrence.pk, 'completed'),
+        )
+
+        response = self.api_client.post(
+            f'/en/api/{self.series.pk}/occurrences/',
+            {'occurrence_date': '2026-01-06'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_occurrence_materialized_concurrently_is_reused(self):
+        def racing_occurrence_task(series, day):
+            occurrence_task(series, day).save()
+            return occurrence_task(series, day)
+
+        with mock.patch(
+            'tasks.recurrence.occurrence_task', racing_occurrence_task,
+        ):
+            task = materialize(
+                self.series, date(2026, 1, 5), status='completed',
+            )
+        self.assertEqual(
+            list(self.series.occurrences.values_list('pk', 'status')),
+            [(task.pk, 'completed')],
+        )
+
+    def test_series_ends_with_its_rule(self):
+        series = Task.objects.create(
+            title='Twice', user=self.user, due_date=date(2026, 2, 1),
+            recurrence='FREQ=DAILY;COUNT=2',
+        )
+        materialize(series, date(2026, 2, 1), status='completed')
+        self.assertEqual(series.due_date, date(2026, 2, 2))
+        materialize(series, date(2026, 2, 2), status='completed')
+        series.refresh_from_db()
+        self.assertEqual(series.status, 'completed')
+
+    def test_task_list_window_and_occurrence_status(self):
+        response = self.client.get(reverse('task_list'))
+        self.assertContains(response, 'Standup', count=1)
+        response = self.client.get(reverse('task_list'), self.window)
+        self.assertContains(response, f'occurrence-{self.series.pk}-2026-01-12')
+        response = self.client.get(reverse('task_list'), {'from': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+        url = reverse('task_occurrence_status', args=[self.series.pk, '2026-01-12'])
+        self.assertTrue(self.client.post(url, {'status': 'pending'}).json()['success'])
+        self.assertFalse(self.series.occurrences.exists())
+        self.assertTrue(self.client.post(url, {'status': 'completed'}).json()['success'])
+        self.assertEqual(
+            self.series.occurrences.get().occurrence_date, date(2026, 1, 12),
+        )
+        self.series.refresh_from_db()
+        self.assertEqual(self.series.due_date, date(2026, 1, 5))
+
+    def test_bulk_create_and_update_store_the_rule(self):
+        response = self.api_client.post('/en/api/bulk/', [
+            {'title': 'Gym', 'recurrence': 'weekly', 'due_date': '2026-03-02'},
+            {'title': 'Gym', 'recurrence': 'weekly'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertIn('due_date', response.data['errors'][0]['errors'])
+        task = Task.objects.get(pk=response.data['results'][0]['id'])
+        self.assertEqual(
+            (task.recurrence, task.recurrence_start),
+            ('FREQ=WEEKLY', date(2026, 3, 2)),
+        )
+
+        self.api_client.patch('/en/api/bulk/', [
+            {'id': task.pk, 'title': 'Swim'},
+            {'id': self.series.pk, 'recurrence': 'daily'},
+        ], format='json')
+        task.refresh_from_db()
+        self.assertEqual(task.recurrence_start, date(2026, 3, 2))
+        self.series.refresh_from_db()
+        self.assertEqual(
+            (self.series.recurrence, self.series.recurrence_start),
+            ('FREQ=DAILY', date(2026, 1, 5)),
+        )
+
+        self.api_client.patch('/en/api/bulk/', [
+            {'id': task.pk, 'due_date': '2026-03-04'},
+            {'id': self.series.pk, 'recurrence': ''},
+        ], format='json')
+        task.refresh_from_db()
+        self.assertEqual(task.recurrence_start, date(2026, 3, 4))
+        self.series.refresh_from_db()
+        self.assertIsNone(self.series.recurrence_start)
+
+    def test_bulk_delete_of_a_series_deletes_its_occurrences(self):
+        token = self.api_client.get('/en/api/sync/').data['token']
+        occurrence = materialize(self.series, date(2026, 1, 5), title='Retro')
+        occurrence.tags.add(Tag.objects.create(name='retro', user=self.user))
+        token = self.api_client.get(
+            '/en/api/sync/', {'token': token},
+        ).data['token']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api_client.post(
+                '/en/api/bulk/delete/', {'ids': [self.series.pk]},
+                format='json',
+            )
+        self.assertEqual(response.data['results'], [self.series.pk])
+        self.assertFalse(Task.objects.filter(pk=occurrence.pk).exists())
+        response = self.api_client.get('/en/api/sync/', {'token': token})
+        self.assertFalse(response.data['full'])
+        self.assertEqual(
+            sorted(response.data['deleted']['tasks']),
+            sorted([self.series.pk, occurrence.pk]),
+        )
+        Worker().drain()
+        self.assertFalse(Tag.objects.filter(name__in=['team', 'retro']).exists())
+
+    def test_form_requires_due_date_and_reanchors(self):
+        form = TaskForm(data={
+            'title': 'Gym', 'status': 'pending', 'recurrence': 'weekly',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('due_date', form.errors)
+
+        form = TaskForm(instance=self.series, data={
+            'title': 'Standup', 'status': 'pending', 'due_date': '2026-02-02',
+            'recurrence': 'freq=weekly;byday=mo',
+        })
+        self.assertTrue(form.is_valid())
+        task = form.save()
+        self.assertEqual(task.recurrence, 'FREQ=WEEKLY;BYDAY=MO')
+        self.assertEqual(task.recurrence_start, date(2026, 2, 2))
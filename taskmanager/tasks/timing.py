@@ -0,0 +1,261 @@
+"""
+Per-request timings of SQL, template rendering and signal handlers.
+
+``ServerTimingMiddleware`` (see ``tasks.middleware``) gives every request a
+``RequestTimings`` in a context variable, which follows the request into
+the threads ``sync_to_async`` runs its database work in. While it is set:
+
+- an execute wrapper installed on every database connection counts the
+  queries and their time;
+- the ``DjangoTemplates`` backend below times template rendering;
+- the handlers of ``tasks.signals`` and the on-commit batches they
+  schedule (see ``tasks.transactions``) time themselves.
+
+The middleware sends the totals in a ``Server-Timing`` header and logs
+them on the ``tasks.timing`` logger, at INFO for every request and at
+WARNING with the statements that took the most time for requests slower
+than ``TASKS_SLOW_REQUEST_MS``. Times overlap: signal handlers include
+the queries they run, templates the queries of lazy querysets.
+
+Outside a request nothing is recorded and each hook costs one context
+variable lookup; inside one, a query costs two ``perf_counter()`` calls
+and a dict update.
+"""
+
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver as connect
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+SQL = 'db'
+TEMPLATES = 'tpl'
+SIGNALS = 'signals'
+TOTAL = 'total'
+
+DESCRIPTIONS = {
+    SQL: 'SQL',
+    TEMPLATES: 'Templates',
+    SIGNALS: 'Signal handlers',
+}
+
+DEFAULT_SLOW_REQUEST_MS = 500
+DEFAULT_SLOW_STATEMENTS = 10
+
+_current = contextvars.ContextVar('tasks_request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Time spent by one request in SQL, templates and signal handlers.
+
+    Attributes:
+        started (float): ``perf_counter()`` when the request started.
+        durations (dict): Seconds spent per part, keyed by ``SQL``,
+            ``TEMPLATES`` and ``SIGNALS``.
+        queries (int): Queries run.
+        statements (dict): ``[count, seconds]`` per SQL statement.
+    """
+
+    __slots__ = ('started', 'durations', 'queries', 'statements', 'depth')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = dict.fromkeys(DESCRIPTIONS, 0.0)
+        self.queries = 0
+        self.statements = {}
+        self.depth = dict.fromkeys(DESCRIPTIONS, 0)
+
+    @contextmanager
+    def span(self, part):
+        """Add the time of the block to ``part``, unless nested in it."""
+        self.depth[part] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.depth[part] -= 1
+            if not self.depth[part]:
+                self.durations[part] += time.perf_counter() - start
+
+    def add_query(self, sql, seconds):
+        """Count a query that took ``seconds``."""
+        self.queries += 1
+        self.durations[SQL] += seconds
+        statement = self.statements.get(sql)
+        if statement is None:
+            self.statements[sql] = [1, seconds]
+        else:
+            statement[0] += 1
+            statement[1] += seconds
+
+    def elapsed_ms(self):
+        """Return the milliseconds since the request started."""
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms):
+        """Return the value of the ``Server-Timing`` header."""
+        metrics = [
+            f'{SQL};dur={self.durations[SQL] * 1000:.1f};'
+            f'desc="{self.queries} queries"'
+        ]
+        metrics += [
+            f'{part};dur={self.durations[part] * 1000:.1f};'
+            f'desc="{DESCRIPTIONS[part]}"'
+            for part in (TEMPLATES, SIGNALS)
+        ]
+        metrics.append(f'{TOTAL};dur={total_ms:.1f}')
+        return ', '.join(metrics)
+
+    def slowest_statements(self, limit):
+        """Return ``(sql, count, ms)`` of the statements that took longest."""
+        statements = sorted(
+            self.statements.items(), key=lambda item: item[1][1], reverse=True,
+        )
+        return [
+            (sql, count, round(seconds * 1000, 1))
+            for sql, (count, seconds) in statements[:limit]
+        ]
+
+
+def current_timings():
+    """Return the timings of the current request, or None outside one."""
+    return _current.get()
+
+
+@contextmanager
+def measure_request():
+    """Record the timings of the block, i.e. of one request."""
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def slow_request_ms():
+    """Return the duration from which requests are logged as slow."""
+    return getattr(settings, 'TASKS_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+
+
+def report(request, response, timings):
+    """
+    Add the ``Server-Timing`` header to a response and log the timings.
+
+    Returns:
+        HttpResponse: The response.
+    """
+    total_ms = timings.elapsed_ms()
+    response['Server-Timing'] = timings.server_timing(total_ms)
+
+    threshold = slow_request_ms()
+    slow = bool(threshold) and total_ms >= threshold
+    level = logging.WARNING if slow else logging.INFO
+    if not logger.isEnabledFor(level):
+        return response
+
+    match = request.resolver_match
+    fields = {
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'total_ms': round(total_ms, 1),
+        'queries': timings.queries,
+        'sql_ms': round(timings.durations[SQL] * 1000, 1),
+        'template_ms': round(timings.durations[TEMPLATES] * 1000, 1),
+        'signals_ms': round(timings.durations[SIGNALS] * 1000, 1),
+    }
+    message = ' '.join(f'{name}={value}' for name, value in fields.items())
+    if slow:
+        fields['slow_sql'] = timings.slowest_statements(getattr(
+            settings, 'TASKS_SLOW_REQUEST_STATEMENTS', DEFAULT_SLOW_STATEMENTS,
+        ))
+        message = 'slow_request ' + message + ''.join(
+            f'\n  {ms} ms x{count}: {sql}'
+            for sql, count, ms in fields['slow_sql']
+        )
+    logger.log(level, message, extra={'timing': fields})
+    return response
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting the queries of the request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - start)
+
+
+@connect(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Record the queries of every database connection."""
+    # Connections are reopened on the same wrapper after each request.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed(part):
+    """Decorate a function to add its time to ``part`` during requests."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            with timings.span(part):
+                return func(*args, **kwargs)
+        wrapper.timed_part = part
+        return wrapper
+    return decorator
+
+
+def receiver(signal, **kwargs):
+    """Like ``django.dispatch.receiver``, timing the handler as ``SIGNALS``."""
+    def decorator(func):
+        if getattr(func, 'timed_part', None) != SIGNALS:
+            func = timed(SIGNALS)(func)
+        return connect(signal, **kwargs)(func)
+    return decorator
+
+
+class Template(django_backend.Template):
+    """Template of the ``DjangoTemplates`` backend timing its rendering."""
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return super().render(context, request)
+        with timings.span(TEMPLATES):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    Django's template backend, timing how long templates take to render.
+
+    Only templates loaded through the backend are timed, i.e. those
+    rendered by views; their includes and extends count as part of them.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,70 @@
+"""Helpers for deferring work until the current transaction commits."""
+
+import threading
+import weakref
+
+from django.db import transaction
+
+from .timing import SIGNALS, timed
+
+
+class PendingIds:
+    """``on_commit`` callback holding the ids of one ``add()``."""
+
+    def __init__(self, batch, ids):
+        self.batch = batch
+        self.ids = set(ids)
+
+    def __call__(self):
+        self.batch.flush()
+
+
+class OnCommitBatch:
+    """
+    Collect ids during a transaction and handle them all once it commits.
+
+    Every ``add()`` registers an ``on_commit`` callback holding its own
+    ids. Django drops the callbacks of a transaction or savepoint that is
+    rolled back, and their ids with them. The first callback to run takes
+    the ids of every callback still registered and the others find nothing
+    left to do, which means the handler runs once per transaction however
+    many events added ids. Callbacks are tracked with weak references, so
+    Django's list of callbacks decides which ones are still registered.
+
+    Example:
+        reindex = OnCommitBatch(index_tasks)
+        reindex.add({task.pk})
+    """
+
+    def __init__(self, handler):
+        """
+        Args:
+            handler (Callable[[set], Any]): Called with the pending ids.
+        """
+        self.handler = handler
+        self._local = threading.local()
+
+    @property
+    def pending(self):
+        """Return the callbacks waiting for a commit in this thread."""
+        if not hasattr(self._local, 'callbacks'):
+            self._local.callbacks = weakref.WeakSet()
+        return self._local.callbacks
+
+    def add(self, ids):
+        """Handle ``ids`` after the current transaction commits."""
+        if not ids:
+            return
+        callback = PendingIds(self, ids)
+        self.pending.add(callback)
+        transaction.on_commit(callback)
+
+    @timed(SIGNALS)
+    def flush(self):
+        """Pass the ids of every pending callback to the handler."""
+        ids = set()
+        for callback in list(self.pending):
+            ids |= callback.ids
+        self.pending.clear()
+        if ids:
+            self.handler(ids)
@@ -15,12 +15,30 @@ urlpatterns = [
     path('create/', views.task_create, name='task_create'),
     path('delete/<int:task_id>/', views.task_delete, name='task_delete'),
     path('edit/<int:task_id>/', views.task_edit, name='task_edit'),
+    path(
+        'description/<int:task_id>/',
+        views.task_description,
+        name='task_description',
+    ),
     path(
         '<int:task_id>/update-status/',
         views.task_update_status_ajax,
         name='task_update_status_ajax'
     ),
+    path(
+        '<int:task_id>/occurrences/<str:day>/status/',
+        views.task_occurrence_status,
+        name='task_occurrence_status',
+    ),
     path('tags/autocomplete/', views.tag_autocomplete, name='tag_autocomplete'),
+    path('events/', views.task_events, name='task_events'),
+    path('items/', views.task_item, name='task_item'),
+    path('export/', views.task_export, name='task_export'),
+    path('stats/', views.task_stats, name='task_stats'),
+
+    # Async JSON reads of the API, ahead of the router's routes
+    path('api/', views.task_collection),
+    path('api/<int:pk>/', views.task_detail),
 
     # Include DRF router URLs
     path('', include(router.urls)),
@@ -1,38 +1,440 @@
 """
 Views for task management: task CRUD, user registration,
-tags autocomplete, and AJAX status update.
+tags autocomplete, AJAX status update and task statistics.
+
+The hot read paths are async views using the async ORM: the task list,
+tag autocomplete, the AJAX status update, and JSON reads of the API task
+list and detail. Under ASGI they don't hold a worker thread while waiting
+on the cache; under WSGI Django runs them in an event loop of their own.
+The live event stream of the task list (see ``tasks.events``) is only
+served under ASGI.
 """
 
-from datetime import timedelta
+import asyncio
+import codecs
+from datetime import date
 
+from asgiref.sync import SyncToAsync, sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.forms import UserCreationForm
-from django.db.models import Q, Case, When, Value, IntegerField
-from django.http import JsonResponse
-from django.shortcuts import render, redirect, get_object_or_404
-from django.utils import timezone
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, transaction
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import (
+    aget_object_or_404,
+    get_object_or_404,
+    redirect,
+    render,
+)
+from django.template.loader import render_to_string
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from rest_framework import permissions, viewsets
-
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import (
+    ParseError,
+    UnsupportedMediaType,
+    ValidationError,
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .authentication import aauthenticate
+from .autocomplete import aget_tag_index, get_limit
+from .bulk import (
+    bulk_create_tasks,
+    bulk_delete_tasks,
+    bulk_set_status,
+    bulk_update_tasks,
+    get_max_batch_size,
+)
+from .caching import ListCache
+from .events import STATUS_FIELDS, format_event, get_broker
+from .export import (
+    CONTENT_TYPES,
+    FORMAT_CSV,
+    aexport_tasks,
+    export_filename,
+    export_tasks,
+)
 from .forms import TaskForm
-from .models import Task, Tag
-from .serializers import TaskSerializer
+from .imports import CONTENT_TYPES as IMPORT_CONTENT_TYPES, import_tasks
+from .listing import atask_row, atask_rows_page, window_rows
+from .models import Task
+from .pagination import (
+    InvalidCursor,
+    TaskCursorPagination,
+    next_page_url,
+)
+from .recurrence import materialize, parse_window, window_tasks
+from .serializers import TagSerializer, TaskSerializer, embeds_tags
+from .stats import aget_stats, get_stats, stats_data
+from .sync import changes_since, prune_if_due
+from .tags import resolve_tags
 
 
 class TaskViewSet(viewsets.ModelViewSet):
     """DRF viewset for Task model."""
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TaskCursorPagination
 
     def get_queryset(self):
-        """Return tasks for the current authenticated user."""
-        return Task.objects.filter(user=self.request.user)
+        """
+        Return tasks for the current authenticated user.
+
+        The list can be filtered with the ``status`` query parameter and
+        searched with ``q``, in which case results are ranked by relevance.
+        """
+        if self.action != 'list':
+            return Task.objects.for_listing(self.request.user)
+        params = self.request.query_params
+        return Task.objects.for_listing(
+            self.request.user,
+            status=params.get('status'),
+            query=params.get('q'),
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        Return a page of tasks, cached per list version.
+
+        With ``from`` and ``to`` dates, the response lists the tasks due
+        in that window instead, with the occurrences of recurring tasks
+        expanded (see ``tasks.recurrence``), in one page.
+
+        Unchanged lists are answered with a 304 (see ``tasks.caching``).
+        """
+        list_cache = ListCache(request, 'api')
+        response = list_cache.not_modified()
+        if response is None:
+            data = list_cache.get()
+            if data is None:
+                window = get_window(request.query_params)
+                if window is None:
+                    response = super().list(request, *args, **kwargs)
+                else:
+                    tasks = window_tasks(self.get_queryset(), *window)
+                    response = Response({
+                        'next': None,
+                        'results': self.get_serializer(tasks, many=True).data,
+                    })
+                list_cache.set(response.data)
+            else:
+                response = Response(data)
+        return list_cache.patch(response)
 
     def perform_create(self, serializer):
         """Save the task with the current user as owner."""
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """Save the task and its tags in one transaction."""
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        """Delete the task with its tombstone in one transaction."""
+        with transaction.atomic():
+            instance.delete()
+
+    def get_serializer_context(self):
+        """
+        Add the largest accepted batch for the bulk endpoints, and whether
+        tags are embedded with their names (``?embed=tags``).
+        """
+        context = super().get_serializer_context()
+        context['max_batch_size'] = get_max_batch_size()
+        context['embed_tags'] = embeds_tags(self.request)
+        return context
+
+    def bulk_response(self, result, results, success_status=status.HTTP_200_OK):
+        """
+        Build the response of a bulk endpoint.
+
+        The status is ``success_status`` when every item succeeded, 207
+        when only some did and 400 when none did.
+        """
+        if not result.errors:
+            response_status = success_status
+        elif result.task_ids:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {'results': results, 'errors': result.errors},
+            status=response_status,
+        )
+
+    @action(detail=True, methods=['post'])
+    def occurrences(self, request, pk=None):
+        """
+        Complete or edit the occurrence of a recurring task on
+        ``occurrence_date``, giving it a row of its own.
+
+        The other fields are those of a partial update: ``title``,
+        ``description``, ``status`` and ``due_date``. The response is the
+        occurrence's task.
+        """
+        series = self.get_object()
+        try:
+            day = date.fromisoformat(str(request.data.get('occurrence_date')))
+        except ValueError:
+            raise ValidationError(
+                {'occurrence_date': [_('Expected a date in YYYY-MM-DD format.')]}
+            )
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        values = {
+            name: value for name, value in serializer.validated_data.items()
+            if name in OCCURRENCE_FIELDS
+        }
+        try:
+            task = materialize(series, day, **values)
+        except DjangoValidationError as exc:
+            raise ValidationError({'occurrence_date': exc.messages})
+        return Response(
+            self.get_serializer(task).data, status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Return the tasks and tags changed since the ``token`` parameter.
+
+        The response holds the next ``token``, the changed ``tasks`` and
+        ``tags``, and the ids of the ``deleted`` ones. Without a valid
+        token, ``full`` is true and the response holds everything.
+        """
+        prune_if_due()
+        result = changes_since(request.user, request.query_params.get('token'))
+        return Response({
+            'token': result.token,
+            'full': result.full,
+            'tasks': self.get_serializer(result.tasks, many=True).data,
+            'tags': TagSerializer(result.tags, many=True).data,
+            'deleted': {
+                'tasks': result.deleted_tasks,
+                'tags': result.deleted_tags,
+            },
+        })
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Return the number of the user's tasks in each status, overdue,
+        due today and completed this week (see ``tasks.stats``).
+        """
+        return Response(stats_data(get_stats(request.user)))
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_tasks(self, request):
+        """
+        Import tasks from a CSV (``text/csv``) or NDJSON
+        (``application/x-ndjson``) body, read as a stream.
+
+        Rows are written in chunks (see ``tasks.imports``). The response
+        counts the ``imported`` and ``failed`` rows and lists the first
+        ``errors`` with their line; the status is 201 when every row was
+        imported, 207 when only some were and 400 when none were.
+        """
+        media_type = request.content_type.split(';')[0].strip()
+        import_format = IMPORT_CONTENT_TYPES.get(media_type)
+        if import_format is None:
+            raise UnsupportedMediaType(media_type)
+        lines = codecs.iterdecode(request.stream or [], 'utf-8-sig')
+        try:
+            result = import_tasks(
+                request.user, lines, import_format,
+                max_errors=getattr(settings, 'TASKS_IMPORT_MAX_ERRORS', 100),
+            )
+        except UnicodeDecodeError as exc:
+            raise ParseError(_('The body must be UTF-8: %s') % exc)
+        if not result.failed:
+            response_status = status.HTTP_201_CREATED
+        elif result.imported:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {
+                'imported': result.imported,
+                'failed': result.failed,
+                'errors': result.errors,
+            },
+            status=response_status,
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """Create the tasks of a JSON array in one transaction."""
+        result = bulk_create_tasks(
+            request.user, request.data, self.get_serializer_context()
+        )
+        return self.bulk_response(
+            result,
+            self.get_serializer(result.tasks, many=True).data,
+            status.HTTP_201_CREATED,
+        )
+
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        """Partially update the tasks of a JSON array of ``{id, ...}``."""
+        result = bulk_update_tasks(
+            request.user, request.data, self.get_serializer_context()
+        )
+        return self.bulk_response(
+            result, self.get_serializer(result.tasks, many=True).data
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk/status')
+    def bulk_status(self, request):
+        """Set ``status`` on the tasks listed in ``ids``."""
+        result = bulk_set_status(
+            request.user, request.data, self.get_serializer_context()
+        )
+        return self.bulk_response(
+            result, self.get_serializer(result.tasks, many=True).data
+        )
+
+    @action(detail=False, methods=['post'], url_path='bulk/delete')
+    def bulk_delete(self, request):
+        """Delete the tasks listed in ``ids``; returns the deleted ids."""
+        result = bulk_delete_tasks(
+            request.user, request.data, self.get_serializer_context()
+        )
+        return self.bulk_response(result, result.task_ids)
+
+
+# Fields an occurrence may change from its series.
+OCCURRENCE_FIELDS = ('title', 'description', 'status', 'due_date')
+
+
+def get_window(params):
+    """
+    Return the ``(from, to)`` date window of an API list request, or None.
+
+    Raises:
+        ValidationError: If the window is invalid.
+    """
+    try:
+        return parse_window(params)
+    except DjangoValidationError as exc:
+        raise ValidationError({'window': exc.messages})
+
+
+task_collection_view = TaskViewSet.as_view({'get': 'list', 'post': 'create'})
+task_detail_view = TaskViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+
+
+def is_async_read(request):
+    """
+    Return True if an API request can be served by the async read views.
+
+    They serve JSON GET requests; writes, other formats and the browsable
+    API are left to ``TaskViewSet``.
+    """
+    return (
+        request.method == 'GET'
+        and 'format' not in request.GET
+        and 'text/html' not in request.headers.get('Accept', '')
+    )
+
+
+def api_json_response(data):
+    """Render API data as DRF's JSON renderer does."""
+    response = HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+    )
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+@csrf_exempt
+async def task_collection(request):
+    """
+    Serve the API task list asynchronously; anything else goes to DRF.
+
+    Requests without a valid JWT, invalid cursors and invalid windows are
+    handed to ``TaskViewSet`` too, so errors look the same on both paths.
+    """
+    user = await aauthenticate(request) if is_async_read(request) else None
+    if user is None:
+        return await sync_to_async(task_collection_view)(request)
+
+    list_cache = await ListCache.acreate(request, user, 'api')
+    response = list_cache.not_modified()
+    if response is None:
+        data = await list_cache.aget()
+        if data is None:
+            queryset = Task.objects.for_listing(
+                user,
+                status=request.GET.get('status'),
+                query=request.GET.get('q'),
+            )
+            try:
+                window = parse_window(request.GET)
+            except DjangoValidationError:
+                return await sync_to_async(task_collection_view)(request)
+            paginator = TaskCursorPagination()
+            if window is not None:
+                tasks = await sync_to_async(window_tasks)(queryset, *window)
+                next_link = None
+            else:
+                try:
+                    tasks = await paginator.apaginate_queryset(queryset, request)
+                except InvalidCursor:
+                    return await sync_to_async(task_collection_view)(request)
+                next_link = paginator.get_next_link()
+            data = {
+                'next': next_link,
+                'results': TaskSerializer(
+                    tasks,
+                    many=True,
+                    context={'embed_tags': embeds_tags(request)},
+                ).data,
+            }
+            await list_cache.aset(data)
+        response = api_json_response(data)
+    return list_cache.patch(response)
+
+
+@csrf_exempt
+async def task_detail(request, pk):
+    """Serve an API task asynchronously; anything else goes to DRF."""
+    user = await aauthenticate(request) if is_async_read(request) else None
+    task = None
+    if user is not None:
+        task = await Task.objects.for_listing(user).filter(pk=pk).afirst()
+    if task is None:
+        return await sync_to_async(task_detail_view)(request, pk=pk)
+    return api_json_response(
+        TaskSerializer(task, context={'embed_tags': embeds_tags(request)}).data
+    )
 
 
 def register(request):
@@ -50,59 +452,244 @@ def register(request):
 
 
 @login_required
-def task_list(request):
-    """Display list of tasks with optional filtering and search."""
-    tasks_queryset = Task.objects.filter(user=request.user)
-    today = timezone.localdate()
-
-    status_filter = request.GET.get('status')
-    query = request.GET.get('q')
-
-    if status_filter:
-        tasks_queryset = tasks_queryset.filter(status=status_filter)
-
-    if query:
-        tasks_queryset = tasks_queryset.filter(
-            Q(title__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct()
-
-    tasks_queryset = tasks_queryset.annotate(
-        completed_order=Case(
-            When(status='completed', then=Value(1)),
-            default=Value(0),
-            output_field=IntegerField(),
+async def task_list(request):
+    """
+    Display list of tasks with optional filtering and search.
+
+    Tasks are shown one page at a time. Requests sent by the infinite
+    scroll script (``X-Requested-With: XMLHttpRequest``) get only the task
+    items of the requested page, with the URL of the following page in
+    the ``X-Next-Page`` header.
+
+    With ``from`` and ``to`` dates, the list shows the tasks due in that
+    window instead, with the occurrences of recurring tasks expanded
+    (see ``tasks.recurrence``), on one page.
+
+    The rendered items are cached per list version (see
+    ``tasks.caching``), and unchanged lists are answered with a 304
+    unless the page has flash messages to show.
+    """
+    # Loaded here, templates and messages then read it without queries.
+    request.user = user = await request.auser()
+    list_cache = await ListCache.acreate(request, user, 'html', csrf=True)
+    has_messages = len(messages.get_messages(request)) > 0
+    if not has_messages:
+        response = list_cache.not_modified()
+        if response is not None:
+            return list_cache.patch(response)
+
+    try:
+        window = parse_window(request.GET)
+    except DjangoValidationError as exc:
+        return HttpResponseBadRequest(' '.join(exc.messages))
+    context = {
+        'status_filter': request.GET.get('status'),
+        'query': request.GET.get('q'),
+        'window_from': window[0] if window else None,
+        'window_to': window[1] if window else None,
+    }
+    fragment = await list_cache.aget()
+    if fragment is None:
+        tasks_list, next_url = await list_page(
+            request, user, context['status_filter'], context['query'], window,
+        )
+        context['tasks'] = tasks_list
+        fragment = {
+            'items': render_to_string(
+                'tasks/task_items.html', context, request,
+            ),
+            'has_tasks': bool(tasks_list),
+            'next_url': next_url,
+        }
+        await list_cache.aset(fragment)
+
+    context.update(
+        task_items=mark_safe(fragment['items']),
+        has_tasks=fragment['has_tasks'],
+        next_url=fragment['next_url'],
+    )
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        response = HttpResponse(fragment['items'])
+        if fragment['next_url']:
+            response['X-Next-Page'] = fragment['next_url']
+    else:
+        response = render(request, 'tasks/tasks.html', context)
+    if has_messages:
+        return response
+    return list_cache.patch(response)
+
+
+async def list_page(request, user, status_filter, query, window=None):
+    """
+    Load one page of the user's task list as rows for the task cards, or
+    the whole ``(from, to)`` window if given.
+
+    Returns:
+        tuple: Rows of the page and the URL of the next page, or None.
+
+    Raises:
+        Http404: If the cursor is invalid.
+    """
+    tasks_queryset = Task.objects.for_listing(
+        user,
+        status=status_filter,
+        query=query,
+    )
+    if window is not None:
+        return await sync_to_async(window_rows)(tasks_queryset, *window), None
+
+    try:
+        page = await atask_rows_page(
+            tasks_queryset, cursor=request.GET.get('cursor'),
         )
-    ).order_by('completed_order', 'due_date', '-created_at')
-
-    tasks_list = list(tasks_queryset)
-    for task in tasks_list:
-        if task.status == 'completed':
-            task.card_highlight = 'list-group-item-success'
-            task.due_highlight = 'text-muted'
-        elif task.due_date:
-            if task.due_date < today:
-                task.card_highlight = ''
-                task.due_highlight = 'text-danger'
-            elif task.due_date <= today + timedelta(days=0):
-                task.card_highlight = ''
-                task.due_highlight = 'text-warning'
+    except InvalidCursor:
+        raise Http404(_('Invalid cursor'))
+
+    next_url = next_page_url(request, page.next_cursor) if page.has_next else None
+    return page.items, next_url
+
+
+@login_required
+async def task_item(request):
+    """
+    Return the card of the task ``id``, as the task list shows it.
+
+    The live updates script fetches the card of a task created or updated
+    elsewhere. The ``status`` and ``q`` parameters of the list apply: a
+    task they exclude, or a deleted one, gets a 204.
+    """
+    try:
+        task_id = int(request.GET.get('id', ''))
+    except ValueError:
+        raise Http404(_('Invalid task'))
+    context = {
+        'status_filter': request.GET.get('status'),
+        'query': request.GET.get('q'),
+    }
+    queryset = Task.objects.for_listing(
+        await request.auser(),
+        status=context['status_filter'],
+        query=context['query'],
+    )
+    row = await atask_row(queryset, task_id)
+    if row is None:
+        return HttpResponse(status=204)
+    context['tasks'] = [row]
+    return HttpResponse(
+        render_to_string('tasks/task_items.html', context, request)
+    )
+
+
+def release_request():
+    """
+    Give back the database connection and the thread Django holds for an
+    ASGI request, which a long response doesn't need once it streams.
+
+    Django runs the sync code of a request, middleware included, in a
+    thread of its own, kept until the response ends. Only the executor of
+    the current request is shut down; sync code run later in the request
+    starts a new one.
+    """
+    if not connection.in_atomic_block:
+        connection.close()
+    context = SyncToAsync.thread_sensitive_context.get(None)
+    if context is not None:
+        executor = SyncToAsync.context_to_thread_executor.pop(context, None)
+        if executor is not None:
+            # Called from that thread, which exits once this call returns.
+            executor.shutdown(wait=False)
+
+
+async def event_stream(user_id):
+    """
+    Yield the user's task events as Server-Sent Events messages.
+
+    A comment is sent every ``TASKS_EVENTS_HEARTBEAT`` seconds without
+    events, which keeps proxies from closing the idle connection.
+    """
+    # The middleware is done by the time the response streams.
+    await sync_to_async(release_request)()
+    heartbeat = getattr(settings, 'TASKS_EVENTS_HEARTBEAT', 15)
+    async with get_broker().subscribe(user_id) as subscription:
+        yield 'retry: 5000\n: connected\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except TimeoutError:
+                yield ': keep-alive\n\n'
             else:
-                task.card_highlight = ''
-                task.due_highlight = 'text-muted'
-        else:
-            task.card_highlight = ''
-            task.due_highlight = 'text-muted'
+                yield format_event(event)
 
-    return render(
-        request,
-        'tasks/tasks.html',
-        {
-            'tasks': tasks_list,
-            'status_filter': status_filter,
-            'query': query,
-        },
+
+@login_required
+async def task_events(request):
+    """
+    Stream the user's task changes with Server-Sent Events.
+
+    The stream stays open until the client leaves, holding neither a
+    thread nor a database connection. Under WSGI, where a stream would
+    take a worker thread for as long as the page is open, the answer is a
+    204, which tells ``EventSource`` not to reconnect.
+    """
+    user = await request.auser()
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(
+        event_stream(user.pk), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Tells nginx not to buffer the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def task_export(request):
+    """
+    Stream the user's tasks with their tags as CSV or NDJSON.
+
+    ``format`` is ``csv`` (the default) or ``ndjson``; ``status`` and
+    ``q`` filter the tasks like the task list. Besides the session, a JWT
+    bearer token is accepted, so API clients can export too. Tasks are
+    read in chunks (see ``tasks.export``), so memory stays flat.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        user = await aauthenticate(request)
+    if user is None:
+        if 'Authorization' in request.headers:
+            return JsonResponse(
+                {'detail': _('Invalid or expired token.')}, status=401,
+            )
+        return redirect_to_login(request.get_full_path())
+
+    export_format = request.GET.get('format', FORMAT_CSV)
+    if export_format not in CONTENT_TYPES:
+        return HttpResponseBadRequest(_('Unknown export format'))
+    queryset = Task.objects.for_listing(
+        user, status=request.GET.get('status'), query=request.GET.get('q'),
+    )
+    # Django buffers an iterator of the other kind, sync or async, whole.
+    if isinstance(request, ASGIRequest):
+        content = aexport_tasks(queryset, export_format)
+    else:
+        content = export_tasks(queryset, export_format)
+    response = StreamingHttpResponse(
+        content, content_type=CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{export_filename(export_format)}"'
+    )
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@login_required
+def task_description(request, task_id):
+    """Return the description of a task, loaded when its card expands."""
+    task = get_object_or_404(
+        Task.objects.only('description'), id=task_id, user=request.user,
     )
+    return JsonResponse({'description': task.description})
 
 
 @login_required
@@ -111,15 +698,16 @@ def task_create(request):
     if request.method == 'POST':
         form = TaskForm(request.POST, user=request.user)
         if form.is_valid():
-            task = form.save(commit=False)
-            task.user = request.user
-            tags = handle_tags_input(
-                form.cleaned_data.get('tags_input', ''),
-                request.user,
-            )
-            task.save()
-            task.tags.set(tags)
-            form.save_m2m()
+            with transaction.atomic():
+                task = form.save(commit=False)
+                task.user = request.user
+                tags = resolve_tags(
+                    request.user,
+                    form.cleaned_data.get('tags_input', []),
+                )
+                task.save()
+                task.tags.set(tags)
+                form.save_m2m()
             messages.success(
                 request,
                 '<i class="bi bi-check2"></i> '
@@ -147,13 +735,16 @@ def task_edit(request, task_id):
     if request.method == 'POST':
         form = TaskForm(request.POST, instance=task, user=request.user)
         if form.is_valid():
-            task = form.save(commit=False)
-            task.user = request.user
-            task.save()
+            with transaction.atomic():
+                task = form.save(commit=False)
+                task.user = request.user
+                task.save()
 
-            tags_input = form.cleaned_data.get('tags_input', '')
-            tags = handle_tags_input(tags_input, request.user)
-            task.tags.set(tags)
+                tags = resolve_tags(
+                    request.user,
+                    form.cleaned_data.get('tags_input', []),
+                )
+                task.tags.set(tags)
 
             messages.info(
                 request,
@@ -175,9 +766,11 @@ def task_edit(request, task_id):
 
 @login_required
 @require_POST
-def task_update_status_ajax(request, task_id):
+async def task_update_status_ajax(request, task_id):
     """Update task status via AJAX request."""
-    task = get_object_or_404(Task, id=task_id, user=request.user)
+    task = await aget_object_or_404(
+        Task, id=task_id, user=await request.auser(),
+    )
     new_status = request.POST.get('status')
 
     valid_statuses = ['pending', 'in_progress', 'completed']
@@ -188,7 +781,11 @@ def task_update_status_ajax(request, task_id):
         )
 
     task.status = new_status
-    task.save()
+    # The counter bump and the save share a transaction (see tasks.sync).
+    # Saving only these fields also tells the live stream it's a status change.
+    await sync_to_async(transaction.atomic(task.save))(
+        update_fields=STATUS_FIELDS,
+    )
     return JsonResponse(
         {
             'success': True,
@@ -199,6 +796,49 @@ def task_update_status_ajax(request, task_id):
 
 @login_required
 @require_POST
+def task_occurrence_status(request, task_id, day):
+    """
+    Set the status of the occurrence of a recurring task on ``day``, via
+    AJAX, giving it a row of its own.
+
+    Setting the status the occurrence already has is a no-op, so an
+    occurrence that wasn't changed keeps living in its series. The
+    response asks the script to reload the list, where the card of the
+    series moved on to its next occurrence.
+    """
+    series = get_object_or_404(Task, id=task_id, user=request.user)
+    new_status = request.POST.get('status')
+    if new_status not in dict(Task.STATUS_CHOICES):
+        return JsonResponse(
+            {'success': False, 'error': _('Invalid status')},
+            status=400,
+        )
+    try:
+        day = date.fromisoformat(day)
+    except ValueError:
+        raise Http404(_('Invalid date'))
+    existing = series.occurrences.filter(occurrence_date=day).first()
+    current = existing.status if existing else series.status
+    if new_status != current:
+        try:
+            materialize(series, day, status=new_status)
+        except DjangoValidationError as exc:
+            return JsonResponse(
+                {'success': False, 'error': ' '.join(exc.messages)},
+                status=400,
+            )
+    return JsonResponse(
+        {
+            'success': True,
+            'new_status_display': dict(Task.STATUS_CHOICES)[new_status],
+            'reload': True,
+        }
+    )
+
+
+@login_required
+@require_POST
+@transaction.atomic
 def task_delete(request, task_id):
     """Delete a task."""
     task = get_object_or_404(Task, id=task_id, user=request.user)
@@ -210,28 +850,40 @@ def task_delete(request, task_id):
     return redirect('task_list')
 
 
-def handle_tags_input(tags_str, user):
-    """Process comma-separated tags string and return Tag objects."""
-    tag_names = [t.strip() for t in tags_str.split(',') if t.strip()]
-    tags = []
-    for name in tag_names:
-        tag, _ = Tag.objects.get_or_create(name=name, user=user)
-        tags.append(tag)
-    return tags
+@login_required
+async def task_stats(request):
+    """Return the counts of the user's tasks for the header widget."""
+    stats = await aget_stats(await request.auser())
+    return JsonResponse(stats_data(stats))
 
 
 @login_required
-def tag_autocomplete(request):
-    """Return JSON list of tag names matching the search term."""
+async def tag_autocomplete(request):
+    """
+    Return JSON list of the user's tag names matching the search term.
+
+    Tags starting with the term come first, then tags containing it, each
+    ranked by how many tasks use them; ``limit`` caps the list. Answers
+    come from the cached tag index and carry an ETag, so the browser can
+    revalidate a repeated request and get a 304 back.
+    """
     term = request.GET.get('term', '')
-    user = request.user if request.user.is_authenticated else None
-    tags = []
-
-    if term and user:
-        tags = (
-            Tag.objects.filter(name__icontains=term, user=user)
-            .values_list('name', flat=True)
-            .distinct()
-        )
-
-    return JsonResponse(list(tags), safe=False)
+    user = await request.auser()
+    if not (term and user.is_authenticated):
+        return JsonResponse([], safe=False)
+
+    index = await aget_tag_index(user.pk)
+    limit = get_limit(request.GET.get('limit'))
+    etag = index.etag(term, limit)
+    # The same term is often asked again, e.g. after a backspace.
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(index.search(term, limit), safe=False)
+        response['ETag'] = etag
+    patch_cache_control(
+        response,
+        private=True,
+        max_age=getattr(settings, 'TASKS_TAG_AUTOCOMPLETE_MAX_AGE', 60),
+    )
+    patch_vary_headers(response, ['Cookie'])
+    return response